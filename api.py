@@ -1,36 +1,60 @@
 import logging
-from typing import Annotated
+from typing import Annotated, Literal, Optional
+import redis.asyncio as redis
 from aiogram import Bot
 from aiogram.exceptions import TelegramAPIError
-from fastapi import FastAPI, Depends, HTTPException, Header, UploadFile, File
+from asyncpg import Pool
+from fastapi import FastAPI, Depends, HTTPException, Header, Query, Request, Response, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from contextlib import asynccontextmanager
+from pydantic import ValidationError
 
 # Imports updated for the new project structure (without 'src')
 from bot.config import settings, Settings
 from bot.container import container
+from bot.database.db import create_pool
 from bot.database.repositories import (
+    AnalyticsRepository,
     UserRepository,
     ChannelRepository,
     SchedulerRepository,
     PlanRepository,
+    PostActionRepository,
 )
 from bot.models.twa import (
     AddChannelRequest,
+    BatchPostResult,
     Channel,
+    ChannelEngagementStats,
+    ChannelViewPercentiles,
+    EngagementTopPost,
     InitialDataResponse,
     MessageResponse,
     Plan,
+    PostAction,
+    PostActionRequest,
     SchedulePostRequest,
     ScheduledPost,
+    SchedulePostsBatchRequest,
+    SchedulePostsBatchResponse,
+    SyncResponse,
+    TopPost,
+    TopPostsPage,
     User,
     ValidationErrorResponse,
 )
 from bot.services import (
+    AnalyticsService,
     GuardService,
+    MediaService,
     SubscriptionService,
 )
-from bot.services.auth_service import validate_init_data
+from bot.services.auth_service import InitDataVerifier
+from bot.database.repositories.analytics_repository import POST_EXPORT_COLUMNS
+from bot.utils.cursors import decode_cursor, encode_cursor
+from bot.utils.export import EXPORT_MEDIA_TYPES, csv_stream, parquet_available, parquet_stream
+from bot.utils.media import media_type_for
 
 # Logging setup
 logging.basicConfig(level=logging.INFO)
@@ -55,15 +79,30 @@ def get_plan_repo() -> PlanRepository:
 def get_scheduler_repo() -> SchedulerRepository:
     return container.resolve(SchedulerRepository)
 
+def get_post_action_repo() -> PostActionRepository:
+    return container.resolve(PostActionRepository)
+
+def get_analytics_repo() -> AnalyticsRepository:
+    return container.resolve(AnalyticsRepository)
+
 def get_subscription_service() -> SubscriptionService:
     return container.resolve(SubscriptionService)
 
 def get_guard_service() -> GuardService:
     return container.resolve(GuardService)
 
+def get_media_service() -> MediaService:
+    return container.resolve(MediaService)
+
+def get_analytics_service() -> AnalyticsService:
+    return container.resolve(AnalyticsService)
+
+def get_init_data_verifier() -> InitDataVerifier:
+    return container.resolve(InitDataVerifier)
+
 async def get_validated_user_data(
     authorization: Annotated[str, Header()],
-    current_settings: Annotated[Settings, Depends(get_settings)]
+    verifier: Annotated[InitDataVerifier, Depends(get_init_data_verifier)],
 ) -> dict:
     """
     Validates the initData string from a TWA and returns the user data.
@@ -76,7 +115,7 @@ async def get_validated_user_data(
         raise HTTPException(status_code=401, detail="initData is missing.")
 
     try:
-        user_data = validate_init_data(init_data, current_settings.BOT_TOKEN.get_secret_value())
+        user_data = verifier.verify(init_data)
         return user_data
     except Exception as e:
         log.error(f"Could not validate initData: {e}")
@@ -88,14 +127,48 @@ async def get_validated_user_data(
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     log.info("API is starting up...")
-    yield
-    log.info("API is shutting down...")
+    # Repozitoriy'lar (va ular orqali servislar) konteynerdagi asyncpg pool'idan foydalanadi
+    pool: Pool = await create_pool()
+    container.register(Pool, instance=pool)
+    try:
+        yield
+    finally:
+        log.info("API is shutting down...")
+        await container.resolve(Bot).session.close()
+        await container.resolve(redis.Redis).aclose()
+        await pool.close()
 
 app = FastAPI(
     lifespan=lifespan,
     responses={422: {"description": "Validation Error", "model": ValidationErrorResponse}},
 )
 
+# Multipart chegaralari va sarlavhalari uchun fayl hajmidan tashqari ruxsat etilgan baytlar
+_MULTIPART_OVERHEAD = 64 * 1024
+_UPLOAD_PATH = "/api/v1/media/upload"
+
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """
+    Rejects oversized media uploads from Content-Length, before the body is read.
+
+    FastAPI spools the whole multipart body before the handler runs, so the
+    limit has to be enforced here.  Uploads without a Content-Length are
+    refused, since their size cannot be known up front.
+    """
+    if request.method == "POST" and request.url.path == _UPLOAD_PATH:
+        content_length = request.headers.get("content-length")
+        if content_length is None or not content_length.isdigit():
+            return JSONResponse(status_code=411, content={"detail": "Content-Length is required."})
+        if int(content_length) > settings.MEDIA_MAX_UPLOAD_BYTES + _MULTIPART_OVERHEAD:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"File is larger than {settings.MEDIA_MAX_UPLOAD_BYTES} bytes"},
+            )
+    return await call_next(request)
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -107,90 +180,137 @@ app.add_middleware(
 
 # --- API Endpoints ---
 
-@app.post("/api/v1/media/upload", tags=["Media"])
+@app.post(_UPLOAD_PATH, tags=["Media"])
 async def upload_media_file(
     # --- SYNTAXERROR TUZATILDI: Argumentlar tartibi to'g'rilandi ---
-    current_settings: Annotated[Settings, Depends(get_settings)],
+    media_service: Annotated[MediaService, Depends(get_media_service)],
     file: UploadFile = File(...)
 ):
-    bot = Bot(token=current_settings.BOT_TOKEN.get_secret_value())
+    """
+    Uploads a file to the storage channel and returns its Telegram file_id.
 
+    The spooled upload is hashed in place and streamed to Telegram from
+    the same file; content uploaded before is answered from the cache
+    without touching Telegram.
+    """
+    if media_type_for(file.content_type) is None:
+        raise HTTPException(status_code=400, detail=f"Unsupported file type: {file.content_type}")
     try:
-        content_type = file.content_type
-        if content_type and content_type.startswith("image/"):
-            media_type = "photo"
-            sent_message = await bot.send_photo(chat_id=current_settings.STORAGE_CHANNEL_ID, photo=file.file)
-            file_id = sent_message.photo[-1].file_id
-        elif content_type and content_type.startswith("video/"):
-            media_type = "video"
-            sent_message = await bot.send_video(chat_id=current_settings.STORAGE_CHANNEL_ID, video=file.file)
-            file_id = sent_message.video.file_id
-        else:
-            raise HTTPException(status_code=400, detail=f"Unsupported file type: {content_type}")
-        
-        return {"ok": True, "file_id": file_id, "media_type": media_type}
+        result = await media_service.upload_file(file.file, file.content_type, file.filename)
+        return {"ok": True, **result}
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except TelegramAPIError as e:
         log.error(f"Telegram API error while uploading file: {e}")
         raise HTTPException(status_code=500, detail=f"Telegram API error: {e.args[0]}")
-    finally:
-        await bot.session.close()
 
-@app.get("/api/v1/initial-data", response_model=InitialDataResponse)
+def _channel_from_row(row: dict) -> Channel:
+    return Channel(
+        id=row["id"],
+        title=row.get("title") or "",
+        username=row.get("username"),
+    )
+
+def _scheduled_post_from_row(row: dict) -> ScheduledPost:
+    return ScheduledPost(
+        id=row["id"],
+        channel_id=row["channel_id"],
+        text=row.get("post_text"),
+        media_id=row.get("media_id"),
+        media_type=row.get("media_type"),
+        media_group=row.get("media_group"),
+        scheduled_at=row.get("schedule_time"),
+        buttons=row.get("inline_buttons"),
+        recurrence=row.get("recurrence_rule"),
+        next_fire_at=row.get("next_fire_at"),
+        delete_after_seconds=row.get("delete_after_seconds"),
+    )
+
+def _data_etag(version: int, plan_id: Optional[int]) -> str:
+    # Tarif o'zgarishi kanal/post versiyasini oshirmaydi, shuning uchun u ham ETag'ga kiradi
+    return f'"{version}-{plan_id}"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates or "*" in candidates
+
+@app.get(
+    "/api/v1/initial-data",
+    response_model=InitialDataResponse,
+    responses={304: {"description": "Nothing changed since the ETag in If-None-Match"}},
+)
 async def get_initial_data(
+    response: Response,
     user_data: Annotated[dict, Depends(get_validated_user_data)],
     user_repo: Annotated[UserRepository, Depends(get_user_repo)],
-    channel_repo: Annotated[ChannelRepository, Depends(get_channel_repo)],
-    scheduler_repo: Annotated[SchedulerRepository, Depends(get_scheduler_repo)],
-    plan_repo: Annotated[PlanRepository, Depends(get_plan_repo)],
+    if_none_match: Annotated[Optional[str], Header()] = None,
 ):
+    """
+    Returns everything the TWA shows on start, tagged with an ETag.
+
+    A client that sends its last ETag in ``If-None-Match`` gets an empty
+    304 after a single primary-key lookup when nothing has changed.
+    """
     user_id = user_data["id"]
     username = user_data.get("username")
 
-    # Ensure the user exists in the database
-    await user_repo.create_user(user_id, username)
-
-    # Fetch plan information
-    plan = None
-    plan_name = await user_repo.get_user_plan_name(user_id)
-    if plan_name:
-        plan_row = await plan_repo.get_plan_by_name(plan_name)
-        if plan_row:
-            plan = Plan(
-                name=plan_row.get("plan_name") or plan_row.get("name"),
-                max_channels=plan_row["max_channels"],
-                max_posts_per_month=plan_row["max_posts_per_month"],
-            )
+    if if_none_match:
+        current = await user_repo.get_data_version(user_id)
+        if current:
+            etag = _data_etag(current["version"], current["plan_id"])
+            if _etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers={"ETag": etag})
 
-    # Fetch channels and scheduled posts
-    channel_rows = await channel_repo.get_user_channels(user_id)
-    channels = [
-        Channel(
-            id=row["id"],
-            title=row.get("title") or "",
-            username=row.get("username"),
-        )
-        for row in (channel_rows or [])
-    ]
-    post_rows = await scheduler_repo.get_scheduled_posts_by_user(user_id)
-    scheduled_posts = [
-        ScheduledPost(
-            id=row["id"],
-            channel_id=row["channel_id"],
-            text=row.get("post_text"),
-            media_id=row.get("media_id"),
-            media_type=row.get("media_type"),
-            scheduled_at=row.get("schedule_time"),
-            buttons=row.get("inline_buttons"),
-        )
-        for row in (post_rows or [])
-    ]
+    # Foydalanuvchini yaratish, tarif, kanallar va postlar - bitta so'rovda
+    data = await user_repo.get_initial_data(user_id, username)
+    response.headers["ETag"] = _data_etag(data["version"], data["plan_id"])
 
+    plan_row = data["plan"]
     user = User(id=user_id, username=username)
     return InitialDataResponse(
         user=user,
-        plan=plan,
-        channels=channels,
-        scheduled_posts=scheduled_posts,
+        plan=Plan(**plan_row) if plan_row else None,
+        channels=[_channel_from_row(row) for row in data["channels"]],
+        scheduled_posts=[_scheduled_post_from_row(row) for row in data["scheduled_posts"]],
+        version=data["version"],
+    )
+
+@app.get(
+    "/api/v1/sync",
+    response_model=SyncResponse,
+    responses={410: {"description": "`since` is too old; reload /api/v1/initial-data"}},
+)
+async def sync_changes(
+    response: Response,
+    user_data: Annotated[dict, Depends(get_validated_user_data)],
+    user_repo: Annotated[UserRepository, Depends(get_user_repo)],
+    since: Annotated[int, Query(ge=0)],
+):
+    """
+    Returns the channels and posts changed after version `since`.
+
+    Apply ``deleted_*`` first, then upsert ``channels``/``scheduled_posts``
+    and keep ``version`` for the next call.  410 means the deletions since
+    that version are no longer known and the client must do a full load.
+    """
+    changes = await user_repo.get_changes(user_data["id"], since)
+    if changes is None:
+        raise HTTPException(status_code=404, detail="User not found. Load /api/v1/initial-data first.")
+    # Juda eski (tombstone'lar tozalangan) yoki boshqa bazaga tegishli versiya
+    if since < changes["sync_floor"] or since > changes["version"]:
+        raise HTTPException(status_code=410, detail="Sync version is no longer available. Reload all data.")
+
+    response.headers["ETag"] = _data_etag(changes["version"], changes["plan_id"])
+    plan_row = changes["plan"]
+    return SyncResponse(
+        version=changes["version"],
+        plan=Plan(**plan_row) if plan_row else None,
+        channels=[_channel_from_row(row) for row in changes["channels"]],
+        scheduled_posts=[_scheduled_post_from_row(row) for row in changes["scheduled_posts"]],
+        deleted_channels=changes["deleted_channels"],
+        deleted_posts=changes["deleted_posts"],
     )
 
 @app.post("/api/v1/channels", response_model=Channel)
@@ -215,34 +335,226 @@ async def add_channel(
         username=channel_data.get("username"),
     )
 
-@app.post("/api/v1/schedule-post", response_model=ScheduledPost)
-async def schedule_post(
-    request: SchedulePostRequest,
-    user_data: Annotated[dict, Depends(get_validated_user_data)],
-    scheduler_repo: Annotated[SchedulerRepository, Depends(get_scheduler_repo)],
-    subscription_service: Annotated[SubscriptionService, Depends(get_subscription_service)],
-):
-    user_id = user_data['id']
-    await subscription_service.check_post_limit(user_id)
-    
-    post_id = await scheduler_repo.create_scheduled_post(
-        user_id=user_id,
+def _post_fields(request: SchedulePostRequest) -> dict:
+    """SchedulePostRequest -> SchedulerRepository.create_scheduled_post(s) argumentlari."""
+    return dict(
         channel_id=request.channel_id,
         post_text=request.text,
         schedule_time=request.scheduled_at,
         media_id=request.media_id,
         media_type=request.media_type,
         inline_buttons=[button.model_dump() for button in request.buttons] if request.buttons else None,
+        recurrence_rule=request.recurrence,
+        media_group=[item.model_dump() for item in request.media_group] if request.media_group else None,
+        delete_after_seconds=request.delete_after_seconds,
     )
 
+def _scheduled_post_from_request(post_id: int, request: SchedulePostRequest) -> ScheduledPost:
     return ScheduledPost(
         id=post_id,
         channel_id=request.channel_id,
         text=request.text,
         media_id=request.media_id,
         media_type=request.media_type,
+        media_group=request.media_group,
         scheduled_at=request.scheduled_at,
         buttons=request.buttons,
+        recurrence=request.recurrence,
+        next_fire_at=request.scheduled_at,
+        delete_after_seconds=request.delete_after_seconds,
+    )
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or 'post'}: {item['msg']}" for item in error.errors()
+    )
+
+@app.post("/api/v1/schedule-post", response_model=ScheduledPost)
+async def schedule_post(
+    request: SchedulePostRequest,
+    user_data: Annotated[dict, Depends(get_validated_user_data)],
+    scheduler_repo: Annotated[SchedulerRepository, Depends(get_scheduler_repo)],
+    subscription_service: Annotated[SubscriptionService, Depends(get_subscription_service)],
+):
+    user_id = user_data['id']
+    await subscription_service.check_post_limit(user_id)
+    
+    post_id = await scheduler_repo.create_scheduled_post(user_id=user_id, **_post_fields(request))
+    return _scheduled_post_from_request(post_id, request)
+
+@app.post("/api/v1/schedule-posts:batch", response_model=SchedulePostsBatchResponse)
+async def schedule_posts_batch(
+    request: SchedulePostsBatchRequest,
+    user_data: Annotated[dict, Depends(get_validated_user_data)],
+    scheduler_repo: Annotated[SchedulerRepository, Depends(get_scheduler_repo)],
+    subscription_service: Annotated[SubscriptionService, Depends(get_subscription_service)],
+):
+    """
+    Schedules up to MAX_BATCH_POSTS posts with one quota check and one INSERT.
+
+    Every item gets a result at its index: invalid posts, posts over the
+    monthly quota (taken in request order) and posts for channels the
+    user does not own fail individually while the rest are created.
+    """
+    user_id = user_data['id']
+    results: list[Optional[BatchPostResult]] = [None] * len(request.posts)
+
+    # 1. Har bir elementni alohida tekshirish
+    valid: list[tuple[int, SchedulePostRequest]] = []
+    for index, raw in enumerate(request.posts):
+        try:
+            valid.append((index, SchedulePostRequest.model_validate(raw)))
+        except ValidationError as e:
+            results[index] = BatchPostResult(index=index, ok=False, error=_validation_message(e))
+
+    # 2. Tarif limitini butun partiya uchun bir marta tekshirish
+    remaining = await subscription_service.get_remaining_post_quota(user_id)
+    if remaining is not None and len(valid) > remaining:
+        for index, _ in valid[remaining:]:
+            results[index] = BatchPostResult(index=index, ok=False, error="Monthly post limit reached.")
+        valid = valid[:remaining]
+
+    # 3. Qolganlarini bitta so'rov bilan yozish
+    post_ids = await scheduler_repo.create_scheduled_posts(
+        user_id, [_post_fields(post) for _, post in valid]
+    ) if valid else []
+    for (index, post), post_id in zip(valid, post_ids):
+        if post_id is None:
+            results[index] = BatchPostResult(index=index, ok=False, error="Channel not found.")
+        else:
+            results[index] = BatchPostResult(
+                index=index, ok=True, post=_scheduled_post_from_request(post_id, post)
+            )
+
+    created = sum(1 for result in results if result.ok)
+    return SchedulePostsBatchResponse(created=created, failed=len(results) - created, results=results)
+
+@app.post("/api/v1/posts/{post_id}/actions", response_model=PostAction)
+async def schedule_post_action(
+    post_id: int,
+    request: PostActionRequest,
+    user_data: Annotated[dict, Depends(get_validated_user_data)],
+    action_repo: Annotated[PostActionRepository, Depends(get_post_action_repo)],
+):
+    """Schedules a delete or edit of a published post at ``run_at``."""
+    payload = {"text": request.text} if request.action == "edit" else None
+    action_id = await action_repo.create_action(
+        scheduled_post_id=post_id,
+        user_id=user_data['id'],
+        action=request.action,
+        run_at=request.run_at,
+        payload=payload,
+    )
+    if action_id is None:
+        raise HTTPException(status_code=404, detail="Post not found or you don't have permission.")
+
+    return PostAction(id=action_id, post_id=post_id, action=request.action, run_at=request.run_at)
+
+@app.get("/api/v1/channels/{channel_id}/top-posts", response_model=TopPostsPage)
+async def get_top_posts(
+    channel_id: int,
+    user_data: Annotated[dict, Depends(get_validated_user_data)],
+    channel_repo: Annotated[ChannelRepository, Depends(get_channel_repo)],
+    analytics_service: Annotated[AnalyticsService, Depends(get_analytics_service)],
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    after: Annotated[str | None, Query()] = None,
+):
+    """Returns the channel's posts ordered by views, paginated with a keyset cursor."""
+    channel_row = await channel_repo.get_channel_by_id(channel_id)
+    if not channel_row or channel_row["user_id"] != user_data['id']:
+        raise HTTPException(status_code=404, detail="Channel not found or you don't have permission.")
+
+    try:
+        cursor = decode_cursor(after, 2) if after else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+    rows, next_after = await analytics_service.get_posts_ordered_by_views(channel_id, limit=limit, after=cursor)
+    return TopPostsPage(
+        posts=[
+            TopPost(
+                id=row["id"],
+                views=row["views"],
+                text=row.get("post_text"),
+                media_type=row.get("media_type"),
+                scheduled_at=row.get("schedule_time"),
+            )
+            for row in rows
+        ],
+        next_cursor=encode_cursor(*next_after) if next_after else None,
+    )
+
+@app.get("/api/v1/analytics/engagement", response_model=list[ChannelEngagementStats])
+async def get_engagement(
+    user_data: Annotated[dict, Depends(get_validated_user_data)],
+    channel_repo: Annotated[ChannelRepository, Depends(get_channel_repo)],
+    analytics_service: Annotated[AnalyticsService, Depends(get_analytics_service)],
+    days: Annotated[int, Query(ge=1, le=90)] = 30,
+):
+    """Returns engagement metrics for all of the user's channels, computed in one pass."""
+    channel_ids = [row["id"] for row in await channel_repo.get_user_channels(user_data['id'])]
+    if not channel_ids:
+        return []
+
+    metrics = await analytics_service.get_channel_engagement(channel_ids=channel_ids, days=days)
+    return [
+        ChannelEngagementStats(
+            channel_id=stats.channel_id,
+            posts=stats.posts,
+            velocity=stats.velocity,
+            half_life_hours=stats.half_life_hours,
+            median_views=stats.median_views,
+            top_posts=[
+                EngagementTopPost(post_id=post_id, relative_engagement=ratio)
+                for post_id, ratio in stats.top_posts
+            ],
+            heatmap=stats.heatmap,
+            best_hour_of_week=stats.best_hour_of_week,
+        )
+        for stats in metrics.values()
+    ]
+
+@app.get("/api/v1/analytics/percentiles", response_model=list[ChannelViewPercentiles])
+async def get_view_percentiles(
+    user_data: Annotated[dict, Depends(get_validated_user_data)],
+    channel_repo: Annotated[ChannelRepository, Depends(get_channel_repo)],
+    analytics_service: Annotated[AnalyticsService, Depends(get_analytics_service)],
+    days: Annotated[int, Query(ge=1, le=365)] = 30,
+    per_day: bool = False,
+):
+    """Returns p50/p90/p99 of 24-hour post views for each of the user's channels."""
+    channel_ids = [row["id"] for row in await channel_repo.get_user_channels(user_data['id'])]
+    if not channel_ids:
+        return []
+
+    percentiles = await analytics_service.get_view_percentiles(channel_ids, days=days, per_day=per_day)
+    return [
+        ChannelViewPercentiles(channel_id=channel_id, **stats)
+        for channel_id, stats in percentiles.items()
+    ]
+
+@app.get("/api/v1/export/posts", tags=["Export"])
+async def export_posts(
+    user_data: Annotated[dict, Depends(get_validated_user_data)],
+    analytics_repo: Annotated[AnalyticsRepository, Depends(get_analytics_repo)],
+    current_settings: Annotated[Settings, Depends(get_settings)],
+    format: Annotated[Literal["csv", "parquet"], Query()] = "csv",
+):
+    """
+    Streams all of the user's posts, their sent copies and views as CSV or Parquet.
+
+    Rows are read through a server-side cursor and encoded batch by batch,
+    so memory use does not depend on the size of the account.
+    """
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export is not available on this server.")
+
+    batches = analytics_repo.iter_post_export(user_data['id'], batch_size=current_settings.EXPORT_BATCH_SIZE)
+    encode = parquet_stream if format == "parquet" else csv_stream
+    return StreamingResponse(
+        encode(list(POST_EXPORT_COLUMNS), batches),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="posts.{format}"'},
     )
 
 @app.delete("/api/v1/posts/{post_id}", response_model=MessageResponse)
@@ -0,0 +1,49 @@
+import argparse
+import asyncio
+import logging
+
+import redis.asyncio as redis
+from aiogram import Bot
+from asyncpg import Pool
+
+from bot.container import container
+from bot.database.db import create_pool
+from bot.database.repositories import AnalyticsRepository
+from bot.services import AnalyticsService
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def main(args: argparse.Namespace):
+    """Kanal rollup'larini post_view_snapshots va sent_posts asosida qayta hisoblaydi."""
+    pool: Pool = await create_pool()
+    container.register(Pool, instance=pool)
+    analytics_repo = container.resolve(AnalyticsRepository)
+    analytics_service = container.resolve(AnalyticsService)
+
+    try:
+        if args.reset:
+            await analytics_repo.reset_channel_rollups()
+            logger.info("Rollup tables truncated, rebuilding from the first sent post.")
+        watermark = await analytics_service.refresh_channel_rollups()
+        if watermark:
+            logger.info(f"✅ Channel rollups are up to date as of {watermark:%Y-%m-%d %H:%M:%S}.")
+        else:
+            logger.info("Channel rollups were already up to date.")
+    finally:
+        await container.resolve(Bot).session.close()
+        await container.resolve(redis.Redis).aclose()
+        await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Backfill the per-channel hourly/daily rollups up to the configured lag."
+    )
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="Truncate the rollups and rebuild them from scratch instead of continuing from the watermark.",
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -6,12 +6,14 @@ from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.redis import RedisStorage, DefaultKeyBuilder
 
 from bot.config import settings
+from bot.container import container
 from bot.database.db import create_pool
 from bot.handlers import admin_handlers, user_handlers
 from bot.middlewares.dependency_middleware import DependencyMiddleware
 
 # i18n middleware'ni import qilamiz
 from bot.middlewares.i18n import i18n_middleware
+from bot.utils.charts import ChartRenderer
 
 # Logger sozlamalari
 logging.basicConfig(level=logging.INFO)
@@ -56,6 +58,8 @@ async def main():
         # To'xtatilganda ulanishlarni yopish
         await dp.storage.close()
         await bot.session.close()
+        # /stats grafiklari uchun ochilgan jarayonlar pool'ini to'xtatish
+        container.resolve(ChartRenderer).close()
         await pool.close()
 
 if __name__ == "__main__":
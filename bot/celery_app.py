@@ -14,13 +14,41 @@ celery_app = Celery(
 
 # Davriy vazifalarni (Celery Beat) sozlash
 celery_app.conf.beat_schedule = {
-    'send-scheduled-messages-every-minute': {
+    # Postlar asosan 'run_dispatcher.py' (Redis navbati) orqali darhol yuboriladi.
+    # Bu vazifa faqat zaxira sifatida qolgan postlarni yig'ib oladi.
+    'send-scheduled-messages-fallback': {
         'task': 'bot.tasks.send_scheduled_message',
-        'schedule': 60.0,  # Har 60 soniyada ishga tushadi
+        'schedule': 300.0,  # Har 5 daqiqada ishga tushadi
     },
-    'update-post-views-every-15-minutes': {
+    'execute-post-actions-fallback': {
+        'task': 'bot.tasks.execute_post_actions_task',
+        'schedule': 300.0,
+    },
+    'reconcile-delay-queue-every-5-minutes': {
+        'task': 'bot.tasks.reconcile_delay_queue_task',
+        'schedule': 300.0,
+    },
+    # Har bir ishga tushishda faqat yangilash vaqti kelgan postlar so'raladi,
+    # shuning uchun eng yangi postlar uchun 5 daqiqalik bosqichga mos ravishda ishlaydi
+    'update-post-views-every-5-minutes': {
         'task': 'bot.tasks.update_post_views_task',
-        'schedule': 900.0, # Har 900 soniyada (15 daqiqada) ishga tushadi
+        'schedule': 300.0, # Har 300 soniyada (5 daqiqada) ishga tushadi
+    },
+    'refresh-channel-rollups-every-5-minutes': {
+        'task': 'bot.tasks.refresh_channel_rollups_task',
+        'schedule': 300.0,
+    },
+    'ensure-view-snapshot-partitions-daily': {
+        'task': 'bot.tasks.ensure_view_snapshot_partitions_task',
+        'schedule': 86400.0,
+    },
+    'purge-sync-tombstones-daily': {
+        'task': 'bot.tasks.purge_sync_tombstones_task',
+        'schedule': 86400.0,
+    },
+    'release-expired-leases-every-minute': {
+        'task': 'bot.tasks.release_expired_leases_task',
+        'schedule': 60.0,
     },
 }
 
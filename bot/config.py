@@ -37,6 +37,73 @@ class Settings(BaseSettings):
     # Media-fayllarni saqlash uchun "ombor" kanal IDsi
     STORAGE_CHANNEL_ID: int
 
+    # Media yuklash: bir vaqtda ishlanadigan yuklashlar, xeshlash/yuborishda o'qiladigan bo'lak
+    # va Bot API chegarasi (baytlarda; Content-Length undan katta bo'lsa so'rov tanasi o'qilmaydi)
+    MEDIA_UPLOAD_CONCURRENCY: int = 8
+    MEDIA_UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    MEDIA_MAX_UPLOAD_BYTES: int = 50 * 1024 * 1024
+
+    # --- Rejalashtirilgan postlarni yuborish (dispatcher) sozlamalari ---
+    # Bot uchun umumiy limit (Telegram: ~30 xabar/soniya); Redis orqali barcha worker'lar uchun bitta
+    DISPATCH_GLOBAL_RATE: float = 30.0
+    # Bitta kanal/guruh uchun limit (Telegram: ~20 xabar/daqiqa)
+    DISPATCH_CHAT_RATE: float = 20 / 60
+    DISPATCH_CHAT_BURST: float = 1.0
+    # Bir vaqtning o'zida Telegram'ga yuboriladigan so'rovlar soni
+    DISPATCH_CONCURRENCY: int = 50
+    # Bir worker bir martada band qiladigan postlar soni va lease muddati (soniya)
+    DISPATCH_BATCH_SIZE: int = 500
+    DISPATCH_LEASE_SECONDS: int = 600
+    # Redis navbati bo'sh bo'lganda tekshirishlar orasidagi eng uzoq pauza (soniya)
+    DELAY_QUEUE_POLL_INTERVAL: float = 1.0
+    # Dispatcher to'xtab qolgandan keyingi "catch-up" rejimi:
+    # shundan ko'proq kechikkan postlar yuborilmaydi ('expired'); 0 - cheklovsiz
+    DISPATCH_MAX_LATENESS_SECONDS: int = 3600
+    # Shu oynadan kam kechikkan postlar "o'z vaqtida" hisoblanadi va birinchi yuboriladi
+    DISPATCH_ON_TIME_WINDOW_SECONDS: int = 120
+    # Eski (backlog) postlar uchun alohida tezlik va bir vaqtda ishlanadigan postlar soni
+    DISPATCH_BACKLOG_RATE: float = 10.0
+    DISPATCH_BACKLOG_BUDGET: int = 300
+    # Yuborilmagan postlarni qayta urinish (retry) sozlamalari
+    RETRY_MAX_ATTEMPTS: int = 5
+    RETRY_BASE_DELAY: float = 5.0
+    RETRY_MAX_DELAY: float = 900.0
+    # Yuborish natijalarini bazaga yozishdan oldin yig'ish (hajm va vaqt bo'yicha)
+    SEND_RESULT_BATCH_SIZE: int = 200
+    SEND_RESULT_FLUSH_INTERVAL: float = 1.0
+
+    # Ko'rishlar soni Bot API'da yo'q: MTProto (telethon) orqali bot tokeni bilan o'qiladi.
+    # my.telegram.org'dan olingan api_id/api_hash; berilmasa ko'rishlar yig'ilmaydi
+    TELEGRAM_API_ID: Optional[int] = None
+    TELEGRAM_API_HASH: Optional[SecretStr] = None
+    # Ko'rishlar sonini yig'ish: parallel so'rovlar, bitta so'rovdagi xabarlar soni
+    VIEWS_CONCURRENCY: int = 10
+    VIEWS_BATCH_SIZE: int = 100
+    # Bir martada band qilinadigan (va keyingi vaqtga suriladigan) postlar soni
+    VIEWS_CLAIM_BATCH_SIZE: int = 2000
+    # AIMD tezlik nazorati (so'rov/soniya): RetryAfter kelganda tezlik kamayadi
+    VIEWS_INITIAL_RATE: float = 5.0
+    VIEWS_MIN_RATE: float = 0.5
+    VIEWS_MAX_RATE: float = 25.0
+    # Rollup'lar shuncha soniya orqada yuradi: kechikib yozilgan snapshot'lar o'tkazib yuborilmasligi uchun
+    ROLLUP_LAG_SECONDS: int = 900
+    # Bitta tranzaksiyada qayta ishlanadigan eng uzun vaqt oralig'i (soat)
+    ROLLUP_MAX_SPAN_HOURS: int = 24
+    # Grafiklar alohida jarayonlarda chiziladi; tayyor PNG'lar Redis'da keshlanadi
+    CHART_WORKERS: int = 2
+    CHART_CACHE_TTL: int = 86400
+    CHART_DAYS: int = 30
+    # Eksportda serverdagi kursordan bir martada o'qiladigan qatorlar (Parquet'da bitta row group)
+    EXPORT_BATCH_SIZE: int = 5000
+
+    # TWA initData: auth_date shundan eski bo'lsa rad etiladi (soniya; 0 - cheklovsiz)
+    INIT_DATA_MAX_AGE_SECONDS: int = 86400
+    # Tekshirilgan initData'lar keshi (yozuvlar soni va yashash muddati, soniya)
+    INIT_DATA_CACHE_SIZE: int = 1024
+    INIT_DATA_CACHE_TTL: float = 300.0
+    # /sync uchun o'chirilgan kanal/postlar izlari shuncha kun saqlanadi; eskiroq versiyali mijoz to'liq qayta yuklaydi
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = 30
+
     # I18n (Lokalizatsiya) sozlamalari
     SUPPORTED_LOCALES: list[str] = ["en", "uz"]
     DEFAULT_LOCALE: str = "uz"
@@ -1,5 +1,7 @@
 import punq
+import redis.asyncio as redis
 from aiogram import Bot
+from asyncpg import Pool
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
@@ -12,13 +14,24 @@ from bot.database.repositories import (
     ChannelRepository,
     SchedulerRepository,
     AnalyticsRepository,
+    MediaRepository,
+    PostActionRepository,
 )
 from bot.services import (
     SubscriptionService,
     GuardService,
+    MediaService,
+    PostActionService,
     SchedulerService,
+    SendResultBuffer,
     AnalyticsService,
 )
+from bot.services.auth_service import InitDataVerifier
+from bot.utils.charts import ChartRenderer
+from bot.utils.delay_queue import DelayQueue, PostActionQueue
+from bot.utils.rate_limiter import AIMDRateController, RateLimiter
+from bot.utils.retry_policy import RetryPolicy
+from bot.utils.views_source import MTProtoViewsSource
 
 def create_async_pool(db_url: str) -> async_sessionmaker:
     """Ma'lumotlar bazasi uchun asinxron ulanishlar pulini (pool) yaratadi."""
@@ -38,13 +51,13 @@ def get_container() -> punq.Container:
 
     # --- YECHIM: Bot'ni ro'yxatdan o'tkazishning to'g'ri usuli ---
     # Avval funksiyani aniqlaymiz...
-    def get_bot_instance(settings: Settings) -> Bot:
+    def get_bot_instance(settings: Settings = config) -> Bot:
         return Bot(
             token=settings.BOT_TOKEN.get_secret_value(),
             default=DefaultBotProperties(parse_mode=ParseMode.HTML)
         )
     # ...keyin uni 'factory' sifatida to'g'ridan-to'g'ri metod orqali registratsiya qilamiz.
-    # Bu 'punq'ga 'settings' obyektini avtomatik topib, funksiyaga uzatish imkonini beradi.
+    # punq factory argumentlarini o'zi topmaydi, shuning uchun 'settings' standart qiymat sifatida beriladi.
     container.register(Bot, factory=get_bot_instance, scope=punq.Scope.singleton)
     # --------------------------------------------------------------
 
@@ -52,17 +65,100 @@ def get_container() -> punq.Container:
     container.register(Settings, instance=config)
     container.register(async_sessionmaker, instance=pool)
 
+    # Yuborish tezligini cheklovchi obyekt jarayon (process) uchun yagona bo'lishi kerak;
+    # bucket'lar Redis'da, shuning uchun barcha worker'lar bitta limitni bo'lishadi
+    def get_rate_limiter(settings: Settings = config) -> RateLimiter:
+        return RateLimiter(
+            global_rate=settings.DISPATCH_GLOBAL_RATE,
+            chat_rate=settings.DISPATCH_CHAT_RATE,
+            chat_burst=settings.DISPATCH_CHAT_BURST,
+            backlog_rate=settings.DISPATCH_BACKLOG_RATE,
+            backlog_burst=settings.DISPATCH_BACKLOG_RATE,
+            redis_conn=container.resolve(redis.Redis),
+            key_prefix="ratelimit:dispatch",
+        )
+    container.register(RateLimiter, factory=get_rate_limiter, scope=punq.Scope.singleton)
+
+    # Ko'rishlarni yig'ish tezligi Redis'da: ishga tushishlar va worker'lar orasida saqlanib qoladi
+    def get_views_rate_controller(settings: Settings = config) -> AIMDRateController:
+        return AIMDRateController(
+            initial_rate=settings.VIEWS_INITIAL_RATE,
+            min_rate=settings.VIEWS_MIN_RATE,
+            max_rate=settings.VIEWS_MAX_RATE,
+            redis_conn=container.resolve(redis.Redis),
+            key="ratelimit:views",
+        )
+    container.register(AIMDRateController, factory=get_views_rate_controller, scope=punq.Scope.singleton)
+
+    # initData tekshiruvchisi: maxfiy kalit bir marta hisoblanadi, kesh jarayon uchun yagona
+    def get_init_data_verifier(settings: Settings = config) -> InitDataVerifier:
+        return InitDataVerifier(
+            bot_token=settings.BOT_TOKEN.get_secret_value(),
+            max_age_seconds=settings.INIT_DATA_MAX_AGE_SECONDS,
+            cache_size=settings.INIT_DATA_CACHE_SIZE,
+            cache_ttl=settings.INIT_DATA_CACHE_TTL,
+        )
+    container.register(InitDataVerifier, factory=get_init_data_verifier, scope=punq.Scope.singleton)
+
+    # Grafik chizuvchi jarayonlar puli ham jarayon uchun yagona
+    def get_chart_renderer(settings: Settings = config) -> ChartRenderer:
+        return ChartRenderer(max_workers=settings.CHART_WORKERS)
+    container.register(ChartRenderer, factory=get_chart_renderer, scope=punq.Scope.singleton)
+
+    # Ko'rishlarni o'qiydigan MTProto sessiyasi jarayon uchun yagona (ulanish birinchi so'rovda ochiladi)
+    def get_views_source(settings: Settings = config) -> MTProtoViewsSource:
+        return MTProtoViewsSource(
+            api_id=settings.TELEGRAM_API_ID,
+            api_hash=settings.TELEGRAM_API_HASH.get_secret_value() if settings.TELEGRAM_API_HASH else None,
+            bot_token=settings.BOT_TOKEN.get_secret_value(),
+        )
+    container.register(MTProtoViewsSource, factory=get_views_source, scope=punq.Scope.singleton)
+
+    def get_retry_policy(settings: Settings = config) -> RetryPolicy:
+        return RetryPolicy(
+            max_attempts=settings.RETRY_MAX_ATTEMPTS,
+            base_delay=settings.RETRY_BASE_DELAY,
+            max_delay=settings.RETRY_MAX_DELAY,
+        )
+    container.register(RetryPolicy, factory=get_retry_policy, scope=punq.Scope.singleton)
+
+    # Redis ulanishi va rejalashtirilgan postlar uchun kechiktirilgan navbat
+    def get_redis_instance(settings: Settings = config) -> redis.Redis:
+        return redis.from_url(settings.REDIS_URL.unicode_string())
+    container.register(redis.Redis, factory=get_redis_instance, scope=punq.Scope.singleton)
+    container.register(DelayQueue, scope=punq.Scope.singleton)
+    container.register(PostActionQueue, scope=punq.Scope.singleton)
+
     # Repozitoriy'larni registratsiya qilamiz
     container.register(UserRepository)
     container.register(PlanRepository)
     container.register(ChannelRepository)
-    container.register(SchedulerRepository)
     container.register(AnalyticsRepository)
+    container.register(MediaRepository)
+
+    # punq Optional[...] parametrlarni to'ldirmaydi (standart None qoladi),
+    # shuning uchun navbatlar aniq uzatiladi. Pool ishga tushishda registratsiya qilinadi.
+    def get_scheduler_repository() -> SchedulerRepository:
+        return SchedulerRepository(
+            container.resolve(Pool),
+            delay_queue=container.resolve(DelayQueue),
+            action_queue=container.resolve(PostActionQueue),
+        )
+    container.register(SchedulerRepository, factory=get_scheduler_repository)
+
+    def get_post_action_repository() -> PostActionRepository:
+        return PostActionRepository(container.resolve(Pool), action_queue=container.resolve(PostActionQueue))
+    container.register(PostActionRepository, factory=get_post_action_repository)
 
     # Servis'larni registratsiya qilamiz
     container.register(SubscriptionService)
     container.register(GuardService)
+    # Yuklashlar cheklovi (semaphore) jarayon uchun yagona bo'lishi kerak
+    container.register(MediaService, scope=punq.Scope.singleton)
+    # Natijalar buferi jarayon uchun yagona bo'lishi kerak
+    container.register(SendResultBuffer, scope=punq.Scope.singleton)
     container.register(SchedulerService)
+    container.register(PostActionService)
     container.register(AnalyticsService)
 
     return container
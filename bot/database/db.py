@@ -1,6 +1,14 @@
+import json
+
 import asyncpg
 from bot.config import settings
 
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    # JSON ustunlari (inline_buttons, media_group) Python obyektlari sifatida o'qiladi va yoziladi
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
 async def create_pool():
     """
     Creates a connection pool to the PostgreSQL database.
@@ -10,5 +18,7 @@ async def create_pool():
     """
     # Pydantic v2'dagi maxsus URL obyektini oddiy matnga (string) o'giramiz
     dsn_string = str(settings.DATABASE_URL.unicode_string())
+    # asyncpg SQLAlchemy'ning "postgresql+asyncpg" sxemasini tanimaydi
+    dsn_string = dsn_string.replace("postgresql+asyncpg://", "postgresql://", 1)
     
-    return await asyncpg.create_pool(dsn=dsn_string)
+    return await asyncpg.create_pool(dsn=dsn_string, init=_init_connection)
@@ -18,7 +18,11 @@ users = sa.Table(
     sa.Column('id', sa.BigInteger, primary_key=True, autoincrement=False),
     sa.Column('username', sa.String(255)),
     sa.Column('plan_id', sa.Integer, sa.ForeignKey('plans.id'), default=1),
-    sa.Column('created_at', sa.DateTime, server_default=sa.func.now())
+    sa.Column('created_at', sa.DateTime, server_default=sa.func.now()),
+    # TWA delta sync: kanal/postlarning har bir o'zgarishida oshadigan hisoblagich (triggerlar SQL'da,
+    # init.sql / init_db.py) va tombstone'lar tozalangan eng katta versiya
+    sa.Column('data_version', sa.BigInteger, nullable=False, server_default='0'),
+    sa.Column('sync_floor', sa.BigInteger, nullable=False, server_default='0')
 )
 
 # 3. 'channels' table (depends on 'users')
@@ -28,7 +32,10 @@ channels = sa.Table(
     sa.Column('user_id', sa.BigInteger, sa.ForeignKey('users.id'), nullable=False),
     sa.Column('title', sa.String(255)),
     sa.Column('username', sa.String(255), unique=True),
-    sa.Column('created_at', sa.DateTime, server_default=sa.func.now())
+    sa.Column('created_at', sa.DateTime, server_default=sa.func.now()),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    sa.Column('version', sa.BigInteger, nullable=False, server_default='0'),
+    sa.Index('ix_channels_user_version', 'user_id', 'version'),
 )
 
 # 4. 'scheduled_posts' table (depends on 'users' and 'channels')
@@ -44,7 +51,33 @@ scheduled_posts = sa.Table(
     sa.Column('status', sa.String(50), default='pending'),
     sa.Column('schedule_time', sa.DateTime(timezone=True)),
     sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
-    sa.Column('views', sa.Integer, default=0)
+    sa.Column('views', sa.Integer, default=0),
+    # Bir nechta worker bir postni ikki marta yubormasligi uchun "lease" ma'lumotlari
+    sa.Column('lease_owner', sa.String(255)),
+    sa.Column('lease_expires_at', sa.DateTime(timezone=True)),
+    # Qayta urinishlar (retry) hisobi
+    sa.Column('attempts', sa.Integer, nullable=False, server_default='0'),
+    sa.Column('last_error', sa.Text),
+    # Takrorlanuvchi postlar (cron ifodasi) va navbatdagi yuborish vaqti.
+    # Dispatcher faqat 'next_fire_at' bo'yicha ishlaydi: bir martalik postlar uchun
+    # u 'schedule_time' ga teng, qayta urinishlar va takrorlanishlar uni suradi.
+    sa.Column('recurrence_rule', sa.String(255)),
+    sa.Column('next_fire_at', sa.DateTime(timezone=True)),
+    # Albom (media group): [{"media_id": ..., "media_type": ...}, ...]
+    sa.Column('media_group', sa.JSON),
+    # Har bir yuborilgan nusxa shuncha soniyadan keyin avtomatik o'chiriladi
+    sa.Column('delete_after_seconds', sa.Integer),
+    # Foydalanuvchi ko'radigan o'zgarishlar versiyasi (views, lease va urinishlar uni oshirmaydi)
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    sa.Column('version', sa.BigInteger, nullable=False, server_default='0'),
+    sa.Index('ix_scheduled_posts_user_version', 'user_id', 'version'),
+    sa.Index('ix_scheduled_posts_next_fire_at', 'next_fire_at', postgresql_where=sa.text("status = 'pending'")),
+    sa.Index('ix_scheduled_posts_lease', 'lease_expires_at', postgresql_where=sa.text("status = 'claimed'")),
+    # Eng ko'p ko'rilgan postlar ro'yxati (keyset sahifalash) shu indeksdan o'qiladi
+    sa.Index(
+        'ix_scheduled_posts_channel_views', 'channel_id', sa.text('views DESC'), 'id',
+        postgresql_where=sa.text("views IS NOT NULL"),
+    ),
 )
 
 # 5. 'sent_posts' table (depends on 'scheduled_posts' and 'channels')
@@ -54,7 +87,103 @@ sent_posts = sa.Table(
     sa.Column('scheduled_post_id', sa.Integer, sa.ForeignKey('scheduled_posts.id'), nullable=False),
     sa.Column('channel_id', sa.BigInteger, sa.ForeignKey('channels.id'), nullable=False),
     sa.Column('message_id', sa.BigInteger, nullable=False),
-    sa.Column('sent_at', sa.DateTime(timezone=True), server_default=sa.func.now())
+    sa.Column('sent_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    # Ko'rishlar sonini navbatdagi yangilash vaqti; NULL - post "muzlatilgan"
+    sa.Column('next_refresh_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    # Post 24 soatlik bo'lgandan keyingi birinchi kuzatuvdagi ko'rishlar (bir marta yoziladi)
+    sa.Column('views_24h', sa.Integer),
+    sa.Index('ix_sent_posts_scheduled_post_id', 'scheduled_post_id'),
+    sa.Index('ix_sent_posts_sent_at', 'sent_at'),
+    sa.Index('ix_sent_posts_next_refresh_at', 'next_refresh_at', postgresql_where=sa.text("next_refresh_at IS NOT NULL")),
+)
+
+# 6. 'dead_letter_posts' table (depends on 'scheduled_posts' and 'channels')
+# Barcha urinishlardan keyin ham yuborilmagan postlar shu yerga tushadi
+dead_letter_posts = sa.Table(
+    'dead_letter_posts', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('scheduled_post_id', sa.Integer, sa.ForeignKey('scheduled_posts.id', ondelete='CASCADE'), nullable=False, unique=True),
+    sa.Column('channel_id', sa.BigInteger, sa.ForeignKey('channels.id'), nullable=False),
+    sa.Column('attempts', sa.Integer, nullable=False),
+    sa.Column('error', sa.Text),
+    sa.Column('failed_at', sa.DateTime(timezone=True), server_default=sa.func.now())
+)
+
+# 7. 'media_files' table (no dependencies)
+# Yuklangan fayllar kontent xeshi (sha256) bo'yicha Telegram file_id'siga bog'lanadi,
+# shuning uchun bir xil fayl Telegram serverlariga qayta yuklanmaydi
+media_files = sa.Table(
+    'media_files', metadata,
+    sa.Column('sha256', sa.String(64), primary_key=True),
+    sa.Column('file_id', sa.String(255), nullable=False),
+    sa.Column('media_type', sa.String(50), nullable=False),
+    sa.Column('file_size', sa.BigInteger),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now())
+)
+
+# 8. 'post_actions' table (depends on 'scheduled_posts' and 'sent_posts')
+# Yuborilgan postlar ustida rejalashtirilgan amallar: 'delete' yoki 'edit'
+post_actions = sa.Table(
+    'post_actions', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('scheduled_post_id', sa.Integer, sa.ForeignKey('scheduled_posts.id', ondelete='CASCADE'), nullable=False),
+    # Aniq nusxa; bo'sh bo'lsa postning eng so'nggi yuborilgan nusxasi olinadi
+    sa.Column('sent_post_id', sa.Integer, sa.ForeignKey('sent_posts.id', ondelete='CASCADE')),
+    sa.Column('action', sa.String(20), nullable=False),
+    sa.Column('payload', sa.JSON),
+    sa.Column('run_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('status', sa.String(50), nullable=False, server_default='pending'),
+    sa.Column('lease_owner', sa.String(255)),
+    sa.Column('lease_expires_at', sa.DateTime(timezone=True)),
+    sa.Column('attempts', sa.Integer, nullable=False, server_default='0'),
+    sa.Column('last_error', sa.Text),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    sa.Index('ix_post_actions_run_at', 'run_at', postgresql_where=sa.text("status = 'pending'")),
+    sa.Index('ix_post_actions_lease', 'lease_expires_at', postgresql_where=sa.text("status = 'claimed'")),
+)
+
+# 9. 'post_view_snapshots' table (append-only, partitioned by month)
+# Ko'rishlar tarixi: har bir yangilashda yuborilgan nusxa (sent_posts.id) uchun bitta qator.
+# Bo'limlar (partition) bot/utils/partitions.py yordamida oldindan yaratiladi
+post_view_snapshots = sa.Table(
+    'post_view_snapshots', metadata,
+    sa.Column('post_id', sa.Integer, nullable=False),
+    sa.Column('ts', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('views', sa.Integer, nullable=False),
+    sa.Index('ix_post_view_snapshots_post_id_ts', 'post_id', 'ts'),
+    postgresql_partition_by='RANGE (ts)',
+)
+
+# 10. 'channel_stats_hourly' table (rollup, no dependencies)
+# Kanal bo'yicha soatlik statistika; post_view_snapshots'dan bosqichma-bosqich to'ldiriladi
+channel_stats_hourly = sa.Table(
+    'channel_stats_hourly', metadata,
+    sa.Column('channel_id', sa.BigInteger, primary_key=True, autoincrement=False),
+    sa.Column('bucket', sa.DateTime(timezone=True), primary_key=True),
+    sa.Column('posts_sent', sa.Integer, nullable=False, server_default='0'),
+    sa.Column('views_gained', sa.BigInteger, nullable=False, server_default='0'),
+    # Shu oraliqda yuborilgan postlarning to'plagan ko'rishlari (o'rtacha = sent_post_views / posts_sent)
+    sa.Column('sent_post_views', sa.BigInteger, nullable=False, server_default='0'),
+)
+
+# 11. 'channel_stats_daily' table (rollup, no dependencies)
+# Kanal bo'yicha kunlik statistika (UTC kunlari)
+channel_stats_daily = sa.Table(
+    'channel_stats_daily', metadata,
+    sa.Column('channel_id', sa.BigInteger, primary_key=True, autoincrement=False),
+    sa.Column('bucket', sa.DateTime(timezone=True), primary_key=True),
+    sa.Column('posts_sent', sa.Integer, nullable=False, server_default='0'),
+    sa.Column('views_gained', sa.BigInteger, nullable=False, server_default='0'),
+    # Shu oraliqda yuborilgan postlarning to'plagan ko'rishlari (o'rtacha = sent_post_views / posts_sent)
+    sa.Column('sent_post_views', sa.BigInteger, nullable=False, server_default='0'),
+)
+
+# 12. 'rollup_watermarks' table (no dependencies)
+# Har bir rollup qaysi vaqtgacha hisoblanganini saqlaydi
+rollup_watermarks = sa.Table(
+    'rollup_watermarks', metadata,
+    sa.Column('name', sa.String(100), primary_key=True),
+    sa.Column('watermark', sa.DateTime(timezone=True), nullable=False),
 )
 
 # This dataclass does not affect the database schema
@@ -64,4 +193,26 @@ class SubscriptionStatus:
     max_channels: int
     current_channels: int
     max_posts_per_month: int
-    current_posts_this_month: int
\ No newline at end of file
+    current_posts_this_month: int
+
+# 13. 'view_sketches' table (no dependencies)
+# Kanal va kun (post yuborilgan UTC kuni) bo'yicha views_24h taqsimotining t-digest'i
+view_sketches = sa.Table(
+    'view_sketches', metadata,
+    sa.Column('channel_id', sa.BigInteger, primary_key=True, autoincrement=False),
+    sa.Column('day', sa.Date, primary_key=True),
+    sa.Column('sketch', sa.LargeBinary, nullable=False),
+)
+
+# 14. 'sync_tombstones' table (no dependencies)
+# O'chirilgan kanal/postlar izi: TWA /sync ularni mijozdan ham olib tashlaydi.
+# Qatorlarni kanallar va postlardagi AFTER DELETE triggerlari yozadi.
+sync_tombstones = sa.Table(
+    'sync_tombstones', metadata,
+    sa.Column('user_id', sa.BigInteger, primary_key=True, autoincrement=False),
+    sa.Column('entity', sa.String(20), primary_key=True),
+    sa.Column('entity_id', sa.BigInteger, primary_key=True, autoincrement=False),
+    sa.Column('version', sa.BigInteger, nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    sa.Index('ix_sync_tombstones_user_version', 'user_id', 'version'),
+)
@@ -3,6 +3,8 @@ from .channel_repository import ChannelRepository
 from .scheduler_repository import SchedulerRepository
 from .analytics_repository import AnalyticsRepository
 from .plan_repository import PlanRepository # <-- ADDED
+from .media_repository import MediaRepository
+from .post_action_repository import PostActionRepository
 
 __all__ = [
     "UserRepository",
@@ -10,4 +12,6 @@ __all__ = [
     "SchedulerRepository",
     "AnalyticsRepository",
     "PlanRepository", # <-- ADDED
+    "MediaRepository",
+    "PostActionRepository",
 ]
@@ -1,5 +1,30 @@
+from datetime import date, datetime
 from asyncpg import Pool
-from typing import List, Dict, Any
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
+
+from bot.utils.partitions import monthly_partition_ddl, utc_today
+from bot.utils.tdigest import TDigest
+
+# Rollup jadvallari va ularning vaqt birligi (date_trunc uchun)
+ROLLUP_TABLES = {
+    "hour": "channel_stats_hourly",
+    "day": "channel_stats_daily",
+}
+CHANNEL_ROLLUP_WATERMARK = "channel_stats"
+
+# Eksport ustunlari: nom -> SQL ifodasi (tartib fayldagi ustunlar tartibi)
+POST_EXPORT_COLUMNS = {
+    "post_id": "sp.id",
+    "channel_id": "sp.channel_id",
+    "status": "sp.status",
+    "media_type": "sp.media_type",
+    "post_text": "sp.post_text",
+    "schedule_time": "sp.schedule_time",
+    "sent_post_id": "snt.id",
+    "message_id": "snt.message_id",
+    "sent_at": "snt.sent_at",
+    "views": "sp.views",
+}
 
 class AnalyticsRepository:
     def __init__(self, pool: Pool):
@@ -41,17 +66,377 @@ class AnalyticsRepository:
         query = "UPDATE scheduled_posts SET views = $1 WHERE id = $2;"
         await self._pool.execute(query, views, scheduled_post_id)
 
-    # --- YANGI QO'SHILGAN FUNKSIYA ---
-    async def get_all_posts_to_track_views(self) -> List[Dict[str, Any]]:
+    async def bulk_update_views(self, pairs: List[Tuple[int, int]]) -> int:
         """
-        Yuborilgan (`sent`) statusidagi va ko'rishlarni kuzatish kerak bo'lgan
-        barcha postlarni ma'lumotlar bazasidan oladi.
+        Ko'p postning ko'rishlar sonini bitta UPDATE ... FROM unnest(...) bilan yangilaydi.
+
+        `pairs` is a list of (scheduled_post_id, views); if an id repeats,
+        the last value wins.  Rows whose views did not change are skipped,
+        so unchanged posts produce no new row versions.  Returns the number
+        of rows actually updated.
         """
+        latest = dict(pairs)
+        if not latest:
+            return 0
         query = """
-            SELECT sp.id, sp.views, sp.channel_id, snt.message_id
-            FROM scheduled_posts sp
-            JOIN sent_posts snt ON sp.id = snt.scheduled_post_id
-            WHERE sp.status = 'sent'
+            UPDATE scheduled_posts sp
+            SET views = v.views
+            FROM unnest($1::int[], $2::int[]) AS v(id, views)
+            WHERE sp.id = v.id AND sp.views IS DISTINCT FROM v.views;
+        """
+        result = await self._pool.execute(query, list(latest.keys()), list(latest.values()))
+        return int(result.split()[-1])
+
+    async def claim_posts_to_track_views(self, limit: int) -> List[Dict[str, Any]]:
         """
-        rows = await self._pool.fetch(query)
+        Ko'rishlar sonini yangilash vaqti kelgan ko'pi bilan `limit` ta postni band qiladi.
+
+        Claiming and rescheduling are one statement: the most overdue copies
+        are locked with SKIP LOCKED and their `next_refresh_at` is moved on
+        by age right away (posts under an hour old every 5 minutes, under a
+        day hourly, under a week daily; older posts are frozen with NULL).
+        Overlapping runs therefore never poll the same copy twice, and a
+        failed run does not leave its posts due.
+        """
+        query = """
+            WITH claimed AS (
+                UPDATE sent_posts snt
+                SET next_refresh_at = CASE
+                    WHEN snt.sent_at > NOW() - INTERVAL '1 hour' THEN NOW() + INTERVAL '5 minutes'
+                    WHEN snt.sent_at > NOW() - INTERVAL '1 day' THEN NOW() + INTERVAL '1 hour'
+                    WHEN snt.sent_at > NOW() - INTERVAL '7 days' THEN NOW() + INTERVAL '1 day'
+                    ELSE NULL
+                END
+                WHERE snt.id IN (
+                    SELECT id FROM sent_posts
+                    WHERE next_refresh_at <= NOW()
+                    ORDER BY next_refresh_at
+                    LIMIT $1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING snt.id, snt.scheduled_post_id, snt.channel_id, snt.message_id
+            )
+            SELECT sp.id, sp.views, c.id AS sent_post_id, c.channel_id, c.message_id
+            FROM claimed c
+            JOIN scheduled_posts sp ON sp.id = c.scheduled_post_id;
+        """
+        rows = await self._pool.fetch(query, limit)
         return [dict(row) for row in rows]
+
+    async def record_view_snapshots(self, snapshots: List[Tuple[int, datetime, int]]) -> None:
+        """
+        Ko'rishlar tarixiga (post_id, ts, views) qatorlarini COPY orqali yozadi.
+
+        `post_id` is the sent copy's `sent_posts.id`.  The table is
+        append-only; rows are never updated.
+        """
+        if not snapshots:
+            return
+        async with self._pool.acquire() as conn:
+            await conn.copy_records_to_table(
+                'post_view_snapshots', records=snapshots, columns=['post_id', 'ts', 'views']
+            )
+
+    async def ensure_view_snapshot_partitions(self, months_ahead: int = 2) -> None:
+        """Joriy oy va keyingi `months_ahead` oy uchun bo'limlar mavjudligini ta'minlaydi."""
+        async with self._pool.acquire() as conn:
+            for statement in monthly_partition_ddl("post_view_snapshots", utc_today(), months_ahead + 1):
+                await conn.execute(statement)
+
+    async def advance_channel_rollups(self, lag_seconds: int, max_span_hours: int) -> Optional[datetime]:
+        """
+        Kanal rollup'larini watermark'dan boshlab bosqichma-bosqich yangilaydi.
+
+        Processes snapshots and sends in (watermark, upper], where `upper`
+        is at most `max_span_hours` past the watermark and never later than
+        `lag_seconds` ago.  Views gained are the difference to each post's
+        previous snapshot; they are credited both to the bucket they were
+        observed in and to the bucket the post was sent in (for averages).
+        Everything, including the new watermark, commits in one
+        transaction.  Returns the new watermark, or None when there was
+        nothing to do.
+        """
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                # Birinchi ishga tushishda eng eski yuborilgan postdan boshlanadi
+                await conn.execute(
+                    """
+                    INSERT INTO rollup_watermarks (name, watermark)
+                    SELECT $1, COALESCE(MIN(sent_at), NOW()) - INTERVAL '1 second' FROM sent_posts
+                    ON CONFLICT (name) DO NOTHING;
+                    """,
+                    CHANNEL_ROLLUP_WATERMARK,
+                )
+                lower = await conn.fetchval(
+                    "SELECT watermark FROM rollup_watermarks WHERE name = $1 FOR UPDATE;",
+                    CHANNEL_ROLLUP_WATERMARK,
+                )
+                upper = await conn.fetchval(
+                    """
+                    SELECT LEAST($1::timestamptz + make_interval(hours => $2),
+                                 NOW() - make_interval(secs => $3));
+                    """,
+                    lower, max_span_hours, lag_seconds,
+                )
+                if upper <= lower:
+                    return None
+
+                await conn.execute(
+                    """
+                    CREATE TEMP TABLE rollup_contributions ON COMMIT DROP AS
+                    WITH new_snapshots AS (
+                        SELECT s.post_id, s.ts, s.views,
+                               LAG(s.views) OVER (PARTITION BY s.post_id ORDER BY s.ts) AS prev_views
+                        FROM post_view_snapshots s
+                        WHERE s.ts > $1 AND s.ts <= $2
+                    ), gains AS (
+                        SELECT n.post_id, n.ts,
+                               n.views - COALESCE(n.prev_views, (
+                                   SELECT p.views FROM post_view_snapshots p
+                                   WHERE p.post_id = n.post_id AND p.ts <= $1
+                                   ORDER BY p.ts DESC
+                                   LIMIT 1
+                               ), 0) AS gained
+                        FROM new_snapshots n
+                    )
+                    SELECT channel_id, sent_at AS ts, 1 AS posts_sent, 0::bigint AS views_gained,
+                           0::bigint AS sent_post_views
+                    FROM sent_posts
+                    WHERE sent_at > $1 AND sent_at <= $2
+                    UNION ALL
+                    SELECT snt.channel_id, g.ts, 0, g.gained, 0
+                    FROM gains g JOIN sent_posts snt ON snt.id = g.post_id
+                    UNION ALL
+                    SELECT snt.channel_id, snt.sent_at, 0, 0, g.gained
+                    FROM gains g JOIN sent_posts snt ON snt.id = g.post_id;
+                    """,
+                    lower, upper,
+                )
+                for unit, table in ROLLUP_TABLES.items():
+                    await conn.execute(
+                        f"""
+                        INSERT INTO {table} (channel_id, bucket, posts_sent, views_gained, sent_post_views)
+                        SELECT channel_id, date_trunc('{unit}', ts, 'UTC'),
+                               SUM(posts_sent), SUM(views_gained), SUM(sent_post_views)
+                        FROM rollup_contributions
+                        GROUP BY 1, 2
+                        ON CONFLICT (channel_id, bucket) DO UPDATE
+                            SET posts_sent = {table}.posts_sent + EXCLUDED.posts_sent,
+                                views_gained = {table}.views_gained + EXCLUDED.views_gained,
+                                sent_post_views = {table}.sent_post_views + EXCLUDED.sent_post_views;
+                        """
+                    )
+                await conn.execute(
+                    "UPDATE rollup_watermarks SET watermark = $2 WHERE name = $1;",
+                    CHANNEL_ROLLUP_WATERMARK, upper,
+                )
+                return upper
+
+    async def reset_channel_rollups(self) -> None:
+        """Rollup jadvallarini tozalaydi va watermark'ni o'chiradi (to'liq backfill uchun)."""
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(f"TRUNCATE {', '.join(ROLLUP_TABLES.values())};")
+                await conn.execute(
+                    "DELETE FROM rollup_watermarks WHERE name = $1;", CHANNEL_ROLLUP_WATERMARK
+                )
+
+    async def get_channel_rollups(
+        self, channel_id: int, unit: str = "day", since: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """Kanalning soatlik ('hour') yoki kunlik ('day') statistikasini oladi."""
+        table = ROLLUP_TABLES[unit]
+        query = f"""
+            SELECT bucket, posts_sent, views_gained,
+                   sent_post_views::float / NULLIF(posts_sent, 0) AS avg_views_per_post
+            FROM {table}
+            WHERE channel_id = $1 AND ($2::timestamptz IS NULL OR bucket >= $2)
+            ORDER BY bucket;
+        """
+        records = await self._pool.fetch(query, channel_id, since)
+        return [dict(record) for record in records]
+
+    async def get_user_daily_views(
+        self, user_id: int, channel_id: Optional[int] = None, since: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Foydalanuvchi kanallarining kunlik ko'rishlar sonini oladi.
+
+        Reads ``channel_stats_daily`` only; `channel_id` narrows the result
+        to one of the user's channels.
+        """
+        query = """
+            SELECT c.id AS channel_id, COALESCE(c.title, c.id::text) AS title,
+                   d.bucket, d.views_gained
+            FROM channels c
+            JOIN channel_stats_daily d ON d.channel_id = c.id
+            WHERE c.user_id = $1
+              AND ($2::bigint IS NULL OR c.id = $2)
+              AND ($3::timestamptz IS NULL OR d.bucket >= $3)
+            ORDER BY c.id, d.bucket;
+        """
+        records = await self._pool.fetch(query, user_id, channel_id, since)
+        return [dict(record) for record in records]
+
+    async def get_posts_ordered_by_views(
+        self, channel_id: int, limit: int = 20, after: Optional[Tuple[int, int]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Kanal postlarini ko'rishlar soni bo'yicha (kamayish tartibida) sahifalab oladi.
+
+        Ordered by ``(views DESC, id)``; `after` is the ``(views, id)`` of
+        the last row of the previous page.  The page itself is read from
+        ``ix_scheduled_posts_channel_views`` with an index-only scan, and
+        only the `limit` rows found are joined back for their content, so
+        every page costs the same no matter how deep it is.
+        """
+        if after is None:
+            keyset = ""
+            args = (channel_id, limit)
+        else:
+            # `views <= $3` indeks chegarasi bo'ladi; qolgan shart faqat tenglar ichida filtrlaydi
+            keyset = "AND views <= $3 AND (views < $3 OR id > $4)"
+            args = (channel_id, limit, *after)
+        query = f"""
+            WITH page AS (
+                SELECT id, views FROM scheduled_posts
+                WHERE channel_id = $1 AND views IS NOT NULL {keyset}
+                ORDER BY views DESC, id
+                LIMIT $2
+            )
+            SELECT page.id, page.views, sp.post_text, sp.media_type, sp.schedule_time
+            FROM page JOIN scheduled_posts sp ON sp.id = page.id
+            ORDER BY page.views DESC, page.id;
+        """
+        records = await self._pool.fetch(query, *args)
+        return [dict(record) for record in records]
+
+    async def get_view_snapshot_columns(
+        self, since: datetime, channel_ids: Optional[List[int]] = None
+    ) -> Dict[str, list]:
+        """
+        `since` dan keyin yuborilgan postlarning ko'rishlar tarixini ustunlar ko'rinishida oladi.
+
+        The whole series is packed into five arrays inside PostgreSQL and
+        returned as one row, sorted by ``(post_id, ts)``, so no per-snapshot
+        Record objects are built.  Times are UNIX seconds.
+        """
+        order = "ORDER BY s.post_id, s.ts"
+        query = f"""
+            SELECT array_agg(s.post_id {order}) AS post_id,
+                   array_agg(snt.channel_id {order}) AS channel_id,
+                   array_agg(EXTRACT(EPOCH FROM snt.sent_at)::float8 {order}) AS sent_at,
+                   array_agg(EXTRACT(EPOCH FROM s.ts)::float8 {order}) AS ts,
+                   array_agg(s.views {order}) AS views
+            FROM post_view_snapshots s
+            JOIN sent_posts snt ON snt.id = s.post_id
+            WHERE s.ts >= $1 AND snt.sent_at >= $1
+              AND ($2::bigint[] IS NULL OR snt.channel_id = ANY($2::bigint[]));
+        """
+        row = await self._pool.fetchrow(query, since, channel_ids)
+        return {column: row[column] or [] for column in ("post_id", "channel_id", "sent_at", "ts", "views")}
+
+    async def iter_post_export(self, user_id: int, batch_size: int = 5000) -> AsyncIterator[List[tuple]]:
+        """
+        Foydalanuvchi postlarini (har bir yuborilgan nusxasi bilan) partiyalab beradi.
+
+        Rows come from a server-side cursor, `batch_size` at a time, in the
+        order of ``POST_EXPORT_COLUMNS``; unsent posts appear once with
+        empty sent columns.  The connection is held until the iterator is
+        exhausted or closed.
+        """
+        select = ", ".join(f"{expression} AS {name}" for name, expression in POST_EXPORT_COLUMNS.items())
+        query = f"""
+            SELECT {select}
+            FROM scheduled_posts sp
+            LEFT JOIN sent_posts snt ON snt.scheduled_post_id = sp.id
+            WHERE sp.user_id = $1
+            ORDER BY sp.id, snt.id;
+        """
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                cursor = await conn.cursor(query, user_id)
+                while True:
+                    records = await cursor.fetch(batch_size)
+                    if not records:
+                        break
+                    yield [tuple(record) for record in records]
+
+    async def record_views_24h(self, pairs: List[Tuple[int, int]]) -> int:
+        """
+        24 soatdan oshgan postlarning ko'rishlarini bir marta `views_24h` ga yozadi
+        va ularni kanal/kun t-digest'lariga qo'shadi.
+
+        `pairs` is a list of (sent_post_id, views) as just observed; only
+        copies older than a day whose `views_24h` is still empty are taken,
+        so every post enters its sketch exactly once.  Sketches are keyed by
+        the channel and the UTC day the post was sent, and are updated
+        under row locks in the same transaction.  Returns the number of
+        posts added.
+        """
+        latest = dict(pairs)
+        if not latest:
+            return 0
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                records = await conn.fetch(
+                    """
+                    UPDATE sent_posts snt
+                    SET views_24h = v.views
+                    FROM unnest($1::int[], $2::int[]) AS v(id, views)
+                    WHERE snt.id = v.id AND snt.views_24h IS NULL
+                      AND snt.sent_at <= NOW() - INTERVAL '24 hours'
+                    RETURNING snt.channel_id, (snt.sent_at AT TIME ZONE 'UTC')::date AS day, snt.views_24h;
+                    """,
+                    list(latest.keys()), list(latest.values()),
+                )
+                if not records:
+                    return 0
+
+                values: Dict[Tuple[int, date], List[int]] = {}
+                for record in records:
+                    values.setdefault((record['channel_id'], record['day']), []).append(record['views_24h'])
+                channel_ids = [channel_id for channel_id, _ in values]
+                days = [day for _, day in values]
+                # Yangi kalitlar avval bo'sh holda yaratiladi, shunda parallel yozuvchilar bir-birini o'chirmaydi
+                empty = TDigest().to_bytes()
+                await conn.execute(
+                    """
+                    INSERT INTO view_sketches (channel_id, day, sketch)
+                    SELECT channel_id, day, $3 FROM unnest($1::bigint[], $2::date[]) AS k(channel_id, day)
+                    ON CONFLICT (channel_id, day) DO NOTHING;
+                    """,
+                    channel_ids, days, empty,
+                )
+                existing = await conn.fetch(
+                    """
+                    SELECT vs.channel_id, vs.day, vs.sketch
+                    FROM view_sketches vs
+                    JOIN unnest($1::bigint[], $2::date[]) AS k(channel_id, day)
+                      ON vs.channel_id = k.channel_id AND vs.day = k.day
+                    ORDER BY vs.channel_id, vs.day
+                    FOR UPDATE OF vs;
+                    """,
+                    channel_ids, days,
+                )
+                sketches = []
+                for record in existing:
+                    digest = TDigest.from_bytes(record['sketch'])
+                    digest.update(values[(record['channel_id'], record['day'])])
+                    sketches.append((record['channel_id'], record['day'], digest.to_bytes()))
+                await conn.executemany(
+                    "UPDATE view_sketches SET sketch = $3 WHERE channel_id = $1 AND day = $2;", sketches
+                )
+                return len(records)
+
+    async def get_view_sketches(
+        self, channel_ids: List[int], since: Optional[date] = None
+    ) -> List[Dict[str, Any]]:
+        """Kanallarning kunlik t-digest'larini (channel_id, day, sketch) oladi."""
+        query = """
+            SELECT channel_id, day, sketch FROM view_sketches
+            WHERE channel_id = ANY($1::bigint[]) AND ($2::date IS NULL OR day >= $2)
+            ORDER BY channel_id, day;
+        """
+        records = await self._pool.fetch(query, channel_ids, since)
+        return [dict(record) for record in records]
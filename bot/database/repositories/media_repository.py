@@ -0,0 +1,29 @@
+import asyncpg
+from typing import Optional, Dict, Any
+
+
+class MediaRepository:
+    def __init__(self, pool: asyncpg.Pool):
+        self._pool = pool
+
+    async def get_file(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """Kontent xeshi bo'yicha keshlangan Telegram faylini qaytaradi (bo'lmasa None)."""
+        query = "SELECT * FROM media_files WHERE sha256 = $1;"
+        record = await self._pool.fetchrow(query, sha256)
+        return dict(record) if record else None
+
+    async def save_file(self, sha256: str, file_id: str, media_type: str, file_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Kontent xeshi uchun Telegram file_id'sini saqlaydi.
+
+        If the same content was stored concurrently, the first row wins and
+        is returned, so every caller ends up with the same file_id.
+        """
+        query = """
+            INSERT INTO media_files (sha256, file_id, media_type, file_size)
+            VALUES ($1, $2, $3, $4)
+            ON CONFLICT (sha256) DO UPDATE SET sha256 = EXCLUDED.sha256
+            RETURNING *;
+        """
+        record = await self._pool.fetchrow(query, sha256, file_id, media_type, file_size)
+        return dict(record)
@@ -0,0 +1,238 @@
+import logging
+from datetime import datetime
+from asyncpg import Pool
+from redis.exceptions import RedisError
+from typing import List, Dict, Any, Optional
+
+from bot.utils.delay_queue import PostActionQueue
+
+logger = logging.getLogger(__name__)
+
+# Amal bajariladigan xabar: aniq nusxa yoki postning eng so'nggi yuborilgan nusxasi
+_TARGET_COLUMNS = """
+    pa.*, target.channel_id, target.message_id, sp.inline_buttons,
+    (sp.media_id IS NOT NULL OR sp.media_group IS NOT NULL) AS has_media
+"""
+_TARGET_JOINS = """
+    JOIN scheduled_posts sp ON sp.id = pa.scheduled_post_id
+    LEFT JOIN LATERAL (
+        SELECT s.channel_id, s.message_id FROM sent_posts s
+        WHERE s.id = pa.sent_post_id
+           OR (pa.sent_post_id IS NULL AND s.scheduled_post_id = pa.scheduled_post_id)
+        ORDER BY s.sent_at DESC
+        LIMIT 1
+    ) target ON TRUE
+"""
+
+
+class PostActionRepository:
+    def __init__(self, pool: Pool, action_queue: Optional[PostActionQueue] = None):
+        self._pool = pool
+        # Redis'dagi navbat faqat indeks; asosiy ma'lumot manbai - PostgreSQL
+        self._action_queue = action_queue
+
+    async def _enqueue(self, items: List[tuple]) -> None:
+        """Amallarni kechiktirilgan navbatga qo'shadi. Redis xatosi bazadagi yozuvni buzmaydi."""
+        if self._action_queue is None or not items:
+            return
+        try:
+            await self._action_queue.add_many(items)
+        except RedisError as e:
+            logger.warning(f"Could not enqueue {len(items)} post actions, reconciliation will pick them up: {e}")
+
+    async def create_action(
+        self,
+        scheduled_post_id: int,
+        user_id: int,
+        action: str,
+        run_at: datetime,
+        payload: Optional[Dict[str, Any]] = None,
+    ) -> Optional[int]:
+        """
+        Foydalanuvchining postiga yangi amal ('delete' yoki 'edit') rejalashtiradi.
+
+        The action targets the latest sent copy of the post at the time it
+        runs.  Returns the new action id, or None if the post does not
+        belong to `user_id`.
+        """
+        query = """
+            INSERT INTO post_actions (scheduled_post_id, action, payload, run_at)
+            SELECT id, $3, $4, $5 FROM scheduled_posts
+            WHERE id = $1 AND user_id = $2
+            RETURNING id;
+        """
+        action_id = await self._pool.fetchval(query, scheduled_post_id, user_id, action, payload, run_at)
+        if action_id is not None:
+            await self._enqueue([(action_id, run_at)])
+        return action_id
+
+    async def claim_actions_by_ids(self, worker_id: str, action_ids: List[int], lease_seconds: int) -> List[Dict[str, Any]]:
+        """
+        Navbatdan olingan aniq amallarni band qiladi.
+
+        Only 'pending' rows are claimed.  Every row comes back with the
+        `channel_id`/`message_id` it applies to (None if the post has not
+        been sent yet), the post's `inline_buttons` and whether the post
+        carries media.  The IDs were already popped from the queue, so
+        actions that are still 'pending' but were skipped because their row
+        was locked are put back into it.
+        """
+        query = f"""
+            WITH claimed AS (
+                UPDATE post_actions
+                SET status = 'claimed',
+                    lease_owner = $1,
+                    lease_expires_at = NOW() + make_interval(secs => $3)
+                WHERE id IN (
+                    SELECT id FROM post_actions
+                    WHERE id = ANY($2::int[]) AND status = 'pending'
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING *
+            )
+            SELECT {_TARGET_COLUMNS}
+            FROM claimed pa
+            {_TARGET_JOINS};
+        """
+        records = await self._pool.fetch(query, worker_id, action_ids, lease_seconds)
+        claimed = {record['id'] for record in records}
+        skipped = [action_id for action_id in action_ids if action_id not in claimed]
+        if skipped:
+            await self._requeue_skipped(skipped)
+        return [dict(record) for record in records]
+
+    async def _requeue_skipped(self, action_ids: List[int]) -> None:
+        """Navbatdan olingan, lekin band qilinmagan 'pending' amallarni navbatga qaytaradi."""
+        if self._action_queue is None:
+            return
+        records = await self._pool.fetch(
+            """
+            SELECT id, GREATEST(run_at, NOW() + INTERVAL '1 second') AS run_at
+            FROM post_actions
+            WHERE id = ANY($1::int[]) AND status = 'pending';
+            """,
+            action_ids,
+        )
+        await self._enqueue([(record['id'], record['run_at']) for record in records])
+
+    async def claim_due_actions(self, worker_id: str, limit: int, lease_seconds: int) -> List[Dict[str, Any]]:
+        """Vaqti kelgan amallardan ko'pi bilan `limit` tasini band qiladi (zaxira sweep uchun)."""
+        query = f"""
+            WITH claimed AS (
+                UPDATE post_actions
+                SET status = 'claimed',
+                    lease_owner = $1,
+                    lease_expires_at = NOW() + make_interval(secs => $3)
+                WHERE id IN (
+                    SELECT id FROM post_actions
+                    WHERE run_at <= NOW() AND status = 'pending'
+                    ORDER BY run_at
+                    LIMIT $2
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING *
+            )
+            SELECT {_TARGET_COLUMNS}
+            FROM claimed pa
+            {_TARGET_JOINS};
+        """
+        records = await self._pool.fetch(query, worker_id, limit, lease_seconds)
+        return [dict(record) for record in records]
+
+    async def complete_actions(self, action_ids: List[int]) -> None:
+        """Bajarilgan amallarni bitta so'rov bilan 'done' holatiga o'tkazadi."""
+        if not action_ids:
+            return
+        query = """
+            UPDATE post_actions
+            SET status = 'done', lease_owner = NULL, lease_expires_at = NULL
+            WHERE id = ANY($1::int[]);
+        """
+        await self._pool.execute(query, action_ids)
+
+    async def schedule_retry(self, action_id: int, delay_seconds: float, error: str, count_attempt: bool = True) -> None:
+        """Amalni `delay_seconds` dan keyin qayta bajarish uchun navbatga qaytaradi (flood-wait urinish hisoblanmaydi)."""
+        query = """
+            UPDATE post_actions
+            SET status = 'pending',
+                attempts = attempts + $4::int,
+                run_at = NOW() + make_interval(secs => $2),
+                last_error = $3,
+                lease_owner = NULL,
+                lease_expires_at = NULL
+            WHERE id = $1
+            RETURNING run_at;
+        """
+        run_at = await self._pool.fetchval(query, action_id, delay_seconds, error, int(count_attempt))
+        if run_at is not None:
+            await self._enqueue([(action_id, run_at)])
+
+    async def defer_action(self, action_id: int, delay_seconds: float) -> bool:
+        """
+        Hali yuborilmagan postga tegishli amalni post yuborilgandan keyinga qoldiradi.
+
+        The action is moved to the later of `delay_seconds` from now and the
+        post's next fire time, without counting an attempt.  Returns False
+        (and leaves the row untouched) if the post is no longer waiting to be
+        sent, so the caller can fail the action instead of deferring forever.
+        """
+        query = """
+            UPDATE post_actions pa
+            SET status = 'pending',
+                run_at = GREATEST(NOW() + make_interval(secs => $2), sp.next_fire_at + make_interval(secs => $2)),
+                lease_owner = NULL,
+                lease_expires_at = NULL
+            FROM scheduled_posts sp
+            WHERE pa.id = $1 AND sp.id = pa.scheduled_post_id AND sp.status IN ('pending', 'claimed')
+            RETURNING pa.run_at;
+        """
+        run_at = await self._pool.fetchval(query, action_id, delay_seconds)
+        if run_at is None:
+            return False
+        await self._enqueue([(action_id, run_at)])
+        return True
+
+    async def fail_action(self, action_id: int, error: str) -> None:
+        """Amalni 'error' holatiga o'tkazadi."""
+        query = """
+            UPDATE post_actions
+            SET status = 'error',
+                attempts = attempts + 1,
+                last_error = $2,
+                lease_owner = NULL,
+                lease_expires_at = NULL
+            WHERE id = $1;
+        """
+        await self._pool.execute(query, action_id, error)
+
+    async def release_expired_leases(self) -> int:
+        """Muddati o'tgan lease'larni 'pending' holatiga qaytaradi. Qaytarilgan amallar sonini beradi."""
+        query = """
+            UPDATE post_actions
+            SET status = 'pending', lease_owner = NULL, lease_expires_at = NULL
+            WHERE status = 'claimed' AND lease_expires_at < NOW()
+            RETURNING id, run_at;
+        """
+        records = await self._pool.fetch(query)
+        await self._enqueue([(record['id'], record['run_at']) for record in records])
+        return len(records)
+
+    async def rebuild_action_queue(self, batch_size: int = 5000) -> int:
+        """Barcha 'pending' amallarni Redis navbatiga qayta yozadi (reconciliation)."""
+        if self._action_queue is None:
+            return 0
+
+        query = "SELECT id, run_at FROM post_actions WHERE status = 'pending';"
+        total = 0
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                cursor = await conn.cursor(query)
+                while True:
+                    records = await cursor.fetch(batch_size)
+                    if not records:
+                        break
+                    await self._action_queue.add_many(
+                        (record['id'], record['run_at']) for record in records
+                    )
+                    total += len(records)
+        return total
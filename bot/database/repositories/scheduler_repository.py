@@ -1,10 +1,62 @@
-from datetime import datetime
+import json
+import logging
+from datetime import datetime, timezone
 from asyncpg import Pool
-from typing import List, Dict, Any, Optional
+from redis.exceptions import RedisError
+from typing import List, Dict, Any, Optional, Tuple
+
+from bot.utils.delay_queue import DelayQueue, PostActionQueue
+
+logger = logging.getLogger(__name__)
 
 class SchedulerRepository:
-    def __init__(self, pool: Pool):
+    def __init__(
+        self,
+        pool: Pool,
+        delay_queue: Optional[DelayQueue] = None,
+        action_queue: Optional[PostActionQueue] = None,
+    ):
         self._pool = pool
+        # Redis'dagi navbat faqat indeks; asosiy ma'lumot manbai - PostgreSQL
+        self._delay_queue = delay_queue
+        self._action_queue = action_queue
+
+    async def _enqueue(self, items: List[tuple]) -> None:
+        """Postlarni kechiktirilgan navbatga qo'shadi. Redis xatosi bazadagi yozuvni buzmaydi."""
+        if self._delay_queue is None or not items:
+            return
+        try:
+            await self._delay_queue.add_many(items)
+        except RedisError as e:
+            logger.warning(f"Could not enqueue {len(items)} posts, reconciliation will pick them up: {e}")
+
+    async def _enqueue_actions(self, items: List[tuple]) -> None:
+        """Avtomatik o'chirish amallarini amallar navbatiga qo'shadi."""
+        if self._action_queue is None or not items:
+            return
+        try:
+            await self._action_queue.add_many(items)
+        except RedisError as e:
+            logger.warning(f"Could not enqueue {len(items)} post actions, reconciliation will pick them up: {e}")
+
+    @staticmethod
+    async def _lock_post_owners(conn, post_ids: List[int]) -> None:
+        """
+        Postlar egalarining `users` qatorlarini id tartibida oldindan qulflaydi.
+
+        Every visible change to a post bumps its owner's `data_version` from
+        a trigger; taking those row locks in a fixed order first keeps two
+        concurrent multi-row updates from deadlocking on the counters.
+        """
+        await conn.execute(
+            """
+            SELECT 1 FROM users
+            WHERE id IN (SELECT user_id FROM scheduled_posts WHERE id = ANY($1::int[]))
+            ORDER BY id
+            FOR UPDATE;
+            """,
+            post_ids,
+        )
 
     async def create_scheduled_post(
         self,
@@ -14,22 +66,102 @@ class SchedulerRepository:
         schedule_time: datetime,
         media_id: Optional[str] = None,
         media_type: Optional[str] = None,
-        inline_buttons: Optional[Dict[str, Any]] = None
+        inline_buttons: Optional[Dict[str, Any]] = None,
+        recurrence_rule: Optional[str] = None,
+        media_group: Optional[List[Dict[str, str]]] = None,
+        delete_after_seconds: Optional[int] = None
     ) -> int:
-        """Ma'lumotlar bazasiga yangi rejalashtirilgan post yaratadi."""
+        """
+        Ma'lumotlar bazasiga yangi rejalashtirilgan post yaratadi.
+
+        `schedule_time` is the first occurrence; for recurring posts
+        `recurrence_rule` (a cron expression) yields the following ones.
+        `media_group` is a list of {"media_id", "media_type"} items sent as
+        one album.  With `delete_after_seconds` every sent copy is deleted
+        that long after it was published.
+        """
         query = """
-            INSERT INTO scheduled_posts (user_id, channel_id, post_text, schedule_time, media_id, media_type, inline_buttons, status)
-            VALUES ($1, $2, $3, $4, $5, $6, $7, 'pending')
+            INSERT INTO scheduled_posts (
+                user_id, channel_id, post_text, schedule_time, media_id, media_type,
+                inline_buttons, recurrence_rule, media_group, delete_after_seconds, next_fire_at, status
+            )
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $4, 'pending')
             RETURNING id;
         """
         post_id = await self._pool.fetchval(
-            query, user_id, channel_id, post_text, schedule_time, media_id, media_type, inline_buttons
+            query, user_id, channel_id, post_text, schedule_time, media_id, media_type, inline_buttons,
+            recurrence_rule, media_group, delete_after_seconds
         )
+        await self._enqueue([(post_id, schedule_time)])
         return post_id
 
+    async def create_scheduled_posts(self, user_id: int, posts: List[Dict[str, Any]]) -> List[Optional[int]]:
+        """
+        Bir nechta postni bitta INSERT ... SELECT FROM unnest(...) bilan yaratadi.
+
+        Each item takes the keyword arguments of `create_scheduled_post`.
+        Returns the new ids in input order; an item whose channel does not
+        belong to `user_id` is not inserted and gets None.  Ids are drawn
+        from the sequence up front, so they map back to items without
+        relying on the order of RETURNING.
+        """
+        if not posts:
+            return []
+
+        def to_json(value):
+            return json.dumps(value) if value is not None else None
+
+        query = """
+            WITH input AS (
+                SELECT * FROM unnest(
+                    $2::bigint[], $3::text[], $4::timestamptz[], $5::text[], $6::text[],
+                    $7::text[], $8::text[], $9::text[], $10::int[]
+                ) WITH ORDINALITY AS p(
+                    channel_id, post_text, schedule_time, media_id, media_type,
+                    inline_buttons, recurrence_rule, media_group, delete_after_seconds, ord
+                )
+            ), owned AS (
+                -- Ikki marta ishlatilgani uchun CTE bir marta hisoblanadi: har bir qatorga bitta nextval
+                SELECT nextval(pg_get_serial_sequence('scheduled_posts', 'id')) AS id, input.*
+                FROM input
+                WHERE channel_id IN (SELECT id FROM channels WHERE user_id = $1)
+            ), inserted AS (
+                INSERT INTO scheduled_posts (
+                    id, user_id, channel_id, post_text, schedule_time, media_id, media_type,
+                    inline_buttons, recurrence_rule, media_group, delete_after_seconds, next_fire_at, status
+                )
+                SELECT id, $1, channel_id, post_text, schedule_time, media_id, media_type,
+                       inline_buttons::json, recurrence_rule, media_group::json, delete_after_seconds,
+                       schedule_time, 'pending'
+                FROM owned
+                ORDER BY ord
+            )
+            SELECT ord, id FROM owned;
+        """
+        records = await self._pool.fetch(
+            query,
+            user_id,
+            [post['channel_id'] for post in posts],
+            [post.get('post_text') for post in posts],
+            [post['schedule_time'] for post in posts],
+            [post.get('media_id') for post in posts],
+            [post.get('media_type') for post in posts],
+            [to_json(post.get('inline_buttons')) for post in posts],
+            [post.get('recurrence_rule') for post in posts],
+            [to_json(post.get('media_group')) for post in posts],
+            [post.get('delete_after_seconds') for post in posts],
+        )
+        post_ids: List[Optional[int]] = [None] * len(posts)
+        for record in records:
+            post_ids[record['ord'] - 1] = record['id']
+        await self._enqueue([
+            (post_id, post['schedule_time']) for post_id, post in zip(post_ids, posts) if post_id is not None
+        ])
+        return post_ids
+
     async def get_scheduled_posts_by_user(self, user_id: int) -> List[Dict[str, Any]]:
         """Foydalanuvchining barcha 'pending' statusidagi postlarini oladi."""
-        query = "SELECT * FROM scheduled_posts WHERE user_id = $1 AND status = 'pending' ORDER BY schedule_time ASC;"
+        query = "SELECT * FROM scheduled_posts WHERE user_id = $1 AND status = 'pending' ORDER BY next_fire_at ASC;"
         records = await self._pool.fetch(query, user_id)
         return [dict(record) for record in records]
 
@@ -37,19 +169,385 @@ class SchedulerRepository:
         """Rejalashtirilgan postni o'chiradi."""
         query = "DELETE FROM scheduled_posts WHERE id = $1 AND user_id = $2;"
         result = await self._pool.execute(query, post_id, user_id)
-        return result != 'DELETE 0'
+        deleted = result != 'DELETE 0'
+        if deleted and self._delay_queue is not None:
+            try:
+                await self._delay_queue.remove(post_id)
+            except RedisError as e:
+                # Navbatda qolib ketgan ID zarar qilmaydi: u "claim" qilinmaydi
+                logger.warning(f"Could not remove post {post_id} from the delay queue: {e}")
+        return deleted
 
     async def update_post_status(self, post_id: int, status: str):
-        """Postning statusini yangilaydi ('pending', 'sent', 'error')."""
-        query = "UPDATE scheduled_posts SET status = $1 WHERE id = $2;"
+        """Postning statusini yangilaydi ('pending', 'claimed', 'sent', 'error', 'expired') va lease'ni bo'shatadi."""
+        query = """
+            UPDATE scheduled_posts
+            SET status = $1, lease_owner = NULL, lease_expires_at = NULL
+            WHERE id = $2;
+        """
         await self._pool.execute(query, status, post_id)
 
-    async def get_pending_posts_to_send(self) -> List[Dict[str, Any]]:
-        """Yuborish vaqti kelgan barcha postlarni oladi."""
-        query = "SELECT * FROM scheduled_posts WHERE schedule_time <= NOW() AND status = 'pending';"
+    async def get_pending_posts_to_send(
+        self, limit: int = 500, after: Optional[Tuple[datetime, int]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Yuborish vaqti kelgan postlarning bir sahifasini eng eskisidan boshlab oladi.
+
+        `after` is the (next_fire_at, id) keyset cursor of the last row of the
+        previous page.
+        """
+        after_time, after_id = after if after else (None, None)
+        query = """
+            SELECT * FROM scheduled_posts
+            WHERE next_fire_at <= NOW() AND status = 'pending'
+              AND ($2::timestamptz IS NULL OR (next_fire_at, id) > ($2, $3::int))
+            ORDER BY next_fire_at, id
+            LIMIT $1;
+        """
+        records = await self._pool.fetch(query, limit, after_time, after_id)
+        return [dict(record) for record in records]
+
+    async def record_sent_posts(self, results: List[tuple], lease_owner: Optional[str] = None) -> None:
+        """
+        Yuborilgan postlar natijalarini bitta tranzaksiyada yozadi.
+
+        `results` is a list of (scheduled_post_id, channel_id, message_id,
+        next_fire_at).  The `sent_posts` rows are loaded with COPY and all
+        statuses are updated with a single UPDATE ... FROM unnest(...):
+        one-shot posts (next_fire_at is None) become 'sent', recurring posts
+        go back to 'pending' at their next occurrence and are re-queued.
+        Posts with `delete_after_seconds` get a 'delete' action for the copy
+        that was just sent, in the same transaction.
+
+        With `lease_owner` only posts still leased to that worker change
+        status: a post whose lease expired and was taken over keeps the new
+        owner's state (its sent copy is still recorded).
+        """
+        if not results:
+            return
+        post_ids = [result[0] for result in results]
+        next_fire_times = [result[3] for result in results]
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                await self._lock_post_owners(conn, post_ids)
+                await conn.copy_records_to_table(
+                    'sent_posts',
+                    records=[result[:3] for result in results],
+                    columns=['scheduled_post_id', 'channel_id', 'message_id'],
+                )
+                updated = await conn.fetch(
+                    """
+                    UPDATE scheduled_posts sp
+                    SET status = CASE WHEN done.next_fire_at IS NULL THEN 'sent' ELSE 'pending' END,
+                        next_fire_at = COALESCE(done.next_fire_at, sp.next_fire_at),
+                        attempts = CASE WHEN done.next_fire_at IS NULL THEN sp.attempts ELSE 0 END,
+                        lease_owner = NULL,
+                        lease_expires_at = NULL
+                    FROM unnest($1::int[], $2::timestamptz[]) AS done(id, next_fire_at)
+                    WHERE sp.id = done.id AND ($3::text IS NULL OR sp.lease_owner = $3)
+                    RETURNING sp.id;
+                    """,
+                    post_ids,
+                    next_fire_times,
+                    lease_owner,
+                )
+                # sent_at = now(): COPY bilan shu tranzaksiyada qo'shilgan qatorlar
+                actions = await conn.fetch(
+                    """
+                    INSERT INTO post_actions (scheduled_post_id, sent_post_id, action, run_at)
+                    SELECT s.scheduled_post_id, s.id, 'delete',
+                           s.sent_at + make_interval(secs => sp.delete_after_seconds)
+                    FROM scheduled_posts sp
+                    JOIN sent_posts s ON s.scheduled_post_id = sp.id AND s.sent_at = now()
+                    WHERE sp.id = ANY($1::int[]) AND sp.delete_after_seconds IS NOT NULL
+                    RETURNING id, run_at;
+                    """,
+                    post_ids,
+                )
+        owned = {record['id'] for record in updated}
+        if len(owned) < len(post_ids):
+            logger.warning(
+                f"{len(post_ids) - len(owned)} sent posts had lost their lease; their status was left to the new owner"
+            )
+        await self._enqueue([(result[0], result[3]) for result in results if result[3] is not None and result[0] in owned])
+        await self._enqueue_actions([(record['id'], record['run_at']) for record in actions])
+
+    async def claim_due_posts(
+        self,
+        worker_id: str,
+        limit: int,
+        lease_seconds: int,
+        due_since: Optional[datetime] = None,
+        due_before: Optional[datetime] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Vaqti kelgan postlardan ko'pi bilan `limit` tasini shu worker uchun band qiladi.
+
+        Rows locked by another worker are skipped (`FOR UPDATE SKIP LOCKED`),
+        so any number of workers can claim concurrently without overlap.
+        Claimed posts move to the 'claimed' status with a lease that expires
+        after `lease_seconds`.
+
+        Posts are taken oldest first.  `due_since`/`due_before` restrict the
+        window of `next_fire_at` (e.g. on-time posts vs. backlog) and `after`
+        is a (next_fire_at, id) keyset cursor for paging through a backlog.
+        """
+        after_time, after_id = after if after else (None, None)
+        query = """
+            WITH due AS (
+                SELECT id FROM scheduled_posts
+                WHERE next_fire_at <= LEAST(NOW(), COALESCE($4::timestamptz, 'infinity'))
+                  AND status = 'pending'
+                  AND ($5::timestamptz IS NULL OR next_fire_at >= $5)
+                  AND ($6::timestamptz IS NULL OR (next_fire_at, id) > ($6, $7::int))
+                ORDER BY next_fire_at, id
+                LIMIT $2
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE scheduled_posts sp
+            SET status = 'claimed',
+                lease_owner = $1,
+                lease_expires_at = NOW() + make_interval(secs => $3)
+            FROM due
+            WHERE sp.id = due.id
+            RETURNING sp.*;
+        """
+        records = await self._pool.fetch(
+            query, worker_id, limit, lease_seconds, due_before, due_since, after_time, after_id
+        )
+        return [dict(record) for record in records]
+
+    async def skip_late_posts(self, items: List[Tuple[int, Optional[datetime]]]) -> None:
+        """
+        Juda kechikib qolgan postlarni yubormasdan o'tkazib yuboradi.
+
+        `items` is a list of (post_id, next_fire_at).  One-shot posts
+        (next_fire_at is None) are flagged 'expired'; recurring posts skip
+        the missed occurrence and go back to 'pending' at the next one.
+        """
+        if not items:
+            return
+        query = """
+            UPDATE scheduled_posts sp
+            SET status = CASE WHEN late.next_fire_at IS NULL THEN 'expired' ELSE 'pending' END,
+                next_fire_at = COALESCE(late.next_fire_at, sp.next_fire_at),
+                last_error = 'Skipped: exceeded the maximum allowed lateness',
+                lease_owner = NULL,
+                lease_expires_at = NULL
+            FROM unnest($1::int[], $2::timestamptz[]) AS late(id, next_fire_at)
+            WHERE sp.id = late.id;
+        """
+        post_ids = [item[0] for item in items]
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                await self._lock_post_owners(conn, post_ids)
+                await conn.execute(query, post_ids, [item[1] for item in items])
+        await self._enqueue([item for item in items if item[1] is not None])
+
+    async def claim_posts_by_ids(self, worker_id: str, post_ids: List[int], lease_seconds: int) -> List[Dict[str, Any]]:
+        """
+        Navbatdan olingan aniq postlarni band qiladi.
+
+        Only rows that are still 'pending' are claimed; deleted or already
+        claimed posts are silently skipped.  The IDs were already popped from
+        the delay queue, so posts that are still 'pending' but were skipped
+        because another transaction held their row lock are put back into the
+        queue (a second from now at the earliest) instead of being lost until
+        the next reconciliation.
+        """
+        query = """
+            WITH due AS (
+                SELECT id FROM scheduled_posts
+                WHERE id = ANY($2::int[]) AND status = 'pending'
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE scheduled_posts sp
+            SET status = 'claimed',
+                lease_owner = $1,
+                lease_expires_at = NOW() + make_interval(secs => $3)
+            FROM due
+            WHERE sp.id = due.id
+            RETURNING sp.*;
+        """
+        records = await self._pool.fetch(query, worker_id, post_ids, lease_seconds)
+        claimed = {record['id'] for record in records}
+        skipped = [post_id for post_id in post_ids if post_id not in claimed]
+        if skipped:
+            await self._requeue_skipped(skipped)
+        return [dict(record) for record in records]
+
+    async def _requeue_skipped(self, post_ids: List[int]) -> None:
+        """Navbatdan olingan, lekin band qilinmagan 'pending' postlarni navbatga qaytaradi."""
+        if self._delay_queue is None:
+            return
+        records = await self._pool.fetch(
+            """
+            SELECT id, GREATEST(next_fire_at, NOW() + INTERVAL '1 second') AS due_at
+            FROM scheduled_posts
+            WHERE id = ANY($1::int[]) AND status = 'pending';
+            """,
+            post_ids,
+        )
+        await self._enqueue([(record['id'], record['due_at']) for record in records])
+
+    async def renew_leases(self, worker_id: str, post_ids: List[int], lease_seconds: int) -> int:
+        """
+        Shu worker hali yuborayotgan postlarning lease muddatini uzaytiradi.
+
+        Only rows that are still 'claimed' by `worker_id` are touched.
+        Returns the number of renewed leases.
+        """
+        query = """
+            UPDATE scheduled_posts
+            SET lease_expires_at = NOW() + make_interval(secs => $3)
+            WHERE id = ANY($2::int[]) AND status = 'claimed' AND lease_owner = $1;
+        """
+        result = await self._pool.execute(query, worker_id, post_ids, lease_seconds)
+        return int(result.split()[-1])
+
+    async def release_expired_leases(self) -> int:
+        """Muddati o'tgan lease'larni 'pending' holatiga qaytaradi. Qaytarilgan postlar sonini beradi."""
+        query = """
+            UPDATE scheduled_posts
+            SET status = 'pending', lease_owner = NULL, lease_expires_at = NULL
+            WHERE status = 'claimed' AND lease_expires_at < NOW()
+            RETURNING id, next_fire_at;
+        """
         records = await self._pool.fetch(query)
+        await self._enqueue([(record['id'], record['next_fire_at']) for record in records])
+        return len(records)
+
+    async def schedule_retry(
+        self,
+        post_id: int,
+        delay_seconds: float,
+        error: str,
+        lease_owner: Optional[str] = None,
+        count_attempt: bool = True,
+    ) -> None:
+        """
+        Postni `delay_seconds` dan keyin qayta yuborish uchun 'pending' holatiga qaytaradi.
+
+        The attempt counter is incremented (unless `count_attempt` is False,
+        as for flood-waits) and the post is re-queued at its new due time.
+        With `lease_owner` nothing changes unless the post is still leased to
+        that worker.
+        """
+        query = """
+            UPDATE scheduled_posts
+            SET status = 'pending',
+                attempts = attempts + $5::int,
+                next_fire_at = NOW() + make_interval(secs => $2),
+                last_error = $3,
+                lease_owner = NULL,
+                lease_expires_at = NULL
+            WHERE id = $1 AND ($4::text IS NULL OR lease_owner = $4)
+            RETURNING next_fire_at;
+        """
+        next_fire_at = await self._pool.fetchval(query, post_id, delay_seconds, error, lease_owner, int(count_attempt))
+        if next_fire_at is not None:
+            await self._enqueue([(post_id, next_fire_at)])
+
+    async def move_to_dead_letter(self, post_id: int, error: str, lease_owner: Optional[str] = None) -> None:
+        """Postni 'error' holatiga o'tkazadi va uni dead-letter jadvaliga yozadi (`lease_owner` - schedule_retry'dagi kabi)."""
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                record = await conn.fetchrow(
+                    """
+                    UPDATE scheduled_posts
+                    SET status = 'error',
+                        attempts = attempts + 1,
+                        last_error = $2,
+                        lease_owner = NULL,
+                        lease_expires_at = NULL
+                    WHERE id = $1 AND ($3::text IS NULL OR lease_owner = $3)
+                    RETURNING channel_id, attempts;
+                    """,
+                    post_id,
+                    error,
+                    lease_owner,
+                )
+                if record is None:
+                    return
+                await conn.execute(
+                    """
+                    INSERT INTO dead_letter_posts (scheduled_post_id, channel_id, attempts, error)
+                    VALUES ($1, $2, $3, $4)
+                    ON CONFLICT (scheduled_post_id) DO UPDATE
+                        SET attempts = EXCLUDED.attempts,
+                            error = EXCLUDED.error,
+                            failed_at = now();
+                    """,
+                    post_id,
+                    record['channel_id'],
+                    record['attempts'],
+                    error,
+                )
+
+    async def get_dead_letters(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Eng so'nggi dead-letter yozuvlarini post ma'lumotlari bilan birga oladi."""
+        query = """
+            SELECT dl.scheduled_post_id, dl.channel_id, dl.attempts, dl.error, dl.failed_at,
+                   sp.user_id, sp.schedule_time, sp.post_text
+            FROM dead_letter_posts dl
+            JOIN scheduled_posts sp ON sp.id = dl.scheduled_post_id
+            ORDER BY dl.failed_at DESC
+            LIMIT $1;
+        """
+        records = await self._pool.fetch(query, limit)
         return [dict(record) for record in records]
 
+    async def requeue_dead_letter(self, post_id: int) -> bool:
+        """Dead-letter'dagi postni urinishlar hisobini nolga tushirib, qayta navbatga qo'yadi."""
+        now = datetime.now(timezone.utc)
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                deleted = await conn.execute(
+                    "DELETE FROM dead_letter_posts WHERE scheduled_post_id = $1;", post_id
+                )
+                if deleted == 'DELETE 0':
+                    return False
+                await conn.execute(
+                    """
+                    UPDATE scheduled_posts
+                    SET status = 'pending', attempts = 0, next_fire_at = $2, last_error = NULL
+                    WHERE id = $1;
+                    """,
+                    post_id,
+                    now,
+                )
+        await self._enqueue([(post_id, now)])
+        return True
+
+    async def rebuild_delay_queue(self, batch_size: int = 5000) -> int:
+        """
+        Barcha 'pending' postlarni Redis navbatiga qayta yozadi (reconciliation).
+
+        Rows are streamed with a server-side cursor, so the sweep stays cheap
+        even with a large backlog.  Returns the number of posts enqueued.
+        """
+        if self._delay_queue is None:
+            return 0
+
+        query = """
+            SELECT id, next_fire_at FROM scheduled_posts
+            WHERE status = 'pending' AND next_fire_at IS NOT NULL;
+        """
+        total = 0
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                cursor = await conn.cursor(query)
+                while True:
+                    records = await cursor.fetch(batch_size)
+                    if not records:
+                        break
+                    await self._delay_queue.add_many(
+                        (record['id'], record['next_fire_at']) for record in records
+                    )
+                    total += len(records)
+        return total
+
     async def count_user_posts_this_month(self, user_id: int) -> int:
         """Foydalanuvchining joriy oyda yaratgan postlari sonini hisoblaydi."""
         query = """
@@ -1,5 +1,21 @@
 import asyncpg
-from typing import Optional
+from typing import Any, Dict, Optional
+
+# TWA'da ko'rsatiladigan postlar: yuborilish arafasidagi ('claimed') postlar ham rejalashtirilgan hisoblanadi
+_ACTIVE_POST_STATUSES = "('pending', 'claimed')"
+
+_PLAN_JSON = """json_build_object(
+    'name', p.name,
+    'max_channels', p.max_channels,
+    'max_posts_per_month', p.max_posts_per_month
+)"""
+
+_CHANNEL_JSON = "json_build_object('id', c.id, 'title', c.title, 'username', c.username)"
+
+_POST_COLUMNS = """id, channel_id, post_text, media_id, media_type, media_group,
+    schedule_time, inline_buttons, recurrence_rule, next_fire_at,
+    delete_after_seconds"""
+
 
 class UserRepository:
     def __init__(self, pool: asyncpg.Pool):
@@ -33,4 +49,137 @@ class UserRepository:
             JOIN plans p ON u.plan_id = p.id
             WHERE u.id = $1
         """
-        return await self._pool.fetchval(query, user_id)
\ No newline at end of file
+        return await self._pool.fetchval(query, user_id)
+
+    async def get_initial_data(self, user_id: int, username: Optional[str]) -> Dict[str, Any]:
+        """
+        Foydalanuvchini (kerak bo'lsa) yaratadi va TWA boshlang'ich ma'lumotlarini bitta so'rov bilan oladi.
+
+        Returns ``{"version", "plan_id", "plan", "channels",
+        "scheduled_posts"}``: the user's data version, the plan as a dict
+        (or None), the user's channels and their active posts as lists of
+        dicts, all aggregated with ``json_agg`` in one statement, i.e. a
+        single round-trip.  JSON timestamps come back as ISO strings.
+        """
+        query = f"""
+            WITH new_user AS (
+                INSERT INTO users (id, username)
+                VALUES ($1, $2)
+                ON CONFLICT (id) DO NOTHING
+                RETURNING id, plan_id, data_version
+            ), app_user AS (
+                -- Yangi yozilgan qator shu so'rovning o'zida 'users' dan ko'rinmaydi
+                SELECT id, plan_id, data_version FROM new_user
+                UNION ALL
+                SELECT id, plan_id, data_version FROM users WHERE id = $1
+            )
+            SELECT
+                (SELECT data_version FROM app_user LIMIT 1) AS version,
+                (SELECT plan_id FROM app_user LIMIT 1) AS plan_id,
+                (
+                    SELECT {_PLAN_JSON}
+                    FROM app_user u JOIN plans p ON p.id = u.plan_id
+                    LIMIT 1
+                ) AS plan,
+                (
+                    SELECT COALESCE(json_agg({_CHANNEL_JSON} ORDER BY c.id), '[]'::json)
+                    FROM channels c
+                    WHERE c.user_id = $1
+                ) AS channels,
+                (
+                    SELECT COALESCE(json_agg(sp ORDER BY sp.next_fire_at), '[]'::json)
+                    FROM (
+                        SELECT {_POST_COLUMNS}
+                        FROM scheduled_posts
+                        WHERE user_id = $1 AND status IN {_ACTIVE_POST_STATUSES}
+                    ) sp
+                ) AS scheduled_posts;
+        """
+        record = await self._pool.fetchrow(query, user_id, username)
+        return dict(record)
+
+    async def get_data_version(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Foydalanuvchining ma'lumotlar versiyasi va tarifi (ETag uchun); foydalanuvchi bo'lmasa None."""
+        query = "SELECT data_version AS version, plan_id FROM users WHERE id = $1"
+        record = await self._pool.fetchrow(query, user_id)
+        return dict(record) if record else None
+
+    async def get_changes(self, user_id: int, since: int) -> Optional[Dict[str, Any]]:
+        """
+        `since` versiyasidan keyin o'zgargan kanal va postlarni bitta so'rov bilan oladi.
+
+        Returns ``{"version", "sync_floor", "plan_id", "plan", "channels",
+        "scheduled_posts", "deleted_channels", "deleted_posts"}`` or None
+        for an unknown user.  Upserts are the rows whose ``version`` is
+        above `since`; deletions come from ``sync_tombstones`` plus the
+        posts that stopped being active (sent, expired, failed) since then.
+        The caller must check `since` against ``sync_floor``: below it,
+        tombstones may already have been purged.
+        """
+        query = f"""
+            SELECT
+                u.data_version AS version,
+                u.sync_floor,
+                u.plan_id,
+                (SELECT {_PLAN_JSON} FROM plans p WHERE p.id = u.plan_id) AS plan,
+                (
+                    SELECT COALESCE(json_agg({_CHANNEL_JSON} ORDER BY c.id), '[]'::json)
+                    FROM channels c
+                    WHERE c.user_id = u.id AND c.version > $2
+                ) AS channels,
+                (
+                    SELECT COALESCE(json_agg(sp ORDER BY sp.next_fire_at), '[]'::json)
+                    FROM (
+                        SELECT {_POST_COLUMNS}
+                        FROM scheduled_posts
+                        WHERE user_id = u.id AND version > $2 AND status IN {_ACTIVE_POST_STATUSES}
+                    ) sp
+                ) AS scheduled_posts,
+                (
+                    SELECT COALESCE(json_agg(t.entity_id ORDER BY t.entity_id), '[]'::json)
+                    FROM sync_tombstones t
+                    WHERE t.user_id = u.id AND t.entity = 'channel' AND t.version > $2
+                ) AS deleted_channels,
+                (
+                    SELECT COALESCE(json_agg(d.id ORDER BY d.id), '[]'::json)
+                    FROM (
+                        SELECT t.entity_id AS id
+                        FROM sync_tombstones t
+                        WHERE t.user_id = u.id AND t.entity = 'scheduled_post' AND t.version > $2
+                        UNION ALL
+                        SELECT id FROM scheduled_posts
+                        WHERE user_id = u.id AND version > $2 AND status NOT IN {_ACTIVE_POST_STATUSES}
+                    ) d
+                ) AS deleted_posts
+            FROM users u
+            WHERE u.id = $1;
+        """
+        record = await self._pool.fetchrow(query, user_id, since)
+        return dict(record) if record else None
+
+    async def purge_sync_tombstones(self, retention_days: int) -> int:
+        """
+        `retention_days` kundan eski tombstone'larni o'chiradi va foydalanuvchilarning `sync_floor` ini ko'taradi.
+
+        A client whose version is below the new floor can no longer be
+        given a complete delta and has to reload everything.  Returns the
+        number of tombstones removed.
+        """
+        query = """
+            WITH purged AS (
+                DELETE FROM sync_tombstones
+                WHERE deleted_at < now() - make_interval(days => $1)
+                RETURNING user_id, version
+            ), floors AS (
+                SELECT user_id, max(version) AS floor, count(*) AS purged
+                FROM purged
+                GROUP BY user_id
+            ), raised AS (
+                UPDATE users u
+                SET sync_floor = GREATEST(u.sync_floor, f.floor)
+                FROM floors f
+                WHERE u.id = f.user_id
+            )
+            SELECT COALESCE(sum(purged), 0) FROM floors;
+        """
+        return await self._pool.fetchval(query, retention_days)
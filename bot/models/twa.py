@@ -9,10 +9,13 @@ the repositories.  These models are intentionally minimal and are not
 backed by any ORM.
 """
 
-from datetime import datetime
-from typing import List, Optional
+from datetime import date, datetime
+from typing import List, Literal, Optional, Tuple
 
-from pydantic import BaseModel, Field, field_validator, ConfigDict
+from pydantic import BaseModel, Field, field_validator, model_validator, ConfigDict
+
+from bot.utils.media import SEND_METHODS, validate_media_group
+from bot.utils.recurrence import CronSchedule
 
 
 class Button(BaseModel):
@@ -41,15 +44,67 @@ class AddChannelRequest(BaseModel):
         return v
 
 
+class MediaItem(BaseModel):
+    """A single item of an album, referenced by its Telegram ``file_id``."""
+
+    media_id: str
+    media_type: str
+
+
 class SchedulePostRequest(BaseModel):
-    """Request body for scheduling a post."""
+    """Request body for scheduling a post.
+
+    ``recurrence`` is an optional five-field cron expression (UTC); the post
+    is first sent at ``scheduled_at`` and then at every following match.
+    ``media_group`` sends 2-10 items as a single album instead of
+    ``media_id``; albums cannot carry buttons.  ``delete_after_seconds``
+    deletes every sent copy that long after it was published.
+    """
 
     channel_id: int
     scheduled_at: datetime
     text: Optional[str] = None
     media_id: Optional[str] = None
     media_type: Optional[str] = None
+    media_group: Optional[List[MediaItem]] = None
     buttons: Optional[List[Button]] = None
+    recurrence: Optional[str] = None
+    delete_after_seconds: Optional[int] = Field(default=None, gt=0)
+
+    @field_validator("media_type")
+    @classmethod
+    def media_type_must_be_known(cls, v: Optional[str]) -> Optional[str]:
+        """Only media types the dispatcher knows how to send are accepted."""
+        if v is not None and v not in SEND_METHODS:
+            raise ValueError(f"Unsupported media type: {v}")
+        return v
+
+    @field_validator("media_group")
+    @classmethod
+    def media_group_must_be_valid(cls, v: Optional[List[MediaItem]]) -> Optional[List[MediaItem]]:
+        """Enforce Telegram's album size and type-mixing rules."""
+        if not v:
+            return None
+        validate_media_group([item.media_type for item in v])
+        return v
+
+    @field_validator("recurrence")
+    @classmethod
+    def recurrence_must_be_valid(cls, v: Optional[str]) -> Optional[str]:
+        """Reject cron expressions that cannot be parsed."""
+        if v is None or not v.strip():
+            return None
+        CronSchedule(v)
+        return v.strip()
+
+    @model_validator(mode="after")
+    def media_group_is_exclusive(self) -> "SchedulePostRequest":
+        """Telegram albums carry neither buttons nor a separate single media."""
+        if self.media_group and self.buttons:
+            raise ValueError("A media group cannot have buttons")
+        if self.media_group and self.media_id:
+            raise ValueError("Use either media_id or media_group, not both")
+        return self
 
 
 class Channel(BaseModel):
@@ -69,7 +124,130 @@ class ScheduledPost(BaseModel):
     text: Optional[str] = None
     media_id: Optional[str] = None
     media_type: Optional[str] = None
+    media_group: Optional[List[MediaItem]] = None
     buttons: Optional[List[Button]] = None
+    recurrence: Optional[str] = None
+    next_fire_at: Optional[datetime] = None
+    delete_after_seconds: Optional[int] = None
+
+
+MAX_BATCH_POSTS = 500
+
+
+class SchedulePostsBatchRequest(BaseModel):
+    """Request body for scheduling many posts at once.
+
+    Items are validated one by one against :class:`SchedulePostRequest`,
+    so one malformed post is reported in its result instead of rejecting
+    the whole batch.
+    """
+
+    posts: List[dict] = Field(min_length=1, max_length=MAX_BATCH_POSTS)
+
+
+class BatchPostResult(BaseModel):
+    """Outcome of one item of a batch, ``index`` being its position in the request."""
+
+    index: int
+    ok: bool
+    post: Optional[ScheduledPost] = None
+    error: Optional[str] = None
+
+
+class SchedulePostsBatchResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BatchPostResult] = Field(default_factory=list)
+
+
+class PostActionRequest(BaseModel):
+    """Request body for scheduling a delete or edit of a published post.
+
+    The action applies to the latest sent copy of the post at ``run_at``;
+    ``text`` is the new text (or caption) for an edit.
+    """
+
+    action: Literal["delete", "edit"]
+    run_at: datetime
+    text: Optional[str] = None
+
+    @model_validator(mode="after")
+    def text_required_for_edit(self) -> "PostActionRequest":
+        """An edit without new text would be a no-op."""
+        if self.action == "edit" and not self.text:
+            raise ValueError("text is required for an edit")
+        return self
+
+
+class PostAction(BaseModel):
+    """Representation of a scheduled post action returned from the API."""
+
+    id: int
+    post_id: int
+    action: str
+    run_at: datetime
+
+
+class TopPost(BaseModel):
+    """A post in the channel's most-viewed list."""
+
+    id: int
+    views: int
+    text: Optional[str] = None
+    media_type: Optional[str] = None
+    scheduled_at: Optional[datetime] = None
+
+
+class TopPostsPage(BaseModel):
+    """One page of top posts; pass ``next_cursor`` as ``after`` to get the next page."""
+
+    posts: List[TopPost] = Field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
+class EngagementTopPost(BaseModel):
+    """A post and its views relative to the channel median."""
+
+    post_id: int
+    relative_engagement: float
+
+
+class ChannelEngagementStats(BaseModel):
+    """Engagement metrics of one channel.
+
+    ``heatmap`` is 7 x 24 (Monday..Sunday x UTC hour) of the average
+    relative engagement of posts sent in that slot; ``best_hour_of_week``
+    is ``[weekday, hour]`` of the best slot.
+    """
+
+    channel_id: int
+    posts: int
+    velocity: float
+    half_life_hours: Optional[float] = None
+    median_views: float
+    top_posts: List[EngagementTopPost] = Field(default_factory=list)
+    heatmap: List[List[Optional[float]]] = Field(default_factory=list)
+    best_hour_of_week: Optional[Tuple[int, int]] = None
+
+
+class ViewPercentiles(BaseModel):
+    """Percentiles of post views 24 hours after sending."""
+
+    posts: int
+    p50: Optional[float] = None
+    p90: Optional[float] = None
+    p99: Optional[float] = None
+
+
+class DailyViewPercentiles(ViewPercentiles):
+    day: date
+
+
+class ChannelViewPercentiles(ViewPercentiles):
+    """Percentiles of one channel over the whole period, optionally per day."""
+
+    channel_id: int
+    days: Optional[List[DailyViewPercentiles]] = None
 
 
 class User(BaseModel):
@@ -88,6 +266,23 @@ class InitialDataResponse(BaseModel):
     plan: Optional[Plan] = None
     channels: List[Channel] = Field(default_factory=list)
     scheduled_posts: List[ScheduledPost] = Field(default_factory=list)
+    # Ma'lumotlar versiyasi: keyingi /sync?since=... so'rovlari uchun boshlang'ich nuqta
+    version: int = 0
+
+
+class SyncResponse(BaseModel):
+    """Changes since the client's ``since`` version.
+
+    Deletions are applied before upserts; ``version`` becomes the client's
+    next ``since``.
+    """
+
+    version: int
+    plan: Optional[Plan] = None
+    channels: List[Channel] = Field(default_factory=list)
+    scheduled_posts: List[ScheduledPost] = Field(default_factory=list)
+    deleted_channels: List[int] = Field(default_factory=list)
+    deleted_posts: List[int] = Field(default_factory=list)
 
 
 class ValidationErrorResponse(BaseModel):
@@ -1,11 +1,17 @@
 from .analytics_service import AnalyticsService
 from .guard_service import GuardService
+from .media_service import MediaService
+from .post_action_service import PostActionService
+from .send_result_buffer import SendResultBuffer
 from .scheduler_service import SchedulerService
 from .subscription_service import SubscriptionService
 
 __all__ = [
     "AnalyticsService",
     "GuardService",
+    "MediaService",
+    "PostActionService",
     "SchedulerService",
+    "SendResultBuffer",
     "SubscriptionService",
 ]
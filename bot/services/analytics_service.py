@@ -1,65 +1,337 @@
 import asyncio
+import hashlib
+import io
 import logging
-from typing import List
-from aiogram import Bot
-from aiogram.exceptions import TelegramBadRequest
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import redis.asyncio as redis
+from redis.exceptions import RedisError
 
+from bot.config import Settings
 from bot.database.repositories.analytics_repository import AnalyticsRepository
+from bot.utils.charts import ChartRenderer, ChartSeries
+from bot.utils.engagement import ChannelEngagement, SnapshotSeries, compute_engagement
+from bot.utils.tdigest import TDigest
+from bot.utils.rate_limiter import AIMDRateController
+from bot.utils.views_source import MTProtoViewsSource, ViewsRateLimited, ViewsUnavailable
 
 # Logger sozlamalari
 logger = logging.getLogger(__name__)
 
+# RetryAfter kelganda bitta partiyani qayta so'rash soni
+_MAX_THROTTLED_ATTEMPTS = 3
+# Kanal taqsimotidan qaytariladigan kvantillar
+VIEW_PERCENTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+
+
+@dataclass
+class ViewCollectionReport:
+    """Summary of one view-collection run."""
+    posts: int = 0
+    requests: int = 0
+    updated: int = 0
+    changed: int = 0
+    errors: int = 0
+    throttled: int = 0
+    elapsed: float = 0.0
+    final_rate: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Posts processed per second."""
+        return self.posts / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        """Share of requests that failed for good."""
+        return self.errors / self.requests if self.requests else 0.0
+
+
 class AnalyticsService:
-    def __init__(self, bot: Bot, analytics_repository: AnalyticsRepository):
+    def __init__(
+        self,
+        views_source: MTProtoViewsSource,
+        analytics_repository: AnalyticsRepository,
+        settings: Settings,
+        rate_controller: AIMDRateController,
+        redis_conn: redis.Redis,
+        chart_renderer: ChartRenderer,
+    ):
         self.analytics_repository = analytics_repository
-        self.bot = bot
+        self.views_source = views_source
+        self.settings = settings
+        self.rate_controller = rate_controller
+        self.redis = redis_conn
+        self.chart_renderer = chart_renderer
 
-    async def update_all_post_views(self):
+    async def update_all_post_views(self) -> ViewCollectionReport:
         """
-        Barcha kanallardagi barcha postlarning ko'rishlar sonini Telegramdan so'rab oladi
+        Yangilash vaqti kelgan postlarning ko'rishlar sonini Telegramdan so'rab oladi
         va ma'lumotlar bazasini yangilaydi. Bu metod endi argument talab qilmaydi.
+
+        Due posts are claimed in chunks of ``VIEWS_CLAIM_BATCH_SIZE``; the
+        claim itself reschedules each post by age (see
+        ``AnalyticsRepository.claim_posts_to_track_views``), so overlapping
+        runs split the work instead of polling the same posts, and old posts
+        are polled less and less often and eventually not at all.  Every
+        observed count is also appended to ``post_view_snapshots``.
+
+        Views are read through ``MTProtoViewsSource`` (the Bot API cannot
+        read them); when it is not configured the run is skipped and no post
+        is claimed.  Message IDs are grouped per channel into requests of
+        up to ``VIEWS_BATCH_SIZE``; at most ``VIEWS_CONCURRENCY`` requests
+        run at once, paced by an AIMD controller that backs off on flood
+        waits.
         """
-        # Yuqorida yaratilgan yangi metod orqali postlarni olamiz
-        posts = await self.analytics_repository.get_all_posts_to_track_views()
+        started = time.monotonic()
+        report = ViewCollectionReport()
+        if not self.views_source.enabled:
+            logger.warning("Ko'rishlarni yig'ish o'chirilgan: TELEGRAM_API_ID/TELEGRAM_API_HASH yoki telethon yo'q")
+            return report
+
+        limit = self.settings.VIEWS_CLAIM_BATCH_SIZE
+        while True:
+            posts = await self.analytics_repository.claim_posts_to_track_views(limit)
+            if not posts:
+                break
+            report.posts += len(posts)
+            logger.info(f"{len(posts)} ta postning ko'rishlarini yangilash boshlandi.")
+            await self._collect_views(posts, report)
+            if len(posts) < limit:
+                break
 
-        if not posts:
+        if not report.posts:
             logger.info("Yangilash uchun postlar topilmadi.")
-            return
+            return report
 
-        logger.info(f"{len(posts)} ta postning ko'rishlarini yangilash boshlandi.")
+        report.elapsed = time.monotonic() - started
+        report.final_rate = self.rate_controller.rate
+        logger.info(
+            f"Barcha postlarning ko'rishlarini yangilash yakunlandi: {report.updated}/{report.posts} posts "
+            f"({report.changed} changed), "
+            f"{report.requests} requests, {report.throughput:.1f} posts/s, "
+            f"error rate {report.error_rate:.1%}, {report.throttled} throttled, "
+            f"rate {report.final_rate:.1f} req/s"
+        )
+        return report
 
+    async def _collect_views(self, posts: List[dict], report: ViewCollectionReport) -> None:
+        """Band qilingan postlarning ko'rishlarini yig'adi va natijalarni bazaga yozadi."""
+        by_channel: Dict[int, List[dict]] = defaultdict(list)
         for post in posts:
+            by_channel[post['channel_id']].append(post)
+        batch_size = self.settings.VIEWS_BATCH_SIZE
+        batches: List[Tuple[int, List[dict]]] = [
+            (channel_id, channel_posts[i:i + batch_size])
+            for channel_id, channel_posts in by_channel.items()
+            for i in range(0, len(channel_posts), batch_size)
+        ]
+
+        semaphore = asyncio.Semaphore(self.settings.VIEWS_CONCURRENCY)
+        snapshots: List[Tuple[int, datetime, int]] = []
+        views: List[Tuple[int, int]] = []
+
+        async def collect(channel_id: int, batch: List[dict]) -> None:
+            async with semaphore:
+                await self._collect_batch(channel_id, batch, report, snapshots, views)
+
+        await asyncio.gather(*(collect(channel_id, batch) for channel_id, batch in batches))
+        # Barcha yangi qiymatlar bitta so'rov bilan yoziladi; o'zgarmaganlari o'tkazib yuboriladi
+        report.changed += await self.analytics_repository.bulk_update_views(views)
+        try:
+            await self.analytics_repository.record_view_snapshots(snapshots)
+        except Exception as e:
+            # Tarix yozilmasa ham joriy ko'rishlar soni saqlangan bo'ladi
+            logger.error(f"{len(snapshots)} ta ko'rishlar tarixini yozib bo'lmadi: {e}", exc_info=True)
+        try:
+            # 24 soatdan oshgan postlar bir marta kanal/kun taqsimoti (t-digest) ga qo'shiladi
+            await self.analytics_repository.record_views_24h(
+                [(sent_post_id, views) for sent_post_id, _, views in snapshots]
+            )
+        except Exception as e:
+            logger.error(f"Ko'rishlar taqsimotini yangilab bo'lmadi: {e}", exc_info=True)
+
+    async def _collect_batch(
+        self,
+        channel_id: int,
+        batch: List[dict],
+        report: ViewCollectionReport,
+        snapshots: List[Tuple[int, datetime, int]],
+        views: List[Tuple[int, int]],
+    ) -> None:
+        """Bitta kanaldagi bir guruh xabarning ko'rishlarini bitta so'rov bilan oladi."""
+        for _ in range(_MAX_THROTTLED_ATTEMPTS):
+            await self.rate_controller.acquire()
+            report.requests += 1
             try:
-                # get_messages xabarlar ro'yxatini qaytaradi, bizga faqat bittasi kerak
-                messages = await self.bot.get_messages(
-                    chat_id=post['channel_id'],
-                    message_ids=[post['message_id']]
-                )
-                
-                # Agar xabar mavjud bo'lsa va unda ko'rishlar soni bo'lsa
-                if messages and messages[0] and messages[0].views is not None:
-                    # Ma'lumotlar bazasidagi ko'rishlar sonini yangilaymiz
-                    await self.analytics_repository.update_post_views(
-                        scheduled_post_id=post['id'], views=messages[0].views
-                    )
-                    logger.debug(f"Post ID {post['id']} ning ko'rishlari {messages[0].views} ga yangilandi.")
-                
-                # Telegram API'ga bosimni kamaytirish uchun kichik pauza
-                await asyncio.sleep(0.5)
-
-            except TelegramBadRequest as e:
-                # Xabar o'chirilgan yoki bot kanaldan chiqarilgan bo'lishi mumkin
-                logger.warning(f"Xabar {post['message_id']} ni kanal {post['channel_id']} dan olishda xatolik: {e}")
+                counts = await self.views_source.get_views(channel_id, [post['message_id'] for post in batch])
+            except ViewsRateLimited as e:
+                report.throttled += 1
+                await self.rate_controller.on_throttle(e.retry_after)
                 continue
+            except ViewsUnavailable as e:
+                # Xabar o'chirilgan yoki bot kanaldan chiqarilgan bo'lishi mumkin
+                report.errors += 1
+                logger.warning(f"Kanal {channel_id} dan {len(batch)} ta xabarni olishda xatolik: {e}")
+                return
             except Exception as e:
-                logger.error(f"Post ID {post['id']} ni yangilashda kutilmagan xatolik: {e}", exc_info=True)
+                report.errors += 1
+                logger.error(f"Kanal {channel_id} postlarini yangilashda kutilmagan xatolik: {e}", exc_info=True)
+                return
+            break
+        else:
+            report.errors += 1
+            logger.warning(f"Kanal {channel_id} uchun so'rovlar cheklovdan chiqmadi, keyingi safar yangilanadi")
+            return
+
+        await self.rate_controller.on_success()
+        observed_at = datetime.now(timezone.utc)
+        # Javob so'ralgan tartibda keladi; o'chirilgan xabarlar uchun None
+        for post, count in zip(batch, counts):
+            if count is not None:
+                views.append((post['id'], count))
+                snapshots.append((post['sent_post_id'], observed_at, count))
+                report.updated += 1
+
+    async def refresh_channel_rollups(self) -> Optional[datetime]:
+        """
+        Kanal rollup'larini watermark'dan hozirgi vaqtgacha (lag bilan) yangilaydi.
+
+        Works through the backlog in spans of ``ROLLUP_MAX_SPAN_HOURS``, one
+        transaction each, so a long backfill never holds a huge transaction.
+        Returns the final watermark (None if there was nothing new).
+        """
+        lag = self.settings.ROLLUP_LAG_SECONDS
+        target = datetime.now(timezone.utc) - timedelta(seconds=lag)
+        watermark = None
+        while True:
+            advanced = await self.analytics_repository.advance_channel_rollups(
+                lag_seconds=lag, max_span_hours=self.settings.ROLLUP_MAX_SPAN_HOURS
+            )
+            if advanced is None:
+                break
+            watermark = advanced
+            logger.debug(f"Kanal rollup'lari {watermark} gacha yangilandi")
+            if watermark >= target:
+                break
+        return watermark
+
+    async def get_channel_stats(self, channel_id: int, unit: str = "day", days: int = 30) -> List[Dict[str, Any]]:
+        """Kanalning oxirgi `days` kunlik statistikasini rollup jadvallaridan oladi."""
+        since = datetime.now(timezone.utc) - timedelta(days=days)
+        return await self.analytics_repository.get_channel_rollups(channel_id, unit=unit, since=since)
+
+    async def create_views_chart(self, user_id: int, channel_id: Optional[int] = None) -> Optional[io.BytesIO]:
+        """
+        Foydalanuvchi kanallarining kunlik ko'rishlar grafigini PNG sifatida qaytaradi.
+
+        The daily rollup rows behind the chart are cheap to read, so they
+        are always fetched and hashed into a data version; only rendering
+        is skipped when the version is unchanged.  Each ``(user, channel)``
+        has a single Redis hash holding the version and the PNG, which is
+        overwritten when the data changes, so rollup runs never leave
+        orphaned images behind.  Rendering itself runs in the
+        ``ChartRenderer`` process pool.  Returns None if there is no data.
+        """
+        since = datetime.now(timezone.utc) - timedelta(days=self.settings.CHART_DAYS)
+        rows = await self.analytics_repository.get_user_daily_views(user_id, channel_id=channel_id, since=since)
+        if not rows:
+            return None
+
+        digest = hashlib.sha1()
+        for row in rows:
+            digest.update(f"{row['channel_id']}|{row['title']}|{row['bucket'].isoformat()}|{row['views_gained']}\n".encode())
+        version = digest.hexdigest().encode()
+        cache_key = f"chart:views:{user_id}:{channel_id or 'all'}"
+        try:
+            cached_version, cached = await self.redis.hmget(cache_key, "version", "png")
+        except RedisError as e:
+            logger.warning(f"Grafik keshini o'qib bo'lmadi: {e}")
+            cached_version = cached = None
+        if cached and cached_version == version:
+            return io.BytesIO(cached)
+
+        series: ChartSeries = defaultdict(list)
+        for row in rows:
+            series[row['title']].append((row['bucket'].date(), row['views_gained']))
+        png = await self.chart_renderer.render_views_chart(
+            dict(series), f"Views per day (last {self.settings.CHART_DAYS} days)"
+        )
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hset(cache_key, mapping={"version": version, "png": png})
+                pipe.expire(cache_key, self.settings.CHART_CACHE_TTL)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Grafikni keshga yozib bo'lmadi: {e}")
+        return io.BytesIO(png)
+
+    async def get_channel_engagement(
+        self, channel_ids: Optional[List[int]] = None, days: int = 30
+    ) -> Dict[int, ChannelEngagement]:
+        """
+        Kanallar (None - barchasi) uchun engagement ko'rsatkichlarini hisoblaydi.
+
+        Covers posts sent in the last `days` days.  The arithmetic runs in a
+        worker thread (NumPy releases the GIL for most of it), so the event
+        loop stays responsive even for large series.
+        """
+        now = datetime.now(timezone.utc)
+        columns = await self.analytics_repository.get_view_snapshot_columns(
+            since=now - timedelta(days=days), channel_ids=channel_ids
+        )
+        series = SnapshotSeries.from_columns(columns)
+        return await asyncio.to_thread(compute_engagement, series, now.timestamp())
+
+    async def get_view_percentiles(
+        self, channel_ids: List[int], days: int = 30, per_day: bool = False
+    ) -> Dict[int, Dict[str, Any]]:
+        """
+        Kanallar bo'yicha postlarning 24 soatlik ko'rishlari p50/p90/p99 ni qaytaradi.
+
+        The stored per-day t-digests are merged at query time, so the cost
+        depends on the number of days, not on the number of posts.  With
+        `per_day` the result also lists every day on its own.
+        """
+        since = (datetime.now(timezone.utc) - timedelta(days=days)).date()
+        rows = await self.analytics_repository.get_view_sketches(channel_ids, since=since)
+
+        def summary(digest: TDigest) -> Dict[str, Any]:
+            return {
+                "posts": digest.count,
+                **{name: digest.quantile(q) for name, q in VIEW_PERCENTILES.items()},
+            }
+
+        merged: Dict[int, TDigest] = {}
+        result: Dict[int, Dict[str, Any]] = {}
+        for row in rows:
+            digest = TDigest.from_bytes(row['sketch'])
+            if not digest.count:
                 continue
-        
-        logger.info("Barcha postlarning ko'rishlarini yangilash yakunlandi.")
+            if per_day:
+                result.setdefault(row['channel_id'], {"days": []})["days"].append(
+                    {"day": row['day'], **summary(digest)}
+                )
+            merged.setdefault(row['channel_id'], TDigest(digest.compression)).merge(digest)
+        for channel_id, digest in merged.items():
+            result.setdefault(channel_id, {}).update(summary(digest))
+        return result
 
-    async def get_posts_ordered_by_views(self, channel_id: int):
+    async def get_posts_ordered_by_views(
+        self, channel_id: int, limit: int = 20, after: Optional[Tuple[int, int]] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, int]]]:
         """
-        Kanalning postlarini ko'rishlar soni bo'yicha saralab qaytaradi.
-        (Bu metod o'zgarishsiz qoladi)
+        Kanalning postlarini ko'rishlar soni bo'yicha saralab, sahifalab qaytaradi.
+
+        Returns the page and the ``(views, id)`` cursor of the next one
+        (None on the last page).  One extra row is fetched to tell the two
+        apart without a COUNT.
         """
-        return await self.analytics_repository.get_posts_ordered_by_views(channel_id)
+        rows = await self.analytics_repository.get_posts_ordered_by_views(channel_id, limit=limit + 1, after=after)
+        if len(rows) <= limit:
+            return rows, None
+        page = rows[:limit]
+        return page, (page[-1]['views'], page[-1]['id'])
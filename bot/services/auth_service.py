@@ -1,9 +1,90 @@
 import hmac
 import hashlib
-from urllib.parse import unquote
+import json
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, Tuple
+from urllib.parse import parse_qsl
 
 from fastapi import HTTPException
 
+
+class InitDataVerifier:
+    """
+    Telegram Web App initData'sini tekshiradi.
+
+    The ``WebAppData`` secret key is derived from the bot token once, the
+    query string is parsed in a single pass, and ``auth_date`` must be no
+    older than `max_age_seconds` (0 disables the check).  Verified initData
+    strings are kept in a small LRU cache for `cache_ttl` seconds, so the
+    repeated requests of one TWA session skip the HMAC and JSON work.
+    """
+
+    def __init__(
+        self,
+        bot_token: str,
+        max_age_seconds: int = 86400,
+        cache_size: int = 1024,
+        cache_ttl: float = 300.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._secret_key = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+        self.max_age_seconds = max_age_seconds
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._clock = clock
+        # initData -> (amal qilish muddati, foydalanuvchi ma'lumotlari)
+        self._cache: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+
+    def verify(self, init_data: str) -> dict:
+        """
+        Returns the decoded ``user`` object of a valid initData string.
+
+        Raises ``ValueError`` if the signature is wrong, fields are missing
+        or the data is too old.
+        """
+        now = self._clock()
+        cached = self._cache.get(init_data)
+        if cached is not None:
+            expires_at, user = cached
+            if now < expires_at:
+                self._cache.move_to_end(init_data)
+                return dict(user)
+            del self._cache[init_data]
+
+        fields: Dict[str, str] = dict(parse_qsl(init_data, keep_blank_values=True, strict_parsing=True))
+        received_hash = fields.pop("hash", None)
+        if received_hash is None:
+            raise ValueError("Hash not found in initData")
+
+        # Telegram qoidasi: 'hash' dan boshqa barcha maydonlar, kalit bo'yicha saralangan
+        data_check_string = "\n".join(f"{key}={fields[key]}" for key in sorted(fields))
+        calculated_hash = hmac.new(self._secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(calculated_hash, received_hash):
+            raise ValueError("Hash mismatch")
+
+        auth_date = int(fields["auth_date"])
+        expires_at = now + self.cache_ttl
+        if self.max_age_seconds:
+            if now - auth_date > self.max_age_seconds:
+                raise ValueError("initData has expired")
+            # Keshdagi yozuv initData eskirgan paytdan ortiq yashamaydi
+            expires_at = min(expires_at, auth_date + self.max_age_seconds)
+
+        user = json.loads(fields["user"])
+        if self.cache_size > 0:
+            self._cache[init_data] = (expires_at, user)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return dict(user)
+
+
+@lru_cache(maxsize=8)
+def _verifier_for(bot_token: str) -> InitDataVerifier:
+    return InitDataVerifier(bot_token)
+
+
 def validate_init_data(init_data: str, bot_token: str) -> dict:
     """
     Validates the initData string from a Telegram Web App.
@@ -19,41 +100,6 @@ def validate_init_data(init_data: str, bot_token: str) -> dict:
         HTTPException: If validation fails.
     """
     try:
-        # initData'ni qismlarga ajratamiz
-        data_params = sorted([
-            x.split('=', 1) for x in init_data.split('&')
-            if x.startswith('user=') or x.startswith('auth_date=')
-        ], key=lambda x: x[0])
-
-        # Tekshirish uchun qator (string) hosil qilamiz
-        data_check_string = "\n".join([f"{k}={v}" for k, v in data_params])
-        
-        # initData'dan hash'ni olamiz
-        received_hash = None
-        for param in init_data.split('&'):
-            if param.startswith('hash='):
-                received_hash = param.split('=', 1)[1]
-                break
-
-        if received_hash is None:
-            raise ValueError("Hash not found in initData")
-
-        # Maxfiy kalitni yaratamiz
-        secret_key = hmac.new("WebAppData".encode(), bot_token.encode(), hashlib.sha256).digest()
-        
-        # O'zimiz hash hisoblaymiz
-        calculated_hash = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
-
-        # Ikkala hash'ni solishtiramiz
-        if calculated_hash != received_hash:
-            raise ValueError("Hash mismatch")
-
-        # Foydalanuvchi ma'lumotlarini ajratib olamiz
-        user_data_str = [x for x in init_data.split('&') if x.startswith('user=')][0]
-        user_data_json = unquote(user_data_str.split('=', 1)[1])
-        
-        import json
-        return json.loads(user_data_json)
-
+        return _verifier_for(bot_token).verify(init_data)
     except (ValueError, IndexError, KeyError) as e:
-        raise HTTPException(status_code=401, detail=f"Unauthorized: Invalid initData. {e}")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail=f"Unauthorized: Invalid initData. {e}")
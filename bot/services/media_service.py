@@ -0,0 +1,114 @@
+import asyncio
+import hashlib
+import io
+import logging
+from typing import AsyncGenerator, BinaryIO, Optional
+
+from aiogram import Bot
+from aiogram.types import InputFile, Message
+
+from bot.config import Settings
+from bot.database.repositories import MediaRepository
+from bot.utils.media import SEND_METHODS, media_type_for
+
+logger = logging.getLogger(__name__)
+
+
+def _file_id_of(message: Message, media_type: str) -> str:
+    if media_type == "photo":
+        # Eng katta o'lchamdagi variant
+        return message.photo[-1].file_id
+    return getattr(message, media_type).file_id
+
+
+def _on_disk(file: BinaryIO) -> bool:
+    """Fayl diskda turibdimi (SpooledTemporaryFile xotiradan oshib ketgan bo'lsa)."""
+    if isinstance(file, io.BytesIO):
+        return False
+    # Starlette ham UploadFile uchun shu belgini tekshiradi
+    return getattr(file, "_rolled", True)
+
+
+async def _read(file: BinaryIO, size: int) -> bytes:
+    """Diskdagi fayldan o'qish event loop'ni to'xtatmasligi uchun thread'da bajariladi."""
+    if _on_disk(file):
+        return await asyncio.to_thread(file.read, size)
+    return file.read(size)
+
+
+class UploadInputFile(InputFile):
+    """Yuklangan faylni Telegram'ga o'sha joyidan bo'laklab yuboradi (nusxa olinmaydi)."""
+
+    def __init__(self, file: BinaryIO, filename: str, chunk_size: int = 64 * 1024):
+        super().__init__(filename=filename, chunk_size=chunk_size)
+        self.file = file
+
+    async def read(self, bot: Bot) -> AsyncGenerator[bytes, None]:
+        self.file.seek(0)
+        while chunk := await _read(self.file, self.chunk_size):
+            yield chunk
+
+
+class MediaService:
+    """
+    Media fayllarni Telegram'ga yuklaydi va ularning file_id'larini keshlaydi.
+
+    Uploads are content-addressed: the SHA-256 of the file is looked up in
+    ``media_files`` first, and only unseen content is sent to the storage
+    channel.  Everything after that (scheduling, sending, albums) refers to
+    the media by ``file_id`` alone.
+
+    The upload is hashed in place, chunk by chunk, from the file the web
+    server has already spooled (reads run in a thread once it is on disk),
+    and then streamed to Telegram from that same file, so no second copy is
+    made.  At most ``MEDIA_UPLOAD_CONCURRENCY`` uploads are processed at
+    once per process.  The service is a container singleton and uses the
+    container's shared ``Bot``.
+    """
+
+    def __init__(self, bot: Bot, settings: Settings, media_repo: MediaRepository):
+        self.bot = bot
+        self.settings = settings
+        self.media_repo = media_repo
+        self._semaphore = asyncio.Semaphore(settings.MEDIA_UPLOAD_CONCURRENCY)
+
+    async def upload(self, content: bytes, content_type: Optional[str], filename: Optional[str] = None) -> dict:
+        """Xotiradagi kontent uchun `upload_file` bilan bir xil."""
+        return await self.upload_file(io.BytesIO(content), content_type, filename)
+
+    async def upload_file(
+        self, file: BinaryIO, content_type: Optional[str], filename: Optional[str] = None
+    ) -> dict:
+        """
+        Returns ``{"file_id", "media_type", "cached"}`` for the uploaded content.
+
+        `file` is read from its start, e.g. ``UploadFile.file``.  Raises
+        ``ValueError`` if the content type is not supported (before anything
+        is read) or the content is larger than ``MEDIA_MAX_UPLOAD_BYTES``.
+        """
+        media_type = media_type_for(content_type)
+        if media_type is None:
+            raise ValueError(f"Unsupported file type: {content_type}")
+        async with self._semaphore:
+            file.seek(0)
+            digest = hashlib.sha256()
+            size = 0
+            while chunk := await _read(file, self.settings.MEDIA_UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > self.settings.MEDIA_MAX_UPLOAD_BYTES:
+                    raise ValueError(f"File is larger than {self.settings.MEDIA_MAX_UPLOAD_BYTES} bytes")
+                digest.update(chunk)
+            sha256 = digest.hexdigest()
+
+            cached = await self.media_repo.get_file(sha256)
+            if cached:
+                return {"file_id": cached["file_id"], "media_type": cached["media_type"], "cached": True}
+
+            method_name, param = SEND_METHODS[media_type]
+            sent_message = await getattr(self.bot, method_name)(
+                chat_id=self.settings.STORAGE_CHANNEL_ID,
+                **{param: UploadInputFile(file, filename=filename or sha256)},
+            )
+            stored = await self.media_repo.save_file(sha256, _file_id_of(sent_message, media_type), media_type, size)
+        logger.info(f"Uploaded new {media_type} ({size} bytes) to the storage channel")
+        return {"file_id": stored["file_id"], "media_type": stored["media_type"], "cached": False}
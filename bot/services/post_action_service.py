@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import os
+import socket
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+from bot.config import Settings
+from bot.database.repositories import PostActionRepository
+from bot.utils.delay_queue import PostActionQueue
+from bot.utils.keyboards import build_inline_keyboard
+from bot.utils.rate_limiter import RateLimiter
+from bot.utils.retry_policy import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+# Telegram deleteMessages bitta so'rovda ko'pi bilan 100 ta xabarni o'chiradi
+DELETE_BATCH_SIZE = 100
+
+
+class PostActionService:
+    """
+    Yuborilgan postlar ustidagi rejalashtirilgan amallarni bajaradi.
+
+    Actions are indexed in their own Redis delay queue, exactly like sends,
+    and go through the same shared RateLimiter, so they never compete
+    with dispatch for the bot token's limits.  Deletes due for the same chat
+    are batched into ``deleteMessages`` calls of up to 100 messages; edits
+    are sent one by one.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        settings: Settings,
+        action_repo: PostActionRepository,
+        action_queue: PostActionQueue,
+        rate_limiter: RateLimiter,
+        retry_policy: RetryPolicy,
+    ):
+        self.bot = bot
+        self.settings = settings
+        self.action_repo = action_repo
+        self.action_queue = action_queue
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    async def execute_due_actions(self) -> int:
+        """Vaqti kelgan barcha amallarni bajaradi (zaxira sweep). Bajarilganlar sonini qaytaradi."""
+        done = 0
+        while True:
+            actions = await self.action_repo.claim_due_actions(
+                worker_id=self.worker_id,
+                limit=self.settings.DISPATCH_BATCH_SIZE,
+                lease_seconds=self.settings.DISPATCH_LEASE_SECONDS,
+            )
+            if not actions:
+                break
+            done += await self.execute_actions(actions)
+            if len(actions) < self.settings.DISPATCH_BATCH_SIZE:
+                break
+        return done
+
+    async def run_action_queue_consumer(self, stop_event: Optional[asyncio.Event] = None) -> None:
+        """Redis navbatidan vaqti kelgan amallarni olib, darhol bajaradi."""
+        stop_event = stop_event or asyncio.Event()
+        poll_interval = self.settings.DELAY_QUEUE_POLL_INTERVAL
+
+        while not stop_event.is_set():
+            delay: Optional[float] = poll_interval
+            try:
+                action_ids = await self.action_queue.pop_due(self.settings.DISPATCH_BATCH_SIZE)
+                if action_ids:
+                    actions = await self.action_repo.claim_actions_by_ids(
+                        worker_id=self.worker_id,
+                        action_ids=action_ids,
+                        lease_seconds=self.settings.DISPATCH_LEASE_SECONDS,
+                    )
+                    if actions:
+                        await self.execute_actions(actions)
+                    continue
+                delay = await self.action_queue.seconds_until_next()
+            except Exception as e:
+                logger.error(f"Post action consumer error: {e}", exc_info=True)
+
+            timeout = poll_interval if delay is None else min(delay, poll_interval)
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def execute_actions(self, actions: List[dict]) -> int:
+        """
+        Band qilingan amallarni bajaradi va natijalarni bazaga yozadi.
+
+        Returns the number of actions that were carried out.
+        """
+        deletes: Dict[int, List[dict]] = defaultdict(list)
+        calls = []
+        for action in actions:
+            if action.get('message_id') is None:
+                await self.defer_unsent(action)
+            elif action['action'] == 'delete':
+                deletes[action['channel_id']].append(action)
+            else:
+                calls.append([action])
+        for chat_actions in deletes.values():
+            calls.extend(
+                chat_actions[i:i + DELETE_BATCH_SIZE] for i in range(0, len(chat_actions), DELETE_BATCH_SIZE)
+            )
+
+        semaphore = asyncio.Semaphore(self.settings.DISPATCH_CONCURRENCY)
+
+        async def run(batch: List[dict]) -> List[int]:
+            await self.rate_limiter.acquire(batch[0]['channel_id'])
+            async with semaphore:
+                return await self.execute_batch(batch)
+
+        results = await asyncio.gather(*(run(batch) for batch in calls), return_exceptions=True)
+        done_ids: List[int] = []
+        for batch, result in zip(calls, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Unexpected error while executing post actions {[a['id'] for a in batch]}", exc_info=result)
+            else:
+                done_ids.extend(result)
+        await self.action_repo.complete_actions(done_ids)
+        return len(done_ids)
+
+    async def execute_batch(self, batch: List[dict]) -> List[int]:
+        """Bitta Telegram so'rovi bilan bajariladigan amallar guruhini bajaradi. Bajarilgan ID'larni qaytaradi."""
+        first = batch[0]
+        try:
+            if first['action'] == 'delete':
+                await self.bot.delete_messages(
+                    chat_id=first['channel_id'], message_ids=[action['message_id'] for action in batch]
+                )
+            else:
+                text = (first.get('payload') or {}).get('text')
+                # Tahrirda reply_markup berilmasa Telegram inline tugmalarni olib tashlaydi
+                reply_markup = build_inline_keyboard(first.get('inline_buttons'))
+                if first.get('has_media'):
+                    await self.bot.edit_message_caption(
+                        chat_id=first['channel_id'], message_id=first['message_id'], caption=text,
+                        reply_markup=reply_markup,
+                    )
+                else:
+                    await self.bot.edit_message_text(
+                        chat_id=first['channel_id'], message_id=first['message_id'], text=text,
+                        reply_markup=reply_markup,
+                    )
+        except Exception as e:
+            for action in batch:
+                await self.handle_action_failure(action, e)
+            return []
+        return [action['id'] for action in batch]
+
+    async def defer_unsent(self, action: dict) -> None:
+        """Post hali yuborilmagan bo'lsa, amalni xato deb belgilamasdan keyinga qoldiradi."""
+        deferred = await self.action_repo.defer_action(action['id'], self.retry_policy.base_delay)
+        if deferred:
+            logger.info(f"Post action {action['id']} deferred until its post is sent")
+        else:
+            await self.action_repo.fail_action(action['id'], "Post has not been sent and is no longer scheduled")
+
+    async def handle_action_failure(self, action: dict, error: Exception) -> None:
+        """Xatolikni yuborishdagi kabi qayta urinish yoki 'error' holatiga yo'naltiradi."""
+        count_attempt = self.retry_policy.counts_as_attempt(error)
+        attempts = (action.get('attempts') or 0) + int(count_attempt)
+        retry_after = None
+        if isinstance(error, TelegramRetryAfter):
+            retry_after = error.retry_after
+            await self.rate_limiter.pause(action['channel_id'], retry_after)
+
+        if self.retry_policy.should_retry(attempts, error):
+            delay = self.retry_policy.next_delay(attempts, retry_after=retry_after)
+            await self.action_repo.schedule_retry(action['id'], delay, str(error), count_attempt=count_attempt)
+            logger.warning(f"Post action {action['id']} failed (attempt {attempts}), retrying in {delay:.1f}s: {error}")
+        else:
+            await self.action_repo.fail_action(action['id'], str(error))
+            logger.error(f"Post action {action['id']} failed after {attempts} attempts: {error}")
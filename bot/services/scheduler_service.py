@@ -1,49 +1,349 @@
+import asyncio
+import os
+import socket
+import time
+from datetime import datetime, timedelta, timezone
 from aiogram import Bot
-from aiogram.exceptions import TelegramAPIError
+from aiogram.exceptions import TelegramRetryAfter
 import logging
+from typing import Dict, List, Optional, Tuple
 
+from bot.config import Settings
 from bot.database.repositories import SchedulerRepository, AnalyticsRepository # AnalyticsRepository'ni import qilamiz
+from bot.services.send_result_buffer import SendResultBuffer
+from bot.utils.delay_queue import DelayQueue
+from bot.utils.keyboards import build_inline_keyboard
+from bot.utils.media import SEND_METHODS, build_media_group
+from bot.utils.rate_limiter import RateLimiter
+from bot.utils.recurrence import CronSchedule
+from bot.utils.retry_policy import RetryPolicy
 
 logger = logging.getLogger(__name__)
 
 class SchedulerService:
     # __init__ metodini o'zgartiramiz
-    def __init__(self, bot: Bot, scheduler_repo: SchedulerRepository, analytics_repo: AnalyticsRepository):
+    def __init__(
+        self,
+        bot: Bot,
+        settings: Settings,
+        scheduler_repo: SchedulerRepository,
+        analytics_repo: AnalyticsRepository,
+        rate_limiter: RateLimiter,
+        delay_queue: DelayQueue,
+        retry_policy: RetryPolicy,
+        result_buffer: SendResultBuffer,
+    ):
         self.bot = bot
+        self.settings = settings
         self.scheduler_repo = scheduler_repo
         self.analytics_repo = analytics_repo
+        self.rate_limiter = rate_limiter
+        self.delay_queue = delay_queue
+        self.retry_policy = retry_policy
+        self.result_buffer = result_buffer
+        # Lease egasi sifatida yoziladigan worker identifikatori
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
 
-    async def send_post_to_channel(self, post_data: dict):
+    async def send_due_messages(self) -> int:
+        """
+        Vaqti kelgan barcha postlarni parallel ravishda yuboradi.
+
+        Posts are claimed in batches of ``DISPATCH_BATCH_SIZE`` so several
+        workers can drain the queue side by side.  Posts due within the last
+        ``DISPATCH_ON_TIME_WINDOW_SECONDS`` go first; older ones are backlog
+        (e.g. after downtime) and are drained oldest first, at most
+        ``DISPATCH_BACKLOG_BUDGET`` per run.  Returns the number of posts
+        that were sent successfully.
+        """
+        batch_size = self.settings.DISPATCH_BATCH_SIZE
+        on_time_since = datetime.now(timezone.utc) - timedelta(seconds=self.settings.DISPATCH_ON_TIME_WINDOW_SECONDS)
+        sent = 0
+
+        # 1. O'z vaqtida yuborilishi kerak bo'lgan postlar
+        while True:
+            posts = await self.scheduler_repo.claim_due_posts(
+                worker_id=self.worker_id,
+                limit=batch_size,
+                lease_seconds=self.settings.DISPATCH_LEASE_SECONDS,
+                due_since=on_time_since,
+            )
+            if not posts:
+                break
+            sent += await self.dispatch_posts(posts)
+            if len(posts) < batch_size:
+                break
+
+        # 2. Backlog: eng eskisidan boshlab, cheklangan miqdorda
+        budget = self.settings.DISPATCH_BACKLOG_BUDGET
+        cursor: Optional[Tuple[datetime, int]] = None
+        while budget > 0:
+            limit = min(batch_size, budget)
+            posts = await self.scheduler_repo.claim_due_posts(
+                worker_id=self.worker_id,
+                limit=limit,
+                lease_seconds=self.settings.DISPATCH_LEASE_SECONDS,
+                due_before=on_time_since,
+                after=cursor,
+            )
+            if not posts:
+                break
+            cursor = max((post['next_fire_at'], post['id']) for post in posts)
+            budget -= len(posts)
+            sent += await self.dispatch_posts(posts, backlog=True)
+            if len(posts) < limit:
+                break
+        return sent
+
+    async def run_delay_queue_consumer(self, stop_event: Optional[asyncio.Event] = None) -> None:
+        """
+        Redis navbatidan vaqti kelgan postlarni darhol olib yuboradi.
+
+        This is the long-lived replacement for minute-by-minute beat polling:
+        it sleeps until the earliest queued post is due (at most
+        ``DELAY_QUEUE_POLL_INTERVAL``), claims what it pops and dispatches it
+        in the background.  At most ``DISPATCH_BATCH_SIZE`` posts are in
+        flight at once, so leases are not taken far ahead of the rate limiter.
+
+        On-time posts are popped ahead of the backlog, and backlog posts take
+        at most ``DISPATCH_BACKLOG_BUDGET`` of the in-flight slots.
+        """
+        stop_event = stop_event or asyncio.Event()
+        poll_interval = self.settings.DELAY_QUEUE_POLL_INTERVAL
+        # task -> (postlar soni, backlog'mi)
+        in_flight: Dict[asyncio.Task, Tuple[int, bool]] = {}
+
+        while not stop_event.is_set():
+            capacity = self.settings.DISPATCH_BATCH_SIZE - sum(count for count, _ in in_flight.values())
+            if capacity <= 0:
+                await asyncio.wait(in_flight.keys(), return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            delay: Optional[float] = poll_interval
+            try:
+                await self.result_buffer.flush_if_due()
+                cutoff = time.time() - self.settings.DISPATCH_ON_TIME_WINDOW_SECONDS
+                batches = [(await self.delay_queue.pop_due(capacity, since=cutoff), False)]
+                backlog_capacity = min(
+                    capacity - len(batches[0][0]),
+                    self.settings.DISPATCH_BACKLOG_BUDGET - sum(
+                        count for count, backlog in in_flight.values() if backlog
+                    ),
+                )
+                if backlog_capacity > 0:
+                    batches.append((await self.delay_queue.pop_due(backlog_capacity, before=cutoff), True))
+
+                popped = False
+                for post_ids, backlog in batches:
+                    if not post_ids:
+                        continue
+                    popped = True
+                    posts = await self.scheduler_repo.claim_posts_by_ids(
+                        worker_id=self.worker_id,
+                        post_ids=post_ids,
+                        lease_seconds=self.settings.DISPATCH_LEASE_SECONDS,
+                    )
+                    if posts:
+                        task = asyncio.create_task(self.dispatch_posts(posts, backlog=backlog))
+                        in_flight[task] = (len(posts), backlog)
+                        task.add_done_callback(lambda t: in_flight.pop(t, None))
+                if popped:
+                    continue
+                delay = await self.delay_queue.seconds_until_next()
+            except Exception as e:
+                logger.error(f"Delay queue consumer error: {e}", exc_info=True)
+
+            timeout = poll_interval if delay is None else min(delay, poll_interval)
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        if in_flight:
+            await asyncio.gather(*in_flight.keys(), return_exceptions=True)
+        await self.flush_results()
+
+    async def dispatch_posts(self, posts: list[dict], backlog: bool = False) -> int:
+        """
+        Berilgan postlarni parallel ravishda yuboradi.
+
+        Each post first waits for its chat's and the global token bucket, then
+        takes one of ``DISPATCH_CONCURRENCY`` slots for the actual HTTP call.
+        Backlog posts also wait for the slower backlog bucket.  Posts that are
+        later than ``DISPATCH_MAX_LATENESS_SECONDS`` are skipped instead of
+        sent.  Returns the number of posts that were sent successfully.
+
+        A busy chat can keep posts waiting on its bucket for longer than
+        ``DISPATCH_LEASE_SECONDS``, so the leases of the batch are renewed
+        every third of that until the batch is done.
+        """
+        posts = await self.skip_late_posts(posts)
+        if not posts:
+            return 0
+        logger.info(f"Dispatching {len(posts)} due posts" + (" from the backlog" if backlog else ""))
+        semaphore = asyncio.Semaphore(self.settings.DISPATCH_CONCURRENCY)
+
+        async def dispatch(post: dict) -> bool:
+            await self.rate_limiter.acquire(post['channel_id'], backlog=backlog)
+            async with semaphore:
+                return await self.send_post_to_channel(post)
+
+        renewer = asyncio.create_task(self.renew_leases([post['id'] for post in posts]))
+        try:
+            results = await asyncio.gather(*(dispatch(post) for post in posts), return_exceptions=True)
+        finally:
+            # Yuborilgan postlar natijalari yozilguncha lease'lar uzaytirilib turadi
+            await self.flush_results()
+            renewer.cancel()
+
+        sent = 0
+        for post, result in zip(posts, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Unexpected error while sending post {post['id']}", exc_info=result)
+            elif result:
+                sent += 1
+
+        logger.info(f"Dispatch finished: {sent}/{len(posts)} posts sent")
+        return sent
+
+    async def flush_results(self) -> bool:
+        """
+        Buferdagi natijalarni bazaga yozadi, xatolikda retry policy bo'yicha qayta urinadi.
+
+        Returns False if every attempt failed; the results then stay in the
+        buffer for the next flush and their posts stay 'claimed'.
+        """
+        attempts = self.retry_policy.max_attempts
+        for attempt in range(1, attempts + 1):
+            try:
+                await self.result_buffer.flush()
+                return True
+            except Exception as e:
+                if attempt == attempts:
+                    logger.error(f"Could not record send results after {attempts} attempts, keeping them buffered: {e}")
+                    return False
+                await asyncio.sleep(self.retry_policy.next_delay(attempt))
+        return False
+
+    async def renew_leases(self, post_ids: List[int]) -> None:
+        """Bekor qilinmaguncha (cancel) postlarning lease'ini muddatining har uchdan birida uzaytiradi."""
+        lease_seconds = self.settings.DISPATCH_LEASE_SECONDS
+        while True:
+            await asyncio.sleep(lease_seconds / 3)
+            try:
+                await self.scheduler_repo.renew_leases(self.worker_id, post_ids, lease_seconds)
+            except Exception as e:
+                logger.warning(f"Could not renew leases of {len(post_ids)} posts: {e}")
+
+    async def skip_late_posts(self, posts: List[dict]) -> List[dict]:
+        """
+        Ruxsat etilgan kechikishdan oshgan postlarni ajratib, qolganlarini qaytaradi.
+
+        One-shot posts that are too late become 'expired'; recurring posts
+        move on to their next occurrence without sending the missed one.
+        """
+        max_lateness = self.settings.DISPATCH_MAX_LATENESS_SECONDS
+        if max_lateness <= 0:
+            return posts
+        deadline = datetime.now(timezone.utc) - timedelta(seconds=max_lateness)
+        on_time, late = [], []
+        for post in posts:
+            fire_at = post.get('next_fire_at')
+            if fire_at is not None and fire_at < deadline:
+                late.append(post)
+            else:
+                on_time.append(post)
+        if late:
+            await self.scheduler_repo.skip_late_posts([(post['id'], self.next_occurrence(post)) for post in late])
+            logger.warning(f"Skipped {len(late)} posts that were more than {max_lateness}s late")
+        return on_time
+
+    async def send_post_to_channel(self, post_data: dict) -> bool:
         """Rejalashtirilgan postni kanalga yuboradi va natijani log qiladi."""
         try:
-            # Postni yuborish logikasi (sizning postingiz media yoki matn bo'lishiga qarab)
-            if post_data.get('media_id'):
-                # Media bilan yuborish
-                sent_message = await self.bot.send_photo(
+            # Postni yuborish logikasi (sizning postingiz albom, media yoki matn bo'lishiga qarab)
+            if post_data.get('media_group'):
+                # Albom bitta so'rov bilan yuboriladi; Telegram albomlarga tugma qo'shishga ruxsat bermaydi
+                messages = await self.bot.send_media_group(
+                    chat_id=post_data['channel_id'],
+                    media=build_media_group(post_data['media_group'], caption=post_data['post_text']),
+                )
+                sent_message = messages[0]
+            elif post_data.get('media_id'):
+                # Media turiga mos metod bilan yuborish (eski postlarda tur yo'q - rasm deb olinadi)
+                method_name, param = SEND_METHODS.get(post_data.get('media_type') or 'photo', SEND_METHODS['photo'])
+                sent_message = await getattr(self.bot, method_name)(
                     chat_id=post_data['channel_id'],
-                    photo=post_data['media_id'],
                     caption=post_data['post_text'],
-                    reply_markup=post_data.get('inline_buttons')
+                    reply_markup=build_inline_keyboard(post_data.get('inline_buttons')),
+                    **{param: post_data['media_id']},
                 )
             else:
                 # Oddiy matn yuborish
                 sent_message = await self.bot.send_message(
                     chat_id=post_data['channel_id'],
                     text=post_data['post_text'],
-                    reply_markup=post_data.get('inline_buttons'),
+                    reply_markup=build_inline_keyboard(post_data.get('inline_buttons')),
                     disable_web_page_preview=True
                 )
-            
-            # Post yuborilganini bazaga yozamiz
-            await self.analytics_repo.log_sent_post(
-                scheduled_post_id=post_data['id'],
-                channel_id=sent_message.chat.id,
-                message_id=sent_message.message_id
-            )
+        except Exception as e:
+            # Faqat yuborishdagi xatolik qayta uriniladi: bazaga yozishdagi xatolik
+            # postni ikki marta yuborishga olib kelmasligi kerak
+            await self.handle_send_failure(post_data, e)
+            return False
 
-            await self.scheduler_repo.update_post_status(post_data['id'], 'sent')
-            logger.info(f"Successfully sent post {post_data['id']} to channel {post_data['channel_id']}")
+        # Post yuborilganini buferga yozamiz; bazaga partiyalab tushadi
+        await self.result_buffer.add(
+            scheduled_post_id=post_data['id'],
+            channel_id=sent_message.chat.id,
+            message_id=sent_message.message_id,
+            next_fire_at=self.next_occurrence(post_data),
+        )
+        logger.info(f"Successfully sent post {post_data['id']} to channel {post_data['channel_id']}")
+        return True
 
-        except TelegramAPIError as e:
-            await self.scheduler_repo.update_post_status(post_data['id'], 'error')
-            logger.error(f"Failed to send post {post_data['id']}: {e}", exc_info=True)
+    @staticmethod
+    def next_occurrence(post_data: dict) -> Optional[datetime]:
+        """
+        Takrorlanuvchi postning navbatdagi yuborilish vaqtini hisoblaydi.
+
+        The next occurrence is taken after both the occurrence just sent and
+        the current time, so a late or retried send never fires a burst of
+        missed occurrences.  Returns None for one-shot posts.
+        """
+        rule = post_data.get('recurrence_rule')
+        if not rule:
+            return None
+        now = datetime.now(timezone.utc)
+        fired_at = post_data.get('next_fire_at') or now
+        try:
+            return CronSchedule(rule).next_after(max(fired_at, now))
+        except ValueError as e:
+            logger.error(f"Post {post_data['id']} has an invalid recurrence rule, not repeating: {e}")
+            return None
+
+    async def handle_send_failure(self, post_data: dict, error: Exception) -> None:
+        """
+        Yuborishdagi xatolikni qayta urinish yoki dead-letter'ga yo'naltiradi.
+
+        Flood-waits pause the whole chat in the rate limiter and the post is
+        retried after ``retry_after`` without using up an attempt; transient
+        network/server errors back off exponentially; anything else (or
+        running out of attempts) moves the post to the dead-letter table.
+        """
+        post_id = post_data['id']
+        count_attempt = self.retry_policy.counts_as_attempt(error)
+        attempts = (post_data.get('attempts') or 0) + int(count_attempt)
+        retry_after = None
+        if isinstance(error, TelegramRetryAfter):
+            retry_after = error.retry_after
+            await self.rate_limiter.pause(post_data['channel_id'], retry_after)
+
+        if self.retry_policy.should_retry(attempts, error):
+            delay = self.retry_policy.next_delay(attempts, retry_after=retry_after)
+            await self.scheduler_repo.schedule_retry(
+                post_id, delay, str(error), lease_owner=self.worker_id, count_attempt=count_attempt
+            )
+            logger.warning(f"Post {post_id} failed (attempt {attempts}), retrying in {delay:.1f}s: {error}")
+        else:
+            await self.scheduler_repo.move_to_dead_letter(post_id, str(error), lease_owner=self.worker_id)
+            logger.error(f"Failed to send post {post_id} after {attempts} attempts: {error}", exc_info=error)
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from bot.config import Settings
+from bot.database.repositories import SchedulerRepository
+
+logger = logging.getLogger(__name__)
+
+# (scheduled_post_id, channel_id, message_id, next_fire_at)
+SendResult = Tuple[int, int, int, Optional[datetime]]
+
+
+class SendResultBuffer:
+    """
+    Yuborilgan postlar natijalarini yig'ib, bazaga bitta tranzaksiyada yozadi.
+
+    Results are flushed once ``SEND_RESULT_BATCH_SIZE`` of them have piled up
+    or ``SEND_RESULT_FLUSH_INTERVAL`` seconds have passed since the last
+    flush, whichever comes first.  A post whose result is still buffered
+    stays 'claimed'; if the process dies before flushing, its lease expires
+    and the post is sent again (at-least-once delivery, as before).
+    Statuses are only written for posts this worker still holds the lease on.
+    """
+
+    def __init__(self, settings: Settings, scheduler_repo: SchedulerRepository):
+        self.scheduler_repo = scheduler_repo
+        self.max_size = settings.SEND_RESULT_BATCH_SIZE
+        self.flush_interval = settings.SEND_RESULT_FLUSH_INTERVAL
+        self._items: List[SendResult] = []
+        self._lock = asyncio.Lock()
+        self._last_flush = time.monotonic()
+        # SchedulerService bilan bir xil lease egasi (bufer jarayon uchun yagona)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    async def add(
+        self,
+        scheduled_post_id: int,
+        channel_id: int,
+        message_id: int,
+        next_fire_at: Optional[datetime] = None,
+    ) -> None:
+        """
+        `next_fire_at` - takrorlanuvchi postning navbatdagi yuborilish vaqti.
+
+        Never raises: the post has already been sent, so a failed flush only
+        keeps the results buffered for the next one.
+        """
+        self._items.append((scheduled_post_id, channel_id, message_id, next_fire_at))
+        try:
+            if len(self._items) >= self.max_size:
+                await self.flush()
+            else:
+                await self.flush_if_due()
+        except Exception:
+            # flush() natijalarni buferga qaytargan va xatoni log qilgan
+            pass
+
+    async def flush_if_due(self) -> None:
+        if self._items and time.monotonic() - self._last_flush >= self.flush_interval:
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Yig'ilgan natijalarni bazaga yozadi. Yozilgan yozuvlar sonini qaytaradi."""
+        async with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._items:
+                return 0
+            items, self._items = self._items, []
+            try:
+                await self.scheduler_repo.record_sent_posts(items, lease_owner=self.worker_id)
+            except Exception:
+                # Keyingi flush'da qayta urinish uchun natijalarni qaytarib qo'yamiz
+                self._items[:0] = items
+                logger.error(f"Could not record {len(items)} send results", exc_info=True)
+                raise
+            return len(items)
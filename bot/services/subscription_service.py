@@ -51,25 +51,35 @@ class SubscriptionService:
 
     async def check_post_limit(self, user_id: int) -> bool:
         """Checks if a user can schedule a new post based on their plan."""
+        remaining = await self.get_remaining_post_quota(user_id)
+        return remaining is None or remaining > 0
+
+    async def get_remaining_post_quota(self, user_id: int) -> Optional[int]:
+        """
+        Returns how many more posts the user may schedule this month.
+
+        None means there is no limit (unlimited plan or enforcement off);
+        an unknown user or plan gets 0.
+        """
         if not self.settings.ENFORCE_PLAN_LIMITS:
-            return True
-            
+            return None
+
         # --- TUZATISH ---
         # Metod nomini get_user_plan_name ga o'zgartiramiz
         user_plan_name = await self.user_repo.get_user_plan_name(user_id)
         if not user_plan_name:
-            return False
+            return 0
 
         plan_details = await self.plan_repo.get_plan_by_name(user_plan_name)
         if not plan_details:
-            return False
+            return 0
 
         max_posts = plan_details['max_posts_per_month']
         if max_posts == -1:
-            return True
+            return None
 
         posts_this_month = await self.scheduler_repo.count_user_posts_this_month(user_id)
-        return posts_this_month < max_posts
+        return max(max_posts - posts_this_month, 0)
 
     # --- NEW METHOD FOR /myplan COMMAND ---
     async def get_user_subscription_status(self, user_id: int) -> Optional[SubscriptionStatus]:
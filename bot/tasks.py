@@ -1,11 +1,13 @@
-import asyncio
 from celery.utils.log import get_task_logger
 
 # YECHIM: Endi 'celery_app'ni xavfsiz import qila olamiz,
 # chunki 'celery_app.py' endi bu faylni to'g'ridan-to'g'ri import qilmayapti.
 from bot.celery_app import celery_app
 from bot.container import container
-from bot.services import SchedulerService, AnalyticsService
+from bot.config import settings
+from bot.database.repositories import AnalyticsRepository, SchedulerRepository, PostActionRepository, UserRepository
+from bot.services import SchedulerService, AnalyticsService, PostActionService
+from bot.worker_runtime import runtime
 
 logger = get_task_logger(__name__)
 
@@ -14,16 +16,86 @@ logger = get_task_logger(__name__)
 def send_scheduled_message():
     """Vaqti kelgan rejalashtirilgan xabarlarni yuboradi."""
     logger.info("Running task: send_scheduled_message")
+    # Odatda runtime worker_process_init'da ochiladi; 'solo' pool uchun bu yerda ham chaqiramiz
+    runtime.start()
     # Har bir vazifa o'zi uchun kerakli servisni konteynerdan oladi
     scheduler_service = container.resolve(SchedulerService)
-    asyncio.run(scheduler_service.send_due_messages())
+    runtime.run(scheduler_service.send_due_messages())
     logger.info("Finished task: send_scheduled_message")
 
 
+@celery_app.task
+def execute_post_actions_task():
+    """Vaqti kelgan o'chirish/tahrirlash amallarini bajaradi (zaxira sifatida)."""
+    runtime.start()
+    action_service = container.resolve(PostActionService)
+    done = runtime.run(action_service.execute_due_actions())
+    if done:
+        logger.info(f"Executed {done} overdue post actions")
+
+
 @celery_app.task
 def update_post_views_task():
     """Yuborilgan postlarning ko'rishlar sonini yangilaydi."""
     logger.info("Running task: update_post_views_task")
+    runtime.start()
+    analytics_service = container.resolve(AnalyticsService)
+    report = runtime.run(analytics_service.update_all_post_views())
+    logger.info(
+        f"Finished task: update_post_views_task ({report.posts} posts, "
+        f"{report.throughput:.1f} posts/s, error rate {report.error_rate:.1%})"
+    )
+
+
+@celery_app.task
+def refresh_channel_rollups_task():
+    """Kanal bo'yicha soatlik/kunlik statistikani yangi snapshot'lar asosida yangilaydi."""
+    runtime.start()
     analytics_service = container.resolve(AnalyticsService)
-    asyncio.run(analytics_service.update_all_post_views())
-    logger.info("Finished task: update_post_views_task")
+    watermark = runtime.run(analytics_service.refresh_channel_rollups())
+    if watermark:
+        logger.info(f"Channel rollups are up to date as of {watermark:%Y-%m-%d %H:%M:%S}")
+
+
+@celery_app.task
+def ensure_view_snapshot_partitions_task():
+    """Ko'rishlar tarixi jadvali uchun kelgusi oylarning bo'limlarini oldindan yaratadi."""
+    runtime.start()
+    analytics_repo = container.resolve(AnalyticsRepository)
+    runtime.run(analytics_repo.ensure_view_snapshot_partitions())
+
+
+@celery_app.task
+def release_expired_leases_task():
+    """Muddati o'tgan lease'larni qaytarib, postlarni qayta yuborishga tayyorlaydi."""
+    runtime.start()
+    scheduler_repo = container.resolve(SchedulerRepository)
+    action_repo = container.resolve(PostActionRepository)
+    released = runtime.run(scheduler_repo.release_expired_leases())
+    if released:
+        logger.warning(f"Released {released} expired post leases")
+    released = runtime.run(action_repo.release_expired_leases())
+    if released:
+        logger.warning(f"Released {released} expired post action leases")
+
+
+@celery_app.task
+def reconcile_delay_queue_task():
+    """Redis navbatini PostgreSQL'dagi 'pending' postlar asosida qayta tiklaydi."""
+    runtime.start()
+    scheduler_repo = container.resolve(SchedulerRepository)
+    action_repo = container.resolve(PostActionRepository)
+    restored = runtime.run(scheduler_repo.rebuild_delay_queue())
+    logger.info(f"Delay queue reconciled: {restored} pending posts")
+    restored = runtime.run(action_repo.rebuild_action_queue())
+    logger.info(f"Post action queue reconciled: {restored} pending actions")
+
+
+@celery_app.task
+def purge_sync_tombstones_task():
+    """Eski sync tombstone'larini o'chiradi; ularga tayangan mijozlar to'liq qayta yuklaydi."""
+    runtime.start()
+    user_repo = container.resolve(UserRepository)
+    purged = runtime.run(user_repo.purge_sync_tombstones(settings.SYNC_TOMBSTONE_RETENTION_DAYS))
+    if purged:
+        logger.info(f"Purged {purged} sync tombstones")
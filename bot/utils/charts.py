@@ -0,0 +1,74 @@
+import asyncio
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+# Kanal nomi -> [(kun, ko'rishlar)] ; jarayonlar orasida pickle qilinadi
+ChartSeries = Dict[str, List[Tuple[date, int]]]
+
+
+def init_chart_worker() -> None:
+    """Worker jarayonida matplotlib'ni oldindan yuklaydi, shunda birinchi chizma ham tez bo'ladi."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+
+
+def render_views_chart(series: ChartSeries, title: str) -> bytes:
+    """Kunlik ko'rishlar grafigini PNG ko'rinishida chizadi. Worker jarayonida ishlaydi."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 5), dpi=100)
+    try:
+        for label, points in series.items():
+            days = [day for day, _ in points]
+            views = [value for _, value in points]
+            ax.plot(days, views, marker="o", linewidth=1.5, label=label)
+        ax.set_title(title)
+        ax.set_ylabel("Views")
+        ax.grid(True, alpha=0.3)
+        if len(series) > 1:
+            ax.legend(loc="upper left", fontsize="small")
+        fig.autofmt_xdate()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", bbox_inches="tight")
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+
+class ChartRenderer:
+    """
+    Grafiklarni alohida jarayonlarda chizadi.
+
+    matplotlib is CPU-bound and not thread-safe, so rendering on the event
+    loop (or in a thread) would stall every other update.  Workers are
+    started lazily with the ``spawn`` method, which is safe next to a
+    running event loop, and import matplotlib once in their initializer.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_chart_worker,
+            )
+        return self._executor
+
+    async def render_views_chart(self, series: ChartSeries, title: str) -> bytes:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), render_views_chart, series, title)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,33 @@
+import base64
+import json
+from typing import Any, Tuple
+
+# Kursor qiymatlari PostgreSQL INTEGER ustunlariga uzatiladi
+_INT_MIN, _INT_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+def encode_cursor(*values: Any) -> str:
+    """Keyset sahifalash kursorini mijoz uchun shaffof (opaque) satrga aylantiradi."""
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> Tuple[int, ...]:
+    """
+    `encode_cursor` natijasini qayta tiklaydi.
+
+    Keyset cursors hold integer column values (e.g. ``(views, id)``).
+    Raises ``ValueError`` if the cursor is malformed, does not hold exactly
+    `size` values, or holds anything but integers that fit a PostgreSQL
+    INTEGER, so a tampered cursor is a 400 rather than a database error.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if not all(type(value) is int and _INT_MIN <= value <= _INT_MAX for value in values):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return tuple(values)
@@ -0,0 +1,75 @@
+import time
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+import redis.asyncio as redis
+
+
+class DelayQueue:
+    """A Redis sorted set of item IDs scored by their due time (unix seconds).
+
+    The queue is only an index: Postgres stays the source of truth, and any
+    item may be missing (e.g. after a Redis restart) until the next
+    reconciliation sweep re-adds it.
+    """
+
+    def __init__(self, redis_conn: redis.Redis, key: str = "delay_queue:scheduled_posts"):
+        self.redis = redis_conn
+        self.key = key
+
+    async def add(self, item_id: int, due_at: datetime) -> None:
+        await self.redis.zadd(self.key, {str(item_id): due_at.timestamp()})
+
+    async def add_many(self, items: Iterable[Tuple[int, datetime]]) -> None:
+        mapping = {str(item_id): due_at.timestamp() for item_id, due_at in items}
+        if mapping:
+            await self.redis.zadd(self.key, mapping)
+
+    async def remove(self, item_id: int) -> None:
+        await self.redis.zrem(self.key, str(item_id))
+
+    async def pop_due(
+        self,
+        limit: int,
+        now: Optional[float] = None,
+        since: Optional[float] = None,
+        before: Optional[float] = None,
+    ) -> List[int]:
+        """Removes and returns up to `limit` items whose due time has passed.
+
+        Items come out oldest first.  `since` and `before` narrow the due-time
+        window, e.g. to take on-time items ahead of an old backlog.
+
+        Several consumers may race for the same items; ZREM succeeds for only
+        one of them, so every item is handed out at most once.
+        """
+        now = time.time() if now is None else now
+        upper = now if before is None else f"({min(before, now)}"
+        lower = "-inf" if since is None else since
+        candidates = await self.redis.zrangebyscore(self.key, lower, upper, start=0, num=limit)
+        if not candidates:
+            return []
+
+        pipe = self.redis.pipeline(transaction=False)
+        for member in candidates:
+            pipe.zrem(self.key, member)
+        removed = await pipe.execute()
+        return [int(member) for member, won in zip(candidates, removed) if won]
+
+    async def seconds_until_next(self, now: Optional[float] = None) -> Optional[float]:
+        """Seconds until the earliest item is due, or None if the queue is empty."""
+        head = await self.redis.zrange(self.key, 0, 0, withscores=True)
+        if not head:
+            return None
+        now = time.time() if now is None else now
+        return max(0.0, head[0][1] - now)
+
+    async def size(self) -> int:
+        return await self.redis.zcard(self.key)
+
+
+class PostActionQueue(DelayQueue):
+    """Due-time index of scheduled edit/delete actions on published posts."""
+
+    def __init__(self, redis_conn: redis.Redis, key: str = "delay_queue:post_actions"):
+        super().__init__(redis_conn, key)
@@ -0,0 +1,168 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 1970-01-01 payshanba edi (dushanba = 0)
+_EPOCH_WEEKDAY = 3
+HOURS_PER_WEEK = 7 * 24
+VELOCITY_WINDOW_SECONDS = 24 * 3600
+
+
+@dataclass
+class SnapshotSeries:
+    """
+    Ko'rishlar tarixi ustun (column) ko'rinishida: har bir snapshot uchun bitta element.
+
+    Rows must be sorted by ``(post_id, ts)``; times are UNIX seconds.
+    """
+    post_id: np.ndarray
+    channel_id: np.ndarray
+    sent_at: np.ndarray
+    ts: np.ndarray
+    views: np.ndarray
+
+    @classmethod
+    def from_columns(cls, columns: Mapping[str, Sequence]) -> "SnapshotSeries":
+        return cls(
+            post_id=np.asarray(columns["post_id"], dtype=np.int64),
+            channel_id=np.asarray(columns["channel_id"], dtype=np.int64),
+            sent_at=np.asarray(columns["sent_at"], dtype=np.float64),
+            ts=np.asarray(columns["ts"], dtype=np.float64),
+            views=np.asarray(columns["views"], dtype=np.float64),
+        )
+
+    def __len__(self) -> int:
+        return len(self.post_id)
+
+
+@dataclass
+class ChannelEngagement:
+    """Engagement metrics of one channel."""
+    channel_id: int
+    posts: int
+    # Oxirgi 24 soatda soatiga qo'shilgan ko'rishlar
+    velocity: float
+    # Post so'nggi ko'rishlarining yarmini yig'ish uchun ketgan vaqt (mediana, soat)
+    half_life_hours: Optional[float]
+    median_views: float
+    # (sent_post_id, ko'rishlar / kanal medianasi), eng yaxshilari birinchi
+    top_posts: List[Tuple[int, float]] = field(default_factory=list)
+    # 7 x 24 (dushanba..yakshanba x UTC soat): o'rtacha nisbiy engagement, ma'lumot yo'q bo'lsa None
+    heatmap: List[List[Optional[float]]] = field(default_factory=list)
+    # (hafta kuni, soat) yoki None
+    best_hour_of_week: Optional[Tuple[int, int]] = None
+
+
+def hour_of_week(seconds: np.ndarray) -> np.ndarray:
+    """UNIX vaqtlarini UTC bo'yicha haftaning soatiga (0..167, dushanba 00:00 = 0) aylantiradi."""
+    hours = np.floor_divide(seconds, 3600).astype(np.int64)
+    weekday = (np.floor_divide(hours, 24) + _EPOCH_WEEKDAY) % 7
+    return weekday * 24 + hours % 24
+
+
+def group_median(groups: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    """Har bir guruh (0..n_groups-1) uchun medianani bitta saralash bilan hisoblaydi; bo'sh guruhlar NaN."""
+    result = np.full(n_groups, np.nan)
+    if len(values) == 0:
+        return result
+    order = np.lexsort((values, groups))
+    sorted_values = values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    present = counts > 0
+    lower = starts[present] + (counts[present] - 1) // 2
+    upper = starts[present] + counts[present] // 2
+    result[present] = (sorted_values[lower] + sorted_values[upper]) / 2
+    return result
+
+
+def compute_engagement(series: SnapshotSeries, now: float, top_n: int = 5) -> Dict[int, ChannelEngagement]:
+    """
+    Barcha kanallar uchun engagement ko'rsatkichlarini vektorlashtirilgan holda hisoblaydi.
+
+    Every metric is a handful of whole-array passes (``reduceat``,
+    ``bincount``, one ``lexsort`` per median) over all snapshots of all
+    channels; Python only loops over channels to assemble the result.
+    A post's views are its latest observed count.
+    """
+    n = len(series)
+    if n == 0:
+        return {}
+
+    # --- Post darajasi: har bir post snapshot'lari ketma-ket joylashgan ---
+    starts = np.flatnonzero(np.r_[True, series.post_id[1:] != series.post_id[:-1]])
+    counts = np.diff(np.r_[starts, n])
+    row_post = np.repeat(np.arange(len(starts)), counts)
+    last = starts + counts - 1
+
+    post_ids = series.post_id[starts]
+    post_sent = series.sent_at[starts]
+    final_views = series.views[last]
+    channel_ids, post_channel = np.unique(series.channel_id[starts], return_inverse=True)
+    n_channels = len(channel_ids)
+
+    # --- Yarim umr: so'nggi ko'rishlarning yarmiga birinchi yetgan vaqt ---
+    reached = series.views >= 0.5 * final_views[row_post]
+    age = series.ts - series.sent_at
+    half_life = np.minimum.reduceat(np.where(reached, age, np.inf), starts) / 3600
+    valid_half_life = (final_views > 0) & np.isfinite(half_life)
+    channel_half_life = group_median(
+        post_channel[valid_half_life], half_life[valid_half_life], n_channels
+    )
+
+    # --- Tezlik: oxirgi 24 soatda qo'shilgan ko'rishlar ---
+    window_start = now - VELOCITY_WINDOW_SECONDS
+    same_post = row_post[1:] == row_post[:-1]
+    gains = np.where(
+        same_post & (series.ts[1:] > window_start), np.maximum(np.diff(series.views), 0), 0
+    )
+    # Oynada yuborilgan postning birinchi snapshot'i noldan boshlab hisoblanadi
+    first_gains = np.where(
+        (post_sent > window_start) & (series.ts[starts] > window_start), series.views[starts], 0
+    )
+    gained = np.bincount(post_channel[row_post[1:]], weights=gains, minlength=n_channels)
+    gained += np.bincount(post_channel, weights=first_gains, minlength=n_channels)
+    velocity = gained / (VELOCITY_WINDOW_SECONDS / 3600)
+
+    # --- Kanal medianasiga nisbatan engagement ---
+    median_views = group_median(post_channel, final_views, n_channels)
+    channel_median = median_views[post_channel]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relative = np.where(channel_median > 0, final_views / channel_median, np.nan)
+
+    # --- Haftaning soatlari bo'yicha issiqlik xaritasi ---
+    scored = np.isfinite(relative)
+    slot = hour_of_week(post_sent)
+    flat = post_channel[scored] * HOURS_PER_WEEK + slot[scored]
+    size = n_channels * HOURS_PER_WEEK
+    slot_sums = np.bincount(flat, weights=relative[scored], minlength=size).reshape(n_channels, HOURS_PER_WEEK)
+    slot_counts = np.bincount(flat, minlength=size).reshape(n_channels, HOURS_PER_WEEK)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        heatmap = np.where(slot_counts > 0, slot_sums / slot_counts, np.nan)
+    best_slot = np.argmax(np.where(slot_counts > 0, heatmap, -np.inf), axis=1)
+
+    # --- Eng yaxshi postlar: kanal bo'yicha, nisbiy engagement kamayish tartibida ---
+    ranking = np.lexsort((-np.nan_to_num(relative, nan=-np.inf), post_channel))
+    posts_per_channel = np.bincount(post_channel, minlength=n_channels)
+    channel_starts = np.cumsum(posts_per_channel) - posts_per_channel
+
+    result: Dict[int, ChannelEngagement] = {}
+    for index, channel_id in enumerate(channel_ids.tolist()):
+        top = ranking[channel_starts[index]:channel_starts[index] + posts_per_channel[index]][:top_n]
+        top = top[np.isfinite(relative[top])]
+        has_slots = bool(slot_counts[index].any())
+        result[channel_id] = ChannelEngagement(
+            channel_id=channel_id,
+            posts=int(posts_per_channel[index]),
+            velocity=float(velocity[index]),
+            half_life_hours=None if np.isnan(channel_half_life[index]) else float(channel_half_life[index]),
+            median_views=float(median_views[index]),
+            top_posts=[(int(post_ids[i]), float(relative[i])) for i in top],
+            heatmap=[
+                [None if np.isnan(value) else float(value) for value in row]
+                for row in heatmap[index].reshape(7, 24)
+            ],
+            best_hour_of_week=divmod(int(best_slot[index]), 24) if has_slots else None,
+        )
+    return result
@@ -0,0 +1,111 @@
+import csv
+import importlib.util
+import io
+from contextlib import aclosing
+from typing import AsyncGenerator, AsyncIterator, List, Sequence
+
+# Parquet ustunlarining turlari (ustun nomi -> pyarrow turi)
+PARQUET_TYPES = {
+    "post_id": "int64",
+    "channel_id": "int64",
+    "status": "string",
+    "media_type": "string",
+    "post_text": "string",
+    "schedule_time": "timestamp",
+    "sent_post_id": "int64",
+    "message_id": "int64",
+    "sent_at": "timestamp",
+    "views": "int64",
+}
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def parquet_available() -> bool:
+    """pyarrow o'rnatilganmi (javob boshlanishidan oldin tekshirish uchun)."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+async def csv_stream(columns: Sequence[str], batches: AsyncGenerator[Sequence[Sequence], None]) -> AsyncIterator[bytes]:
+    """
+    Sarlavha va har bir partiyani alohida CSV bo'lagi sifatida qaytaradi.
+
+    `batches` is closed together with this stream (e.g. when the client
+    disconnects), so a database cursor behind it is released right away.
+    """
+    async with aclosing(batches):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue().encode()
+        async for batch in batches:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(batch)
+            yield buffer.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Yozilgan baytlarni yig'ib turadi; `drain` ularni qaytarib, buferni bo'shatadi."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def parquet_stream(
+    columns: Sequence[str], batches: AsyncGenerator[Sequence[Sequence], None]
+) -> AsyncIterator[bytes]:
+    """
+    Har bir partiyani Parquet row group sifatida yozadi va tayyor baytlarni darhol qaytaradi.
+
+    Only the row group being encoded is held in memory; the footer is
+    emitted when the batches run out.  As with `csv_stream`, `batches` is
+    closed together with this stream.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_types = {
+        "int64": pa.int64(),
+        "string": pa.string(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+    }
+    schema = pa.schema([(name, arrow_types[PARQUET_TYPES[name]]) for name in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        async with aclosing(batches):
+            async for batch in batches:
+                arrays = [
+                    pa.array([row[index] for row in batch], type=field.type)
+                    for index, field in enumerate(schema)
+                ]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,12 @@
+from typing import List, Optional
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+
+def build_inline_keyboard(buttons: Optional[List[dict]]) -> Optional[InlineKeyboardMarkup]:
+    """Postda saqlangan tugmalardan ({text, url} ro'yxati) inline klaviatura yasaydi; har bir tugma alohida qatorda."""
+    if not buttons:
+        return None
+    return InlineKeyboardMarkup(
+        inline_keyboard=[[InlineKeyboardButton(text=button["text"], url=button["url"])] for button in buttons]
+    )
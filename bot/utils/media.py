@@ -0,0 +1,84 @@
+from typing import Dict, List, Optional, Tuple
+
+from aiogram.types import (
+    InputMediaAudio,
+    InputMediaDocument,
+    InputMediaPhoto,
+    InputMediaVideo,
+)
+
+# media_type -> (Bot metodi, fayl parametri nomi)
+SEND_METHODS: Dict[str, Tuple[str, str]] = {
+    "photo": ("send_photo", "photo"),
+    "video": ("send_video", "video"),
+    "animation": ("send_animation", "animation"),
+    "document": ("send_document", "document"),
+    "audio": ("send_audio", "audio"),
+}
+
+_INPUT_MEDIA = {
+    "photo": InputMediaPhoto,
+    "video": InputMediaVideo,
+    "document": InputMediaDocument,
+    "audio": InputMediaAudio,
+}
+
+# Telegram albomida 2 tadan 10 tagacha element bo'ladi
+MEDIA_GROUP_MIN = 2
+MEDIA_GROUP_MAX = 10
+
+
+# Hujjat sifatida yuboriladigan fayl turlari; qolgan noma'lum turlar rad etiladi
+DOCUMENT_CONTENT_TYPES = frozenset({
+    "application/pdf",
+    "application/zip",
+    "application/msword",
+    "application/vnd.ms-excel",
+    "application/vnd.ms-powerpoint",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    "text/plain",
+    "text/csv",
+})
+
+
+def media_type_for(content_type: Optional[str]) -> Optional[str]:
+    """Maps an upload's MIME type to the Telegram media type used to send it, or None if it is not supported."""
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type == "image/gif":
+        return "animation"
+    if content_type.startswith("image/"):
+        return "photo"
+    if content_type.startswith("video/"):
+        return "video"
+    if content_type.startswith("audio/"):
+        return "audio"
+    if content_type in DOCUMENT_CONTENT_TYPES:
+        return "document"
+    return None
+
+
+def validate_media_group(media_types: List[str]) -> None:
+    """
+    Albom Telegram qoidalariga mosligini tekshiradi.
+
+    Photos and videos may be mixed freely; documents and audio can only be
+    grouped with their own type, and animations cannot be grouped at all.
+    """
+    if not MEDIA_GROUP_MIN <= len(media_types) <= MEDIA_GROUP_MAX:
+        raise ValueError(f"A media group must have {MEDIA_GROUP_MIN}-{MEDIA_GROUP_MAX} items")
+    unsupported = set(media_types) - set(_INPUT_MEDIA)
+    if unsupported:
+        raise ValueError(f"Unsupported media types in a media group: {', '.join(sorted(unsupported))}")
+    kinds = set(media_types)
+    if len(kinds) > 1 and not kinds <= {"photo", "video"}:
+        raise ValueError("Documents and audio can only be grouped with their own type")
+
+
+def build_media_group(items: List[dict], caption: Optional[str] = None) -> list:
+    """Albom elementlaridan InputMedia ro'yxatini yasaydi; izoh birinchi elementga qo'yiladi."""
+    return [
+        _INPUT_MEDIA[item["media_type"]](media=item["media_id"], caption=caption if index == 0 else None)
+        for index, item in enumerate(items)
+    ]
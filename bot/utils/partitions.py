@@ -0,0 +1,43 @@
+from datetime import date, datetime, timezone
+from typing import List
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(day: date, months: int) -> date:
+    """Oyning birinchi kuniga `months` oy qo'shadi."""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def utc_bound(day: date) -> str:
+    """Kun boshini UTC bo'yicha timestamptz literal sifatida qaytaradi."""
+    return f"{day.isoformat()} 00:00:00+00"
+
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def monthly_partition_ddl(table: str, start: date, count: int) -> List[str]:
+    """
+    `start` oyidan boshlab `count` ta oylik bo'lim (partition) yaratish buyruqlari.
+
+    Partitions are named ``<table>_yYYYYmMM`` and cover ``[month, next month)``
+    in UTC.  The bounds carry an explicit ``+00`` offset: a bare date literal
+    on a timestamptz key is read in the session's TimeZone, which would shift
+    every boundary by the server's UTC offset.  ``IF NOT EXISTS`` makes the
+    statements safe to run repeatedly.
+    """
+    statements = []
+    first = month_start(start)
+    for offset in range(count):
+        lower = add_months(first, offset)
+        upper = add_months(lower, 1)
+        statements.append(
+            f"CREATE TABLE IF NOT EXISTS {table}_y{lower.year:04d}m{lower.month:02d} "
+            f"PARTITION OF {table} FOR VALUES FROM ('{utc_bound(lower)}') TO ('{utc_bound(upper)}');"
+        )
+    return statements
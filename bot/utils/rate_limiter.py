@@ -0,0 +1,352 @@
+import asyncio
+import time
+from typing import Callable, Dict, Optional, Union
+
+import redis.asyncio as redis
+
+# Redis'dagi token bucket: band qilish (reservation) TokenBucket.reserve bilan bir xil, lekin atomar.
+# KEYS[1] - bucket (hash: tokens, updated, rate); ARGV: rate, capacity, bo'sh turganda saqlash (ms), now.
+# 'rate' maydoni bo'lsa (AIMD) u ishlatiladi.  now bo'sh bo'lsa Redis soati (TIME) olinadi, shuning
+# uchun turli hostlardagi worker'lar bitta soatga tayanadi.  Lua sonlarni butunga kesadi - satr qaytadi.
+_RESERVE_SCRIPT = """
+local now = tonumber(ARGV[4])
+if not now then
+    local t = redis.call('TIME')
+    now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+end
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated', 'rate')
+local rate = tonumber(state[3]) or tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+if now > updated then
+    tokens = math.min(capacity, tokens + (now - updated) * rate)
+    updated = now
+end
+tokens = tokens - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(updated))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + tonumber(ARGV[3]))
+if tokens >= 0 then
+    return '0'
+end
+return tostring(-tokens / rate)
+"""
+
+# AIMD: tezlikni o'zgartirishdan oldin shu paytgacha yig'ilgan tokenlar eski tezlikda hisoblanadi.
+# KEYS[1] - bucket; ARGV: boshlang'ich, min, max tezlik, increase, decrease, rejim (success/throttle),
+# bo'sh turganda saqlash (ms), now.  Yangi tezlikni qaytaradi.
+_ADJUST_SCRIPT = """
+local now = tonumber(ARGV[8])
+if not now then
+    local t = redis.call('TIME')
+    now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+end
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated', 'rate')
+local rate = tonumber(state[3]) or tonumber(ARGV[1])
+local tokens = tonumber(state[1]) or 1
+local updated = tonumber(state[2]) or now
+if now > updated then
+    tokens = math.min(1, tokens + (now - updated) * rate)
+    updated = now
+end
+if ARGV[6] == 'success' then
+    rate = math.min(tonumber(ARGV[3]), rate + tonumber(ARGV[4]) / rate)
+else
+    rate = math.max(tonumber(ARGV[2]), rate * tonumber(ARGV[5]))
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(updated), 'rate', tostring(rate))
+redis.call('PEXPIRE', KEYS[1], tonumber(ARGV[7]))
+return tostring(rate)
+"""
+
+
+class TokenBucket:
+    """A reservation-based token bucket.
+
+    ``reserve()`` always takes a token and returns how long the caller has to
+    wait before using it.  The balance may go negative, which queues callers
+    fairly without holding a lock while they sleep.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+
+    def _refill(self) -> float:
+        now = self._clock()
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+        return now
+
+    def reserve(self) -> float:
+        """Takes one token and returns the delay (in seconds) until it is usable."""
+        self._refill()
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self.rate
+
+    def set_rate(self, rate: float) -> None:
+        """Changes the refill rate; tokens earned so far are kept."""
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self._refill()
+        self.rate = rate
+
+    def is_idle(self) -> bool:
+        """True when the bucket is full, i.e. it carries no state worth keeping."""
+        self._refill()
+        return self._tokens >= self.capacity
+
+    async def acquire(self) -> None:
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class RedisTokenBucket:
+    """:class:`TokenBucket` whose state lives in Redis.
+
+    Every process that uses the same ``key`` draws from one bucket, so N
+    workers together stay within the configured rate.  Idle buckets expire
+    on their own ``idle_ttl`` seconds after they are full again.
+    """
+
+    def __init__(
+        self,
+        redis_conn: redis.Redis,
+        key: str,
+        rate: float,
+        capacity: float,
+        idle_ttl: float = 60.0,
+        clock: Optional[Callable[[], float]] = None,
+    ):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.redis = redis_conn
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity
+        self.idle_ttl = idle_ttl
+        # None: Redis serverining soati
+        self._clock = clock
+
+    async def reserve(self) -> float:
+        """Takes one token and returns the delay (in seconds) until it is usable."""
+        now = "" if self._clock is None else repr(self._clock())
+        delay = await self.redis.eval(
+            _RESERVE_SCRIPT, 1, self.key, repr(self.rate), repr(self.capacity), int(self.idle_ttl * 1000), now
+        )
+        return float(delay)
+
+    async def acquire(self) -> None:
+        delay = await self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class RateLimiter:
+    """Global + per-chat rate limiting for outgoing Telegram messages.
+
+    Telegram allows roughly 30 messages per second for a bot overall and about
+    20 messages per minute into a single group or channel.  Every send first
+    waits for its chat's bucket and only then reserves a global token, so a
+    busy chat never burns global capacity it cannot use yet.
+
+    Overdue backlog posts additionally pass through a separate, slower
+    bucket, so a catch-up after downtime drains at a controlled rate and
+    leaves global capacity for posts that are due on time.
+
+    With ``redis_conn`` every bucket and chat pause is kept in Redis under
+    ``key_prefix``, so all dispatch workers share one set of limits.
+    Without it the limiter lives in process memory and only holds for a
+    single process.
+    """
+
+    # Idle per-chat buckets are dropped once this many have accumulated
+    MAX_IDLE_CHATS = 10_000
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        chat_rate: float = 20 / 60,
+        chat_burst: float = 1.0,
+        backlog_rate: float = 10.0,
+        backlog_burst: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+        redis_conn: Optional[redis.Redis] = None,
+        key_prefix: str = "ratelimit",
+        redis_clock: Optional[Callable[[], float]] = None,
+    ):
+        self._clock = clock
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._redis = redis_conn
+        self._key_prefix = key_prefix
+        self._redis_clock = redis_clock
+        self._global = self._bucket("global", global_rate, global_rate)
+        self._backlog = self._bucket("backlog", backlog_rate, backlog_burst)
+        self._chats: Dict[int, TokenBucket] = {}
+        self._paused_until: Dict[int, float] = {}
+
+    def _bucket(self, name: str, rate: float, capacity: float) -> Union[TokenBucket, RedisTokenBucket]:
+        if self._redis is None:
+            return TokenBucket(rate, capacity=capacity, clock=self._clock)
+        return RedisTokenBucket(
+            self._redis, f"{self._key_prefix}:{name}", rate, capacity, clock=self._redis_clock
+        )
+
+    def _chat_bucket(self, chat_id: int) -> Union[TokenBucket, RedisTokenBucket]:
+        if self._redis is not None:
+            # Redis'dagi bo'sh bucket'lar o'zi o'chadi, mahalliy kesh kerak emas
+            return self._bucket(f"chat:{chat_id}", self._chat_rate, self._chat_burst)
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.MAX_IDLE_CHATS:
+                self._prune()
+            bucket = TokenBucket(self._chat_rate, capacity=self._chat_burst, clock=self._clock)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _prune(self) -> None:
+        for chat_id in [cid for cid, bucket in self._chats.items() if bucket.is_idle()]:
+            del self._chats[chat_id]
+        now = self._clock()
+        for chat_id in [cid for cid, until in self._paused_until.items() if until <= now]:
+            del self._paused_until[chat_id]
+
+    async def pause(self, chat_id: int, seconds: float) -> None:
+        """Holds every send to ``chat_id`` for ``seconds`` (e.g. after a RetryAfter)."""
+        if self._redis is not None:
+            key = f"{self._key_prefix}:pause:{chat_id}"
+            milliseconds = int(seconds * 1000)
+            # Mavjud uzunroq pauza qisqartirilmaydi (pttl: kalit yo'q bo'lsa -2)
+            if milliseconds > 0 and milliseconds > await self._redis.pttl(key):
+                await self._redis.set(key, 1, px=milliseconds)
+            return
+        until = self._clock() + seconds
+        if until > self._paused_until.get(chat_id, 0.0):
+            self._paused_until[chat_id] = until
+
+    async def paused_for(self, chat_id: int) -> float:
+        """Seconds left until ``chat_id`` is unpaused (0 if it is not paused)."""
+        if self._redis is not None:
+            return max(0.0, await self._redis.pttl(f"{self._key_prefix}:pause:{chat_id}") / 1000)
+        return max(0.0, self._paused_until.get(chat_id, 0.0) - self._clock())
+
+    async def acquire(self, chat_id: int, backlog: bool = False) -> None:
+        """Waits until a message may be sent to ``chat_id``."""
+        if backlog:
+            await self._backlog.acquire()
+        bucket = self._chat_bucket(chat_id)
+        while True:
+            await bucket.acquire()
+            # Kutish davomida kanal "pauza"ga tushgan bo'lishi mumkin
+            remaining = await self.paused_for(chat_id)
+            if remaining <= 0:
+                break
+            await asyncio.sleep(remaining)
+        await self._global.acquire()
+
+
+class AIMDRateController:
+    """Additive-increase / multiplicative-decrease control of a request rate.
+
+    Used where Telegram does not publish a limit (e.g. reading views): every
+    successful request nudges the rate up by about ``increase`` requests per
+    second each second, and every ``RetryAfter`` cuts it by ``decrease`` and
+    holds all callers for the time the server asked for.
+
+    With ``redis_conn`` the rate, the bucket and the pause are kept in Redis
+    under ``key`` (for ``state_ttl`` seconds after the last change), so all
+    workers adapt one shared rate.
+    """
+
+    def __init__(
+        self,
+        initial_rate: float = 5.0,
+        min_rate: float = 0.5,
+        max_rate: float = 25.0,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        clock: Callable[[], float] = time.monotonic,
+        redis_conn: Optional[redis.Redis] = None,
+        key: str = "ratelimit:aimd",
+        state_ttl: float = 86400.0,
+        redis_clock: Optional[Callable[[], float]] = None,
+    ):
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self._clock = clock
+        self._redis = redis_conn
+        self._key = key
+        self._state_ttl = state_ttl
+        self._redis_clock = redis_clock
+        self._bucket = TokenBucket(initial_rate, capacity=1.0, clock=clock)
+        if redis_conn is not None:
+            self._shared_bucket = RedisTokenBucket(
+                redis_conn, key, initial_rate, capacity=1.0, idle_ttl=state_ttl, clock=redis_clock
+            )
+        self._paused_until = 0.0
+        # Redis rejimida: oxirgi ma'lum bo'lgan umumiy tezlik
+        self._shared_rate = initial_rate
+
+    @property
+    def rate(self) -> float:
+        return self._bucket.rate if self._redis is None else self._shared_rate
+
+    async def _adjust(self, mode: str) -> None:
+        now = "" if self._redis_clock is None else repr(self._redis_clock())
+        rate = await self._redis.eval(
+            _ADJUST_SCRIPT, 1, self._key,
+            repr(self.initial_rate), repr(self.min_rate), repr(self.max_rate),
+            repr(self.increase), repr(self.decrease), mode, int(self._state_ttl * 1000), now,
+        )
+        self._shared_rate = float(rate)
+
+    async def on_success(self) -> None:
+        if self._redis is not None:
+            await self._adjust("success")
+            return
+        # Har bir muvaffaqiyatli so'rov tezlikni increase/rate ga oshiradi: soniyasiga ~increase
+        self._bucket.set_rate(min(self.max_rate, self.rate + self.increase / self.rate))
+
+    async def on_throttle(self, retry_after: float = 0.0) -> None:
+        if self._redis is not None:
+            await self._adjust("throttle")
+            milliseconds = int(retry_after * 1000)
+            pause_key = f"{self._key}:pause"
+            if milliseconds > 0 and milliseconds > await self._redis.pttl(pause_key):
+                await self._redis.set(pause_key, 1, px=milliseconds)
+            return
+        self._bucket.set_rate(max(self.min_rate, self.rate * self.decrease))
+        until = self._clock() + retry_after
+        if until > self._paused_until:
+            self._paused_until = until
+
+    async def _paused_for(self) -> float:
+        if self._redis is not None:
+            return max(0.0, await self._redis.pttl(f"{self._key}:pause") / 1000)
+        return self._paused_until - self._clock()
+
+    async def acquire(self) -> None:
+        """Waits for the next request slot, honouring any RetryAfter pause."""
+        while True:
+            remaining = await self._paused_for()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(remaining)
+        if self._redis is not None:
+            await self._shared_bucket.acquire()
+        else:
+            await self._bucket.acquire()
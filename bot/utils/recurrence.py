@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Set
+
+# Har bir maydonning ruxsat etilgan qiymatlar oralig'i
+_FIELDS = (
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day of month", 1, 31),
+    ("month", 1, 12),
+    ("day of week", 0, 6),
+)
+
+_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+
+# Yechim topilmasa cheksiz aylanmaslik uchun (masalan, "0 0 31 2 *")
+_MAX_YEARS_AHEAD = 5
+
+
+def _parse_field(expr: str, name: str, low: int, high: int) -> List[int]:
+    values: Set[int] = set()
+    for part in expr.split(","):
+        step = 1
+        if "/" in part:
+            part, step_str = part.split("/", 1)
+            step = int(step_str)
+            if step <= 0:
+                raise ValueError(f"Invalid step in {name} field: {expr!r}")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_str, end_str = part.split("-", 1)
+            start, end = int(start_str), int(end_str)
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        # 7 ham yakshanbani bildiradi
+        top = 7 if name == "day of week" else high
+        if start < low or end > top or start > end:
+            raise ValueError(f"Value out of range in {name} field: {expr!r}")
+        values.update(value % 7 if top == 7 else value for value in range(start, end + 1, step))
+    return sorted(values)
+
+
+class CronSchedule:
+    """A standard five-field cron expression evaluated in UTC.
+
+    ``next_after()`` computes one occurrence at a time by jumping straight to
+    the next allowed month/day/hour/minute, so nothing is expanded ahead.
+    As in cron, when both day-of-month and day-of-week are restricted a day
+    matches if either of them does.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        fields = _ALIASES.get(self.expression, self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression must have 5 fields: {expression!r}")
+        try:
+            parsed = [_parse_field(expr, *spec) for expr, spec in zip(fields, _FIELDS)]
+        except ValueError as e:
+            raise ValueError(f"Invalid cron expression {expression!r}: {e}") from e
+        self.minutes, self.hours, self.days, self.months, self.weekdays = parsed
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, dt: datetime) -> bool:
+        weekday = (dt.weekday() + 1) % 7  # cron: 0 = yakshanba
+        day_ok = dt.day in self.days
+        weekday_ok = weekday in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, after: datetime) -> datetime:
+        """`after` dan keyingi (qat'iy katta) birinchi ishga tushish vaqtini qaytaradi."""
+        if after.tzinfo is None:
+            after = after.replace(tzinfo=timezone.utc)
+        dt = after.astimezone(timezone.utc).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit_year = dt.year + _MAX_YEARS_AHEAD
+
+        while dt.year <= limit_year:
+            if dt.month not in self.months:
+                later = [m for m in self.months if m > dt.month]
+                dt = dt.replace(year=dt.year + (0 if later else 1), month=later[0] if later else self.months[0],
+                                day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(dt):
+                dt = (dt + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if dt.hour not in self.hours:
+                later = [h for h in self.hours if h > dt.hour]
+                if not later:
+                    dt = (dt + timedelta(days=1)).replace(hour=0, minute=0)
+                else:
+                    dt = dt.replace(hour=later[0], minute=0)
+                continue
+            if dt.minute not in self.minutes:
+                later = [m for m in self.minutes if m > dt.minute]
+                if not later:
+                    dt = (dt + timedelta(hours=1)).replace(minute=0)
+                else:
+                    dt = dt.replace(minute=later[0])
+                continue
+            return dt
+
+        raise ValueError(f"Cron expression {self.expression!r} never fires")
@@ -0,0 +1,67 @@
+import asyncio
+import random
+from typing import Callable, Optional
+
+from aiohttp import ClientError
+from aiogram.exceptions import (
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+# Xatolik turlari
+RETRY_AFTER = "retry_after"
+TRANSIENT = "transient"
+PERMANENT = "permanent"
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter for failed sends.
+
+    ``next_delay()`` honours Telegram's ``retry_after`` when it is given:
+    the server's value is a floor, and a little jitter is added on top so
+    that posts paused together do not all fire in the same instant.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        base_delay: float = 5.0,
+        max_delay: float = 900.0,
+        rng: Callable[[float, float], float] = random.uniform,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng
+
+    @staticmethod
+    def classify(error: BaseException) -> str:
+        """Xatolikni qayta urinish mumkinligiga qarab turkumlaydi."""
+        if isinstance(error, TelegramRetryAfter):
+            return RETRY_AFTER
+        if isinstance(error, (TelegramNetworkError, TelegramServerError, ClientError, asyncio.TimeoutError)):
+            return TRANSIENT
+        return PERMANENT
+
+    @classmethod
+    def counts_as_attempt(cls, error: BaseException) -> bool:
+        """
+        Xatolik urinishlar hisobiga qo'shiladimi.
+
+        A flood-wait says nothing about whether the send would succeed, only
+        when it may be made, so it is rescheduled without consuming one of
+        ``max_attempts``.
+        """
+        return cls.classify(error) != RETRY_AFTER
+
+    def should_retry(self, attempts: int, error: BaseException) -> bool:
+        """`attempts` - shu xatolik bilan birga hisoblangan urinishlar soni."""
+        return self.classify(error) != PERMANENT and attempts < self.max_attempts
+
+    def next_delay(self, attempts: int, retry_after: Optional[float] = None) -> float:
+        """Navbatdagi urinishgacha kutish vaqti (soniya)."""
+        if retry_after is not None:
+            return retry_after + self._rng(0, min(self.base_delay, retry_after))
+        ceiling = min(self.max_delay, self.base_delay * 2 ** max(attempts - 1, 0))
+        return self._rng(0, ceiling)
@@ -0,0 +1,135 @@
+import math
+import struct
+from array import array
+from typing import Iterable, List, Optional
+
+# Sarlavha: compression, min, max, markazlar soni; keyin o'rtachalar (float64) va og'irliklar (uint32)
+_HEADER = struct.Struct("<dddI")
+
+
+class TDigest:
+    """
+    Birlashtiriladigan (mergeable) t-digest: taqsimot kvantillarini ixcham baholaydi.
+
+    Values are grouped into about ``compression / 2`` centroids, small near
+    the tails (k1 scale function), so p50/p90/p99 stay accurate while the
+    sketch size is independent of the number of values.  Digests built
+    separately (per channel, per day) merge into one without the raw data.
+    """
+
+    def __init__(self, compression: float = 200.0):
+        self.compression = compression
+        self._means: List[float] = []
+        self._weights: List[float] = []
+        self._buffer: List[float] = []
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def count(self) -> int:
+        return int(sum(self._weights)) + len(self._buffer)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, value: float) -> None:
+        self._buffer.append(float(value))
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= 10 * self.compression:
+            self._compress()
+
+    def update(self, values: Iterable[float]) -> "TDigest":
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        """`other` ni shu digest'ga qo'shadi (`other` o'zgarmaydi)."""
+        other._compress()
+        self._compress()
+        self._means.extend(other._means)
+        self._weights.extend(other._weights)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(force=True)
+        return self
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(min(1.0, max(-1.0, 2 * q - 1)))
+
+    def _compress(self, force: bool = False) -> None:
+        if not self._buffer and not force:
+            return
+        items = sorted(
+            list(zip(self._means, self._weights)) + [(value, 1.0) for value in self._buffer]
+        )
+        self._buffer = []
+        if not items:
+            self._means, self._weights = [], []
+            return
+
+        total = sum(weight for _, weight in items)
+        means: List[float] = []
+        weights: List[float] = []
+        current_mean, current_weight = items[0]
+        cumulative = 0.0
+        k_lower = self._k(0.0)
+        for mean, weight in items[1:]:
+            if self._k((cumulative + current_weight + weight) / total) - k_lower <= 1:
+                current_weight += weight
+                current_mean += (mean - current_mean) * weight / current_weight
+            else:
+                means.append(current_mean)
+                weights.append(current_weight)
+                cumulative += current_weight
+                k_lower = self._k(cumulative / total)
+                current_mean, current_weight = mean, weight
+        means.append(current_mean)
+        weights.append(current_weight)
+        self._means, self._weights = means, weights
+
+    def quantile(self, q: float) -> Optional[float]:
+        """`q` (0..1) kvantilni qaytaradi; bo'sh digest uchun None."""
+        self._compress()
+        if not self._means:
+            return None
+        if len(self._means) == 1:
+            return self._means[0]
+        target = q * sum(self._weights)
+        # Har bir markaz o'z og'irligining o'rtasida turadi deb hisoblanadi; chetlar min/max gacha cho'ziladi
+        previous_center, previous_mean = 0.0, self.min
+        cumulative = 0.0
+        for mean, weight in zip(self._means, self._weights):
+            center = cumulative + weight / 2
+            if target < center:
+                fraction = (target - previous_center) / (center - previous_center)
+                return previous_mean + fraction * (mean - previous_mean)
+            previous_center, previous_mean = center, mean
+            cumulative += weight
+        if cumulative <= previous_center:
+            return self.max
+        fraction = (target - previous_center) / (cumulative - previous_center)
+        return previous_mean + min(1.0, fraction) * (self.max - previous_mean)
+
+    def to_bytes(self) -> bytes:
+        self._compress()
+        return (
+            _HEADER.pack(self.compression, self.min, self.max, len(self._means))
+            + array("d", self._means).tobytes()
+            + array("I", (round(weight) for weight in self._weights)).tobytes()
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TDigest":
+        compression, minimum, maximum, size = _HEADER.unpack_from(data)
+        digest = cls(compression)
+        digest.min, digest.max = minimum, maximum
+        offset = _HEADER.size
+        means = array("d")
+        means.frombytes(data[offset:offset + 8 * size])
+        weights = array("I")
+        weights.frombytes(data[offset + 8 * size:offset + 12 * size])
+        digest._means = means.tolist()
+        digest._weights = [float(weight) for weight in weights]
+        return digest
@@ -0,0 +1,84 @@
+import asyncio
+import importlib.util
+from typing import List, Optional
+
+
+class ViewsRateLimited(Exception):
+    """Telegram asked to wait `retry_after` seconds before the next request (FLOOD_WAIT)."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Flood wait of {retry_after}s")
+        self.retry_after = retry_after
+
+
+class ViewsUnavailable(Exception):
+    """The channel or its messages cannot be read (bot removed, channel private or deleted)."""
+
+
+def mtproto_available() -> bool:
+    """telethon o'rnatilganmi (ko'rishlarni yig'ish faqat u bilan ishlaydi)."""
+    return importlib.util.find_spec("telethon") is not None
+
+
+class MTProtoViewsSource:
+    """
+    Kanal postlarining ko'rishlar sonini MTProto orqali o'qiydi.
+
+    The Bot API has no method that returns a channel post's view count
+    after it was sent, so views are read with ``channels.getMessages``
+    over an MTProto session that logs in with the same bot token.  This
+    needs an ``api_id``/``api_hash`` pair from my.telegram.org and the
+    optional ``telethon`` package; without them ``enabled`` is False and
+    view collection is skipped.  The client connects lazily on first use
+    and lives on the calling event loop, so it belongs to the worker's
+    long-lived runtime loop.
+    """
+
+    def __init__(self, api_id: Optional[int], api_hash: Optional[str], bot_token: str):
+        self.api_id = api_id
+        self.api_hash = api_hash
+        self.bot_token = bot_token
+        self._client = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_id and self.api_hash) and mtproto_available()
+
+    async def _get_client(self):
+        async with self._lock:
+            if self._client is None:
+                from telethon import TelegramClient
+                from telethon.sessions import MemorySession
+
+                client = TelegramClient(MemorySession(), self.api_id, self.api_hash)
+                await client.start(bot_token=self.bot_token)
+                self._client = client
+            return self._client
+
+    async def get_views(self, channel_id: int, message_ids: List[int]) -> List[Optional[int]]:
+        """
+        Xabarlarning ko'rishlar sonini so'ralgan tartibda qaytaradi.
+
+        Deleted messages (and messages without a view counter) come back
+        as None.  Raises ``ViewsRateLimited`` on a flood wait and
+        ``ViewsUnavailable`` when the channel cannot be read.
+        """
+        from telethon.errors import BadRequestError, FloodWaitError, ForbiddenError
+
+        client = await self._get_client()
+        try:
+            messages = await client.get_messages(channel_id, ids=message_ids)
+        except FloodWaitError as e:
+            raise ViewsRateLimited(e.seconds) from e
+        except (BadRequestError, ForbiddenError, ValueError) as e:
+            # ValueError: telethon kanalni topa olmadi (bot kanalda emas)
+            raise ViewsUnavailable(str(e)) from e
+        return [getattr(message, "views", None) for message in messages]
+
+    async def close(self) -> None:
+        """MTProto ulanishini yopadi (ulanmagan bo'lsa hech narsa qilmaydi)."""
+        async with self._lock:
+            if self._client is not None:
+                await self._client.disconnect()
+                self._client = None
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Coroutine, Optional, TypeVar
+
+import redis.asyncio as redis
+from aiogram import Bot
+from asyncpg import Pool
+from celery.signals import worker_process_init, worker_process_shutdown, worker_shutdown
+
+from bot.container import container
+from bot.database.db import create_pool
+from bot.utils.views_source import MTProtoViewsSource
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class WorkerRuntime:
+    """
+    Celery worker jarayoni uchun yagona, uzoq yashaydigan event loop.
+
+    The loop runs in a daemon thread and tasks hand their coroutines to it
+    with ``run()``.  Everything bound to a loop (the Bot's aiohttp session,
+    the asyncpg pool, the Redis client) is therefore created once per
+    process and reused by every task, instead of being rebuilt by
+    ``asyncio.run()`` on each call.
+    """
+
+    def __init__(
+        self,
+        startup: Optional[Callable[[], Awaitable[None]]] = None,
+        shutdown: Optional[Callable[[], Awaitable[None]]] = None,
+    ):
+        self._startup = startup
+        self._shutdown = shutdown
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self._loop is not None and self._loop.is_running()
+
+    def start(self) -> None:
+        """
+        Loop'ni ishga tushiradi va resurslarni ochadi. Qayta chaqirilsa hech narsa qilmaydi.
+
+        The runtime only counts as started once ``startup`` succeeds; if it
+        raises, the loop thread is stopped and the error propagates, so the
+        next ``start()`` (or ``run()``) tries again from scratch.  Callers
+        racing with a start in progress wait for it on the lock.
+        """
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="worker-event-loop", daemon=True)
+            thread.start()
+            try:
+                if self._startup is not None:
+                    asyncio.run_coroutine_threadsafe(self._startup(), loop).result()
+            except BaseException:
+                loop.call_soon_threadsafe(loop.stop)
+                thread.join()
+                loop.close()
+                raise
+            self._loop, self._thread = loop, thread
+
+    def run(self, coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+        """Korutinani worker loop'ida bajaradi va natijasini qaytaradi."""
+        if self._loop is None:
+            self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        return future.result(timeout)
+
+    def stop(self) -> None:
+        """Resurslarni yopadi va loop'ni to'xtatadi."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            if loop is None:
+                return
+            self._loop = self._thread = None
+
+        try:
+            if self._shutdown is not None:
+                asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result()
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+
+async def open_worker_resources() -> None:
+    """Ma'lumotlar bazasi pool'ini ochadi va konteynerga qo'shadi."""
+    pool = await create_pool()
+    container.register(Pool, instance=pool)
+    logger.info("Worker runtime started: database pool opened.")
+
+
+async def close_worker_resources() -> None:
+    """Bot sessiyasi, MTProto ulanishi, Redis ulanishi va DB pool'ini yopadi."""
+    await container.resolve(Bot).session.close()
+    await container.resolve(MTProtoViewsSource).close()
+    await container.resolve(redis.Redis).aclose()
+    await container.resolve(Pool).close()
+    logger.info("Worker runtime stopped: connections closed.")
+
+
+# Har bir worker jarayoni uchun yagona runtime
+runtime = WorkerRuntime(startup=open_worker_resources, shutdown=close_worker_resources)
+
+
+@worker_process_init.connect
+def _start_runtime(**kwargs):
+    runtime.start()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def _stop_runtime(**kwargs):
+    runtime.stop()
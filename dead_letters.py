@@ -0,0 +1,56 @@
+import argparse
+import asyncio
+import logging
+
+import redis.asyncio as redis
+from asyncpg import Pool
+
+from bot.container import container
+from bot.database.db import create_pool
+from bot.database.repositories import SchedulerRepository
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def main(args: argparse.Namespace):
+    """Dead-letter jadvalidagi postlarni ko'rsatadi yoki qayta navbatga qo'yadi."""
+    pool: Pool = await create_pool()
+    container.register(Pool, instance=pool)
+    scheduler_repo = container.resolve(SchedulerRepository)
+
+    try:
+        if args.command == "list":
+            rows = await scheduler_repo.get_dead_letters(limit=args.limit)
+            if not rows:
+                logger.info("Dead-letter queue is empty.")
+            for row in rows:
+                text = (row["post_text"] or "").replace("\n", " ")[:60]
+                print(
+                    f"post={row['scheduled_post_id']} channel={row['channel_id']} "
+                    f"user={row['user_id']} attempts={row['attempts']} "
+                    f"failed_at={row['failed_at']:%Y-%m-%d %H:%M:%S} "
+                    f"error={row['error']!r} text={text!r}"
+                )
+        elif args.command == "requeue":
+            for post_id in args.post_ids:
+                if await scheduler_repo.requeue_dead_letter(post_id):
+                    logger.info(f"✅ Post {post_id} was re-queued.")
+                else:
+                    logger.warning(f"Post {post_id} is not in the dead-letter queue.")
+    finally:
+        await container.resolve(redis.Redis).aclose()
+        await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and re-queue posts that could not be sent.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="Show the most recent dead-lettered posts.")
+    list_parser.add_argument("--limit", type=int, default=50)
+
+    requeue_parser = subparsers.add_parser("requeue", help="Reset attempts and send the posts again.")
+    requeue_parser.add_argument("post_ids", type=int, nargs="+")
+
+    asyncio.run(main(parser.parse_args()))
@@ -1,8 +1,9 @@
 import asyncio
 import logging
-from asyncpg import Pool
+from asyncpg import DuplicateObjectError, Pool
 from bot.config import settings
 from bot.database import db
+from bot.utils.partitions import monthly_partition_ddl, utc_today
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -22,7 +23,9 @@ CREATE_TABLES_COMMANDS = [
         id BIGINT PRIMARY KEY,
         username VARCHAR(255),
         plan_id INTEGER,
-        created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+        data_version BIGINT NOT NULL DEFAULT 0,
+        sync_floor BIGINT NOT NULL DEFAULT 0
     );
     """,
     """
@@ -31,7 +34,9 @@ CREATE_TABLES_COMMANDS = [
         user_id BIGINT NOT NULL,
         title VARCHAR(255),
         username VARCHAR(255) UNIQUE,
-        created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+        version BIGINT NOT NULL DEFAULT 0
     );
     """,
     """
@@ -46,7 +51,17 @@ CREATE_TABLES_COMMANDS = [
         status VARCHAR(50) DEFAULT 'pending',
         schedule_time TIMESTAMP WITH TIME ZONE,
         created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
-        views INTEGER DEFAULT 0
+        views INTEGER DEFAULT 0,
+        lease_owner VARCHAR(255),
+        lease_expires_at TIMESTAMP WITH TIME ZONE,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        recurrence_rule VARCHAR(255),
+        next_fire_at TIMESTAMP WITH TIME ZONE,
+        media_group JSON,
+        delete_after_seconds INTEGER,
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+        version BIGINT NOT NULL DEFAULT 0
     );
     """,
     """
@@ -55,11 +70,122 @@ CREATE_TABLES_COMMANDS = [
         scheduled_post_id INTEGER NOT NULL,
         channel_id BIGINT NOT NULL,
         message_id BIGINT NOT NULL,
-        sent_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+        sent_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+        next_refresh_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+        views_24h INTEGER
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS dead_letter_posts (
+        id SERIAL PRIMARY KEY,
+        scheduled_post_id INTEGER NOT NULL UNIQUE,
+        channel_id BIGINT NOT NULL,
+        attempts INTEGER NOT NULL,
+        error TEXT,
+        failed_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS media_files (
+        sha256 VARCHAR(64) PRIMARY KEY,
+        file_id VARCHAR(255) NOT NULL,
+        media_type VARCHAR(50) NOT NULL,
+        file_size BIGINT,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS post_actions (
+        id SERIAL PRIMARY KEY,
+        scheduled_post_id INTEGER NOT NULL,
+        sent_post_id INTEGER,
+        action VARCHAR(20) NOT NULL,
+        payload JSON,
+        run_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        status VARCHAR(50) NOT NULL DEFAULT 'pending',
+        lease_owner VARCHAR(255),
+        lease_expires_at TIMESTAMP WITH TIME ZONE,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS post_view_snapshots (
+        post_id INTEGER NOT NULL,
+        ts TIMESTAMP WITH TIME ZONE NOT NULL,
+        views INTEGER NOT NULL
+    ) PARTITION BY RANGE (ts);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS channel_stats_hourly (
+        channel_id BIGINT NOT NULL,
+        bucket TIMESTAMP WITH TIME ZONE NOT NULL,
+        posts_sent INTEGER NOT NULL DEFAULT 0,
+        views_gained BIGINT NOT NULL DEFAULT 0,
+        sent_post_views BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (channel_id, bucket)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS channel_stats_daily (
+        channel_id BIGINT NOT NULL,
+        bucket TIMESTAMP WITH TIME ZONE NOT NULL,
+        posts_sent INTEGER NOT NULL DEFAULT 0,
+        views_gained BIGINT NOT NULL DEFAULT 0,
+        sent_post_views BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (channel_id, bucket)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_watermarks (
+        name VARCHAR(100) PRIMARY KEY,
+        watermark TIMESTAMP WITH TIME ZONE NOT NULL
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS view_sketches (
+        channel_id BIGINT NOT NULL,
+        day DATE NOT NULL,
+        sketch BYTEA NOT NULL,
+        PRIMARY KEY (channel_id, day)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sync_tombstones (
+        user_id BIGINT NOT NULL,
+        entity VARCHAR(20) NOT NULL,
+        entity_id BIGINT NOT NULL,
+        version BIGINT NOT NULL,
+        deleted_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+        PRIMARY KEY (user_id, entity, entity_id)
     );
     """
 ]
 
+# --- STEP 1b: Upgrade tables created by earlier versions ---
+# CREATE TABLE IF NOT EXISTS mavjud jadvallarga tegmaydi, shuning uchun yangi ustunlar alohida qo'shiladi
+UPGRADE_TABLES_COMMANDS = [
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS data_version BIGINT NOT NULL DEFAULT 0;",
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS sync_floor BIGINT NOT NULL DEFAULT 0;",
+    "ALTER TABLE channels ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT now();",
+    "ALTER TABLE channels ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0;",
+    "ALTER TABLE scheduled_posts ADD COLUMN IF NOT EXISTS lease_owner VARCHAR(255);",
+    "ALTER TABLE scheduled_posts ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP WITH TIME ZONE;",
+    "ALTER TABLE scheduled_posts ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0;",
+    "ALTER TABLE scheduled_posts ADD COLUMN IF NOT EXISTS last_error TEXT;",
+    "ALTER TABLE scheduled_posts ADD COLUMN IF NOT EXISTS recurrence_rule VARCHAR(255);",
+    "ALTER TABLE scheduled_posts ADD COLUMN IF NOT EXISTS next_fire_at TIMESTAMP WITH TIME ZONE;",
+    "ALTER TABLE scheduled_posts ADD COLUMN IF NOT EXISTS media_group JSON;",
+    "ALTER TABLE scheduled_posts ADD COLUMN IF NOT EXISTS delete_after_seconds INTEGER;",
+    "ALTER TABLE scheduled_posts ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT now();",
+    "ALTER TABLE scheduled_posts ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0;",
+    "ALTER TABLE sent_posts ADD COLUMN IF NOT EXISTS next_refresh_at TIMESTAMP WITH TIME ZONE DEFAULT now();",
+    "ALTER TABLE sent_posts ADD COLUMN IF NOT EXISTS views_24h INTEGER;",
+    # next_fire_at paydo bo'lishidan oldin rejalashtirilgan postlar asl schedule_time'da yuboriladi
+    "UPDATE scheduled_posts SET next_fire_at = schedule_time WHERE next_fire_at IS NULL AND schedule_time IS NOT NULL;"
+]
+
 # --- STEP 2: Add all the foreign key constraints AFTER the tables exist ---
 ADD_CONSTRAINTS_COMMANDS = [
     "ALTER TABLE users ADD CONSTRAINT fk_users_plan_id FOREIGN KEY (plan_id) REFERENCES plans(id);",
@@ -67,12 +193,100 @@ ADD_CONSTRAINTS_COMMANDS = [
     "ALTER TABLE scheduled_posts ADD CONSTRAINT fk_scheduled_posts_user_id FOREIGN KEY (user_id) REFERENCES users(id);",
     "ALTER TABLE scheduled_posts ADD CONSTRAINT fk_scheduled_posts_channel_id FOREIGN KEY (channel_id) REFERENCES channels(id);",
     "ALTER TABLE sent_posts ADD CONSTRAINT fk_sent_posts_scheduled_post_id FOREIGN KEY (scheduled_post_id) REFERENCES scheduled_posts(id);",
-    "ALTER TABLE sent_posts ADD CONSTRAINT fk_sent_posts_channel_id FOREIGN KEY (channel_id) REFERENCES channels(id);"
+    "ALTER TABLE sent_posts ADD CONSTRAINT fk_sent_posts_channel_id FOREIGN KEY (channel_id) REFERENCES channels(id);",
+    "ALTER TABLE dead_letter_posts ADD CONSTRAINT fk_dead_letter_posts_scheduled_post_id FOREIGN KEY (scheduled_post_id) REFERENCES scheduled_posts(id) ON DELETE CASCADE;",
+    "ALTER TABLE dead_letter_posts ADD CONSTRAINT fk_dead_letter_posts_channel_id FOREIGN KEY (channel_id) REFERENCES channels(id);",
+    "ALTER TABLE post_actions ADD CONSTRAINT fk_post_actions_scheduled_post_id FOREIGN KEY (scheduled_post_id) REFERENCES scheduled_posts(id) ON DELETE CASCADE;",
+    "ALTER TABLE post_actions ADD CONSTRAINT fk_post_actions_sent_post_id FOREIGN KEY (sent_post_id) REFERENCES sent_posts(id) ON DELETE CASCADE;"
+]
+
+# --- STEP 3: Create indexes used by the dispatcher ---
+CREATE_INDEXES_COMMANDS = [
+    "CREATE INDEX IF NOT EXISTS ix_scheduled_posts_next_fire_at ON scheduled_posts (next_fire_at) WHERE status = 'pending';",
+    "CREATE INDEX IF NOT EXISTS ix_scheduled_posts_lease ON scheduled_posts (lease_expires_at) WHERE status = 'claimed';",
+    "CREATE INDEX IF NOT EXISTS ix_scheduled_posts_channel_views ON scheduled_posts (channel_id, views DESC, id) WHERE views IS NOT NULL;",
+    "CREATE INDEX IF NOT EXISTS ix_sent_posts_scheduled_post_id ON sent_posts (scheduled_post_id);",
+    "CREATE INDEX IF NOT EXISTS ix_sent_posts_sent_at ON sent_posts (sent_at);",
+    "CREATE INDEX IF NOT EXISTS ix_sent_posts_next_refresh_at ON sent_posts (next_refresh_at) WHERE next_refresh_at IS NOT NULL;",
+    "CREATE INDEX IF NOT EXISTS ix_post_actions_run_at ON post_actions (run_at) WHERE status = 'pending';",
+    "CREATE INDEX IF NOT EXISTS ix_post_actions_lease ON post_actions (lease_expires_at) WHERE status = 'claimed';",
+    "CREATE INDEX IF NOT EXISTS ix_post_view_snapshots_post_id_ts ON post_view_snapshots (post_id, ts);",
+    "CREATE INDEX IF NOT EXISTS ix_channels_user_version ON channels (user_id, version);",
+    "CREATE INDEX IF NOT EXISTS ix_scheduled_posts_user_version ON scheduled_posts (user_id, version);",
+    "CREATE INDEX IF NOT EXISTS ix_sync_tombstones_user_version ON sync_tombstones (user_id, version);"
+]
+
+# --- STEP 5: Change tracking for the TWA delta sync ---
+# Har bir foydalanuvchi uchun versiya hisoblagichi (users.data_version) triggerlar orqali oshiriladi:
+# kanallar va postlarning TWA'da ko'rinadigan o'zgarishlari yangi versiya oladi, o'chirilganlari tombstone qoldiradi.
+CREATE_TRIGGERS_COMMANDS = [
+    """
+    CREATE OR REPLACE FUNCTION bump_user_data_version(p_user_id BIGINT) RETURNS BIGINT AS $$
+        UPDATE users SET data_version = data_version + 1 WHERE id = p_user_id RETURNING data_version;
+    $$ LANGUAGE sql;
+    """,
+    """
+    CREATE OR REPLACE FUNCTION stamp_sync_version() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.user_id IS NOT NULL THEN
+            NEW.version := COALESCE(bump_user_data_version(NEW.user_id), 0);
+        END IF;
+        NEW.updated_at := now();
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE OR REPLACE FUNCTION record_sync_tombstone() RETURNS trigger AS $$
+    BEGIN
+        IF OLD.user_id IS NOT NULL THEN
+            INSERT INTO sync_tombstones (user_id, entity, entity_id, version)
+            VALUES (OLD.user_id, TG_ARGV[0], OLD.id, COALESCE(bump_user_data_version(OLD.user_id), 0))
+            ON CONFLICT (user_id, entity, entity_id)
+            DO UPDATE SET version = EXCLUDED.version, deleted_at = now();
+        END IF;
+        RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE OR REPLACE TRIGGER trg_channels_sync_version
+        BEFORE INSERT OR UPDATE ON channels
+        FOR EACH ROW EXECUTE FUNCTION stamp_sync_version();
+    """,
+    """
+    CREATE OR REPLACE TRIGGER trg_channels_sync_tombstone
+        AFTER DELETE ON channels
+        FOR EACH ROW EXECUTE FUNCTION record_sync_tombstone('channel');
+    """,
+    """
+    CREATE OR REPLACE TRIGGER trg_scheduled_posts_sync_insert
+        BEFORE INSERT ON scheduled_posts
+        FOR EACH ROW EXECUTE FUNCTION stamp_sync_version();
+    """,
+    """
+    CREATE OR REPLACE TRIGGER trg_scheduled_posts_sync_update
+        BEFORE UPDATE ON scheduled_posts
+        FOR EACH ROW
+        WHEN ((OLD.channel_id, OLD.post_text, OLD.media_id, OLD.media_type, OLD.media_group::text,
+               OLD.inline_buttons::text, OLD.schedule_time, OLD.recurrence_rule, OLD.next_fire_at,
+               OLD.delete_after_seconds, OLD.status IN ('pending', 'claimed'))
+              IS DISTINCT FROM
+              (NEW.channel_id, NEW.post_text, NEW.media_id, NEW.media_type, NEW.media_group::text,
+               NEW.inline_buttons::text, NEW.schedule_time, NEW.recurrence_rule, NEW.next_fire_at,
+               NEW.delete_after_seconds, NEW.status IN ('pending', 'claimed')))
+        EXECUTE FUNCTION stamp_sync_version();
+    """,
+    """
+    CREATE OR REPLACE TRIGGER trg_scheduled_posts_sync_tombstone
+        AFTER DELETE ON scheduled_posts
+        FOR EACH ROW EXECUTE FUNCTION record_sync_tombstone('scheduled_post');
+    """
 ]
 
 
 async def main():
-    """Manually creates all tables first, then adds all foreign key constraints."""
+    """Creates (or upgrades) all tables first, then adds all foreign key constraints, indexes, partitions and triggers."""
     logger.info("Connecting to the database...")
     db_pool: Pool = await db.create_pool()
 
@@ -83,11 +297,35 @@ async def main():
                 await connection.execute(statement)
             logger.info("✅ All tables created successfully.")
 
+            logger.info("--- Step 1b: Upgrading existing tables ---")
+            for statement in UPGRADE_TABLES_COMMANDS:
+                await connection.execute(statement)
+            logger.info("✅ All tables upgraded successfully.")
+
             logger.info("--- Step 2: Adding foreign key constraints ---")
             for statement in ADD_CONSTRAINTS_COMMANDS:
-                await connection.execute(statement)
+                try:
+                    await connection.execute(statement)
+                except DuplicateObjectError:
+                    # Qayta ishga tushirilganda cheklov allaqachon mavjud
+                    pass
             logger.info("✅ All foreign key constraints added successfully!")
 
+            logger.info("--- Step 3: Creating indexes ---")
+            for statement in CREATE_INDEXES_COMMANDS:
+                await connection.execute(statement)
+            logger.info("✅ All indexes created successfully!")
+
+            logger.info("--- Step 4: Creating monthly partitions ---")
+            for statement in monthly_partition_ddl("post_view_snapshots", utc_today(), 3):
+                await connection.execute(statement)
+            logger.info("✅ All partitions created successfully!")
+
+            logger.info("--- Step 5: Creating change-tracking triggers ---")
+            for statement in CREATE_TRIGGERS_COMMANDS:
+                await connection.execute(statement)
+            logger.info("✅ All triggers created successfully!")
+
     except Exception as e:
         logger.error(f"❌ An error occurred during database initialization: {e}", exc_info=True)
     finally:
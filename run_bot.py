@@ -13,6 +13,7 @@ from bot.handlers import admin_handlers, user_handlers
 from bot.middlewares.dependency_middleware import DependencyMiddleware
 from bot.utils.language_manager import LanguageManager
 from bot.database.repositories import UserRepository
+from bot.utils.charts import ChartRenderer
 
 async def main():
     logging.basicConfig(level=logging.INFO)
@@ -48,6 +49,8 @@ async def main():
         logger.info("Bot is shutting down.")
         await dp.storage.close()
         await bot.session.close()
+        # /stats grafiklari uchun ochilgan jarayonlar pool'ini to'xtatish
+        container.resolve(ChartRenderer).close()
 
 if __name__ == "__main__":
     try:
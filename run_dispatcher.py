@@ -0,0 +1,58 @@
+import asyncio
+import logging
+import signal
+
+import redis.asyncio as redis
+from aiogram import Bot
+from asyncpg import Pool
+
+from bot.container import container
+from bot.database.db import create_pool
+from bot.database.repositories import SchedulerRepository, PostActionRepository
+from bot.services import SchedulerService, PostActionService
+
+
+async def main():
+    """
+    Redis navbatidagi postlarni vaqti kelishi bilan yuboruvchi uzoq ishlaydigan jarayon.
+
+    The same process also runs scheduled delete/edit actions, so sends and
+    actions share one rate limiter.
+    """
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+
+    pool: Pool = await create_pool()
+    container.register(Pool, instance=pool)
+
+    scheduler_repo = container.resolve(SchedulerRepository)
+    scheduler_service = container.resolve(SchedulerService)
+    action_repo = container.resolve(PostActionRepository)
+    action_service = container.resolve(PostActionService)
+
+    # Redis yo'qolgan bo'lishi mumkin: ishga tushishda navbatni bazadan tiklaymiz
+    restored = await scheduler_repo.rebuild_delay_queue()
+    logger.info(f"Delay queue reconciled: {restored} pending posts enqueued.")
+    restored = await action_repo.rebuild_action_queue()
+    logger.info(f"Post action queue reconciled: {restored} pending actions enqueued.")
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    try:
+        logger.info("Dispatcher is consuming the delay queue...")
+        await asyncio.gather(
+            scheduler_service.run_delay_queue_consumer(stop_event),
+            action_service.run_action_queue_consumer(stop_event),
+        )
+    finally:
+        logger.info("Dispatcher is shutting down.")
+        await container.resolve(Bot).session.close()
+        await container.resolve(redis.Redis).aclose()
+        await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
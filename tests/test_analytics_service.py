@@ -0,0 +1,284 @@
+import pytest
+import fakeredis
+import fakeredis.aioredis
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+
+from bot.config import Settings
+from bot.database.repositories import AnalyticsRepository
+from bot.services.analytics_service import AnalyticsService
+from bot.utils.charts import ChartRenderer
+from bot.utils.rate_limiter import AIMDRateController
+from bot.utils.views_source import MTProtoViewsSource, ViewsRateLimited, ViewsUnavailable
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def mock_settings() -> Settings:
+    settings = MagicMock(spec=Settings)
+    settings.VIEWS_CONCURRENCY = 4
+    settings.VIEWS_BATCH_SIZE = 2
+    settings.VIEWS_CLAIM_BATCH_SIZE = 100
+    return settings
+
+
+@pytest.fixture
+def views_source() -> AsyncMock:
+    source = AsyncMock(spec=MTProtoViewsSource)
+    source.enabled = True
+    return source
+
+
+@pytest.fixture
+def mock_analytics_repo() -> AsyncMock:
+    repo = AsyncMock(spec=AnalyticsRepository)
+    repo.bulk_update_views.side_effect = lambda pairs: len(pairs)
+    return repo
+
+
+@pytest.fixture
+def rate_controller() -> MagicMock:
+    controller = MagicMock(spec=AIMDRateController)
+    controller.acquire = AsyncMock()
+    controller.rate = 5.0
+    return controller
+
+
+@pytest.fixture
+def redis_conn():
+    return fakeredis.aioredis.FakeRedis(server=fakeredis.FakeServer())
+
+
+@pytest.fixture
+def chart_renderer() -> AsyncMock:
+    renderer = AsyncMock(spec=ChartRenderer)
+    renderer.render_views_chart.return_value = b"\x89PNG-chart"
+    return renderer
+
+
+@pytest.fixture
+def analytics_service(
+    views_source, mock_analytics_repo, mock_settings, rate_controller, redis_conn, chart_renderer
+) -> AnalyticsService:
+    return AnalyticsService(
+        views_source=views_source,
+        analytics_repository=mock_analytics_repo,
+        settings=mock_settings,
+        rate_controller=rate_controller,
+        redis_conn=redis_conn,
+        chart_renderer=chart_renderer,
+    )
+
+
+def views_reply(channel_id, message_ids):
+    return [message_id * 100 for message_id in message_ids]
+
+
+async def test_message_ids_are_grouped_per_channel(analytics_service, views_source, mock_analytics_repo):
+    mock_analytics_repo.claim_posts_to_track_views.return_value = [
+        {"id": 1, "sent_post_id": 11, "channel_id": -100, "message_id": 1},
+        {"id": 2, "sent_post_id": 12, "channel_id": -100, "message_id": 2},
+        {"id": 3, "sent_post_id": 13, "channel_id": -100, "message_id": 3},
+        {"id": 4, "sent_post_id": 14, "channel_id": -200, "message_id": 4},
+    ]
+    views_source.get_views.side_effect = views_reply
+
+    report = await analytics_service.update_all_post_views()
+
+    # -100 kanali uchun 2 ta partiya (2 + 1), -200 uchun 1 ta
+    assert views_source.get_views.await_count == 3
+    views_source.get_views.assert_any_await(-100, [1, 2])
+    mock_analytics_repo.bulk_update_views.assert_awaited_once()
+    (pairs,) = mock_analytics_repo.bulk_update_views.await_args.args
+    assert sorted(pairs) == [(1, 100), (2, 200), (3, 300), (4, 400)]
+    assert report.changed == 4
+    assert (report.posts, report.requests, report.updated, report.errors) == (4, 3, 4, 0)
+    assert report.error_rate == 0.0
+    # Band qilish bilan birga keyingi yangilash vaqti ham belgilanadi
+    mock_analytics_repo.claim_posts_to_track_views.assert_awaited_once_with(100)
+    # Tarix bitta COPY bilan yoziladi
+    (snapshots,) = mock_analytics_repo.record_view_snapshots.await_args.args
+    assert sorted((post_id, views) for post_id, _, views in snapshots) == [(11, 100), (12, 200), (13, 300), (14, 400)]
+    # Taqsimot uchun kuzatilgan qiymatlar ham uzatiladi (repozitoriy 24 soatdan oshganlarini tanlaydi)
+    (observed,) = mock_analytics_repo.record_views_24h.await_args.args
+    assert sorted(observed) == [(11, 100), (12, 200), (13, 300), (14, 400)]
+
+
+async def test_retry_after_throttles_and_retries(analytics_service, views_source, mock_analytics_repo, rate_controller):
+    mock_analytics_repo.claim_posts_to_track_views.return_value = [{"id": 1, "sent_post_id": 11, "channel_id": -100, "message_id": 1}]
+    views_source.get_views.side_effect = [
+        ViewsRateLimited(7),
+        views_reply(-100, [1]),
+    ]
+
+    report = await analytics_service.update_all_post_views()
+
+    rate_controller.on_throttle.assert_called_once_with(7)
+    rate_controller.on_success.assert_called_once()
+    assert (report.requests, report.throttled, report.updated) == (2, 1, 1)
+
+
+async def test_unreadable_channel_counts_as_error(analytics_service, views_source, mock_analytics_repo):
+    mock_analytics_repo.claim_posts_to_track_views.return_value = [{"id": 1, "sent_post_id": 11, "channel_id": -100, "message_id": 1}]
+    views_source.get_views.side_effect = ViewsUnavailable("CHANNEL_PRIVATE")
+
+    report = await analytics_service.update_all_post_views()
+
+    assert report.errors == 1 and report.error_rate == 1.0
+    mock_analytics_repo.bulk_update_views.assert_awaited_once_with([])
+
+
+async def test_due_posts_are_claimed_in_chunks(analytics_service, mock_settings, views_source, mock_analytics_repo):
+    mock_settings.VIEWS_CLAIM_BATCH_SIZE = 2
+    mock_analytics_repo.claim_posts_to_track_views.side_effect = [
+        [{"id": 1, "sent_post_id": 11, "channel_id": -100, "message_id": 1},
+         {"id": 2, "sent_post_id": 12, "channel_id": -100, "message_id": 2}],
+        [{"id": 3, "sent_post_id": 13, "channel_id": -100, "message_id": 3}],
+    ]
+    views_source.get_views.side_effect = views_reply
+
+    report = await analytics_service.update_all_post_views()
+
+    # To'liq bo'lmagan ikkinchi bo'lakdan keyin to'xtaydi; har bir bo'lak alohida yoziladi
+    assert mock_analytics_repo.claim_posts_to_track_views.await_count == 2
+    assert mock_analytics_repo.bulk_update_views.await_count == 2
+    assert (report.posts, report.updated, report.changed) == (3, 3, 3)
+
+
+async def test_view_collection_is_skipped_without_mtproto(analytics_service, views_source, mock_analytics_repo):
+    views_source.enabled = False
+
+    report = await analytics_service.update_all_post_views()
+
+    assert report.posts == 0
+    # Postlar band qilinmaydi va keyingi vaqtga surilmaydi
+    mock_analytics_repo.claim_posts_to_track_views.assert_not_awaited()
+    views_source.get_views.assert_not_awaited()
+
+
+async def test_views_source_needs_api_credentials():
+    assert not MTProtoViewsSource(api_id=None, api_hash=None, bot_token="123:abc").enabled
+
+
+async def test_refresh_channel_rollups_works_through_backlog(analytics_service, mock_settings, mock_analytics_repo):
+    mock_settings.ROLLUP_LAG_SECONDS = 900
+    mock_settings.ROLLUP_MAX_SPAN_HOURS = 24
+    now = datetime.now(timezone.utc)
+    mock_analytics_repo.advance_channel_rollups.side_effect = [
+        now - timedelta(days=2),
+        now - timedelta(days=1),
+        now - timedelta(seconds=600),
+        now,
+    ]
+
+    watermark = await analytics_service.refresh_channel_rollups()
+
+    # Lag chegarasiga yetgach to'xtaydi
+    assert watermark == now - timedelta(seconds=600)
+    assert mock_analytics_repo.advance_channel_rollups.await_count == 3
+    mock_analytics_repo.advance_channel_rollups.assert_awaited_with(lag_seconds=900, max_span_hours=24)
+
+
+async def test_refresh_channel_rollups_without_new_data(analytics_service, mock_settings, mock_analytics_repo):
+    mock_settings.ROLLUP_LAG_SECONDS = 900
+    mock_settings.ROLLUP_MAX_SPAN_HOURS = 24
+    mock_analytics_repo.advance_channel_rollups.return_value = None
+
+    assert await analytics_service.refresh_channel_rollups() is None
+
+
+async def test_create_views_chart_is_cached_until_data_changes(
+    analytics_service, mock_settings, mock_analytics_repo, chart_renderer, redis_conn
+):
+    mock_settings.CHART_DAYS = 30
+    mock_settings.CHART_CACHE_TTL = 3600
+    rows = [
+        {"channel_id": -1001, "title": "News", "bucket": datetime(2024, 5, 1, tzinfo=timezone.utc), "views_gained": 120},
+        {"channel_id": -1001, "title": "News", "bucket": datetime(2024, 5, 2, tzinfo=timezone.utc), "views_gained": 80},
+    ]
+    mock_analytics_repo.get_user_daily_views.return_value = rows
+
+    first = await analytics_service.create_views_chart(user_id=1)
+    second = await analytics_service.create_views_chart(user_id=1)
+
+    assert first.read() == second.read() == b"\x89PNG-chart"
+    # Ma'lumot o'zgarmagan: ikkinchi chaqiruv keshdan, grafik qayta chizilmaydi
+    chart_renderer.render_views_chart.assert_awaited_once()
+    series, _ = chart_renderer.render_views_chart.await_args.args
+    assert series == {"News": [(datetime(2024, 5, 1).date(), 120), (datetime(2024, 5, 2).date(), 80)]}
+    assert 0 < await redis_conn.ttl("chart:views:1:all") <= 3600
+
+    # Kanal ma'lumotlari o'zgargach grafik qayta chiziladi va o'sha kalit ustiga yoziladi
+    mock_analytics_repo.get_user_daily_views.return_value = rows[:1] + [{**rows[1], "views_gained": 95}]
+    await analytics_service.create_views_chart(user_id=1)
+    assert chart_renderer.render_views_chart.await_count == 2
+    assert await redis_conn.keys("chart:views:*") == [b"chart:views:1:all"]
+
+
+async def test_create_views_chart_without_data(analytics_service, mock_settings, mock_analytics_repo, chart_renderer):
+    mock_settings.CHART_DAYS = 30
+    mock_analytics_repo.get_user_daily_views.return_value = []
+
+    assert await analytics_service.create_views_chart(user_id=1, channel_id=-1001) is None
+    chart_renderer.render_views_chart.assert_not_awaited()
+    mock_analytics_repo.get_user_daily_views.assert_awaited_once()
+    assert mock_analytics_repo.get_user_daily_views.await_args.kwargs["channel_id"] == -1001
+
+
+async def test_get_posts_ordered_by_views_returns_next_cursor(analytics_service, mock_analytics_repo):
+    mock_analytics_repo.get_posts_ordered_by_views.return_value = [
+        {"id": 3, "views": 500}, {"id": 1, "views": 300}, {"id": 2, "views": 300},
+    ]
+
+    posts, next_after = await analytics_service.get_posts_ordered_by_views(-1001, limit=2)
+
+    # Keyingi sahifa borligini bilish uchun bitta ortiqcha qator so'raladi
+    mock_analytics_repo.get_posts_ordered_by_views.assert_awaited_once_with(-1001, limit=3, after=None)
+    assert [post["id"] for post in posts] == [3, 1]
+    assert next_after == (300, 1)
+
+
+async def test_get_posts_ordered_by_views_last_page(analytics_service, mock_analytics_repo):
+    mock_analytics_repo.get_posts_ordered_by_views.return_value = [{"id": 2, "views": 300}]
+
+    posts, next_after = await analytics_service.get_posts_ordered_by_views(-1001, limit=2, after=(300, 1))
+
+    mock_analytics_repo.get_posts_ordered_by_views.assert_awaited_once_with(-1001, limit=3, after=(300, 1))
+    assert posts == [{"id": 2, "views": 300}]
+    assert next_after is None
+
+
+async def test_get_channel_engagement_uses_packed_columns(analytics_service, mock_analytics_repo):
+    sent = datetime(2024, 5, 6, 9, tzinfo=timezone.utc).timestamp()
+    mock_analytics_repo.get_view_snapshot_columns.return_value = {
+        "post_id": [1, 1], "channel_id": [-1001, -1001],
+        "sent_at": [sent, sent], "ts": [sent + 3600, sent + 7200], "views": [40, 80],
+    }
+
+    metrics = await analytics_service.get_channel_engagement(channel_ids=[-1001], days=7)
+
+    assert metrics[-1001].posts == 1
+    assert metrics[-1001].half_life_hours == 1.0
+    assert mock_analytics_repo.get_view_snapshot_columns.await_args.kwargs["channel_ids"] == [-1001]
+
+
+async def test_get_view_percentiles_merges_daily_sketches(analytics_service, mock_analytics_repo):
+    from bot.utils.tdigest import TDigest
+
+    day1, day2 = datetime(2024, 5, 1).date(), datetime(2024, 5, 2).date()
+    mock_analytics_repo.get_view_sketches.return_value = [
+        {"channel_id": -1001, "day": day1, "sketch": TDigest().update(range(0, 100)).to_bytes()},
+        {"channel_id": -1001, "day": day2, "sketch": TDigest().update(range(100, 200)).to_bytes()},
+        {"channel_id": -1002, "day": day1, "sketch": TDigest().to_bytes()},
+    ]
+
+    result = await analytics_service.get_view_percentiles([-1001, -1002], days=30, per_day=True)
+
+    assert set(result) == {-1001}
+    assert result[-1001]["posts"] == 200
+    assert result[-1001]["p50"] == pytest.approx(100, abs=1)
+    assert result[-1001]["p99"] == pytest.approx(198, abs=1)
+    assert [entry["day"] for entry in result[-1001]["days"]] == [day1, day2]
+    assert result[-1001]["days"][0]["p50"] == pytest.approx(50, abs=1)
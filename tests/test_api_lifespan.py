@@ -0,0 +1,30 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from asyncpg import Pool
+from fastapi.testclient import TestClient
+
+import api
+from bot.container import container
+from bot.database.repositories import SchedulerRepository, UserRepository
+from bot.services import AnalyticsService, MediaService, SubscriptionService
+
+
+@pytest.fixture
+def pool():
+    pool = MagicMock(spec=Pool)
+    pool.close = AsyncMock()
+    return pool
+
+
+@pytest.mark.parametrize(
+    "dependency",
+    [MediaService, UserRepository, SchedulerRepository, SubscriptionService, AnalyticsService],
+)
+def test_api_services_resolve_after_startup(pool, dependency):
+    """API ishga tushganda pool konteynerga qo'shiladi va pool'ga bog'liq servislar topiladi."""
+    with patch.object(api, "create_pool", AsyncMock(return_value=pool)):
+        with TestClient(api.app):
+            assert isinstance(container.resolve(dependency), dependency)
+
+    pool.close.assert_awaited_once()
@@ -0,0 +1,82 @@
+import hashlib
+import hmac
+import json
+from unittest.mock import patch
+from urllib.parse import urlencode
+
+import pytest
+from fastapi import HTTPException
+
+from bot.services.auth_service import InitDataVerifier, validate_init_data
+
+BOT_TOKEN = "123456:TEST-TOKEN"
+NOW = 1_700_000_000
+
+
+def make_init_data(user: dict, auth_date: int = NOW, token: str = BOT_TOKEN, **extra) -> str:
+    """Telegram kabi imzolangan initData satrini yaratadi."""
+    fields = {"user": json.dumps(user), "auth_date": str(auth_date), **extra}
+    data_check_string = "\n".join(f"{key}={fields[key]}" for key in sorted(fields))
+    secret_key = hmac.new(b"WebAppData", token.encode(), hashlib.sha256).digest()
+    fields["hash"] = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    return urlencode(fields)
+
+
+@pytest.fixture
+def clock():
+    return [float(NOW)]
+
+
+@pytest.fixture
+def verifier(clock) -> InitDataVerifier:
+    return InitDataVerifier(BOT_TOKEN, max_age_seconds=3600, cache_size=2, cache_ttl=60, clock=lambda: clock[0])
+
+
+def test_verify_returns_decoded_user(verifier):
+    init_data = make_init_data({"id": 42, "username": "ali"}, query_id="AAE-1")
+    assert verifier.verify(init_data) == {"id": 42, "username": "ali"}
+
+
+@pytest.mark.parametrize("init_data", [
+    make_init_data({"id": 42}, token="654321:OTHER"),
+    make_init_data({"id": 42}).replace("42", "43"),
+    "user=%7B%7D&auth_date=1700000000",
+])
+def test_verify_rejects_bad_signatures(verifier, init_data):
+    with pytest.raises(ValueError):
+        verifier.verify(init_data)
+
+
+def test_verify_rejects_stale_auth_date(verifier):
+    with pytest.raises(ValueError, match="expired"):
+        verifier.verify(make_init_data({"id": 42}, auth_date=NOW - 3601))
+
+
+def test_verified_init_data_is_cached(verifier, clock):
+    init_data = make_init_data({"id": 42})
+    assert verifier.verify(init_data) == {"id": 42}
+
+    with patch("bot.services.auth_service.hmac.new") as hmac_new:
+        # Qaytarilgan lug'atni o'zgartirish keshga ta'sir qilmaydi
+        verifier.verify(init_data)["id"] = 0
+        assert verifier.verify(init_data) == {"id": 42}
+        hmac_new.assert_not_called()
+
+    # TTL tugagach qayta tekshiriladi, auth_date muddati o'tgan bo'lsa rad etiladi
+    clock[0] += 3601
+    with pytest.raises(ValueError, match="expired"):
+        verifier.verify(init_data)
+
+
+def test_cache_evicts_least_recently_used(verifier):
+    first, second, third = (make_init_data({"id": i}) for i in (1, 2, 3))
+    for init_data in (first, second, first, third):
+        verifier.verify(init_data)
+
+    assert list(verifier._cache) == [first, third]
+
+
+def test_validate_init_data_wrapper_raises_http_401():
+    with pytest.raises(HTTPException) as exc_info:
+        validate_init_data("user=%7B%7D&auth_date=1&hash=deadbeef", BOT_TOKEN)
+    assert exc_info.value.status_code == 401
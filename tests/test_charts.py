@@ -0,0 +1,22 @@
+import pytest
+from datetime import date
+
+from bot.utils.charts import ChartRenderer, render_views_chart
+
+
+def test_render_views_chart_returns_png():
+    png = render_views_chart(
+        {"News": [(date(2024, 5, 1), 120), (date(2024, 5, 2), 80)], "Blog": [(date(2024, 5, 2), 15)]},
+        "Views per day",
+    )
+    assert png.startswith(b"\x89PNG\r\n\x1a\n")
+
+
+@pytest.mark.asyncio
+async def test_chart_renderer_renders_in_worker_process():
+    renderer = ChartRenderer(max_workers=1)
+    try:
+        png = await renderer.render_views_chart({"News": [(date(2024, 5, 1), 1)]}, "Views")
+    finally:
+        renderer.close()
+    assert png.startswith(b"\x89PNG")
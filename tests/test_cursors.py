@@ -0,0 +1,26 @@
+import pytest
+
+from bot.utils.cursors import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(1500, 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, 2) == (1500, 42)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not-a-cursor",
+        encode_cursor(1),
+        encode_cursor({"views": 1}),
+        encode_cursor("a", "b"),
+        encode_cursor(1.5, 2),
+        encode_cursor(True, 2),
+        encode_cursor(2 ** 31, 2),
+    ],
+)
+def test_decode_cursor_rejects_malformed_input(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 2)
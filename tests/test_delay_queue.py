@@ -0,0 +1,52 @@
+import pytest
+import fakeredis
+import fakeredis.aioredis
+from datetime import datetime, timezone
+
+from bot.utils.delay_queue import DelayQueue
+
+
+@pytest.fixture
+async def delay_queue():
+    # Har bir test uchun alohida fake (soxta) Redis server ishlatamiz
+    redis_conn = fakeredis.aioredis.FakeRedis(server=fakeredis.FakeServer())
+    return DelayQueue(redis_conn, key="test:delay_queue")
+
+
+def ts(seconds: int) -> datetime:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc)
+
+
+async def test_pop_due_returns_only_due_items_in_order(delay_queue: DelayQueue):
+    await delay_queue.add_many([(3, ts(300)), (1, ts(100)), (2, ts(200))])
+
+    assert await delay_queue.pop_due(limit=10, now=250) == [1, 2]
+    # Olingan elementlar navbatdan o'chiriladi
+    assert await delay_queue.pop_due(limit=10, now=250) == []
+    assert await delay_queue.size() == 1
+
+
+async def test_pop_due_respects_limit(delay_queue: DelayQueue):
+    await delay_queue.add_many([(i, ts(i)) for i in range(1, 6)])
+
+    assert await delay_queue.pop_due(limit=2, now=100) == [1, 2]
+    assert await delay_queue.size() == 3
+
+
+async def test_pop_due_splits_on_time_items_from_backlog(delay_queue: DelayQueue):
+    await delay_queue.add_many([(1, ts(100)), (2, ts(200)), (3, ts(250))])
+
+    # Avval o'z vaqtidagilar, keyin backlog (chegaradagi element faqat bir marta)
+    assert await delay_queue.pop_due(limit=10, now=260, since=200) == [2, 3]
+    assert await delay_queue.pop_due(limit=10, now=260, before=200) == [1]
+
+
+async def test_remove_and_seconds_until_next(delay_queue: DelayQueue):
+    assert await delay_queue.seconds_until_next(now=0) is None
+
+    await delay_queue.add(1, ts(100))
+    await delay_queue.add(2, ts(50))
+    await delay_queue.remove(2)
+
+    assert await delay_queue.seconds_until_next(now=40) == pytest.approx(60)
+    assert await delay_queue.seconds_until_next(now=500) == 0.0
@@ -0,0 +1,87 @@
+import math
+from datetime import datetime, timezone
+
+import numpy as np
+
+from bot.utils.engagement import SnapshotSeries, compute_engagement, group_median, hour_of_week
+
+HOUR = 3600.0
+# 2024-05-06 dushanba, 00:00 UTC
+MONDAY = datetime(2024, 5, 6, tzinfo=timezone.utc).timestamp()
+
+
+def make_series(rows):
+    """rows: (post_id, channel_id, sent_at, ts, views), (post_id, ts) bo'yicha saralangan."""
+    return SnapshotSeries.from_columns({
+        "post_id": [row[0] for row in rows],
+        "channel_id": [row[1] for row in rows],
+        "sent_at": [row[2] for row in rows],
+        "ts": [row[3] for row in rows],
+        "views": [row[4] for row in rows],
+    })
+
+
+def test_hour_of_week():
+    seconds = np.array([MONDAY, MONDAY + 10 * HOUR + 59, MONDAY + 6 * 24 * HOUR + 23 * HOUR])
+    assert hour_of_week(seconds).tolist() == [0, 10, 167]
+
+
+def test_group_median_handles_even_odd_and_empty_groups():
+    groups = np.array([0, 0, 0, 2, 2])
+    values = np.array([5.0, 1.0, 3.0, 10.0, 20.0])
+    medians = group_median(groups, values, 3)
+    assert medians[0] == 3.0
+    assert math.isnan(medians[1])
+    assert medians[2] == 15.0
+
+
+def test_compute_engagement_for_several_channels_at_once():
+    sent_a, sent_b = MONDAY + 9 * HOUR, MONDAY + 18 * HOUR
+    now = MONDAY + 48 * HOUR
+    series = make_series([
+        # Kanal -1 : post 1 (09:00, dushanba)
+        (1, -1, sent_a, sent_a + 1 * HOUR, 100),
+        (1, -1, sent_a, sent_a + 2 * HOUR, 200),
+        (1, -1, sent_a, sent_a + 30 * HOUR, 400),
+        # Kanal -1 : post 2 (18:00, dushanba)
+        (2, -1, sent_b, sent_b + 1 * HOUR, 50),
+        (2, -1, sent_b, sent_b + 4 * HOUR, 100),
+        # Kanal -2 : bitta post, ko'rishlarsiz
+        (3, -2, sent_a, sent_a + 1 * HOUR, 0),
+    ])
+
+    result = compute_engagement(series, now=now)
+
+    assert set(result) == {-1, -2}
+    first = result[-1]
+    assert first.posts == 2
+    assert first.median_views == 250.0
+    # Post 1 200 ga 2 soatda, post 2 50 ga 1 soatda yetgan -> mediana 1.5 soat
+    assert first.half_life_hours == 1.5
+    # Oxirgi 24 soatda faqat post 1 ning 39-soatdagi snapshot'i: +200
+    assert first.velocity == 200 / 24
+    assert first.top_posts == [(1, 1.6), (2, 0.4)]
+    assert first.best_hour_of_week == (0, 9)
+    assert first.heatmap[0][9] == 1.6 and first.heatmap[0][18] == 0.4
+    assert first.heatmap[3][9] is None
+
+    second = result[-2]
+    assert second.half_life_hours is None
+    assert second.top_posts == []
+    assert second.best_hour_of_week is None
+
+
+def test_compute_engagement_without_data():
+    assert compute_engagement(make_series([]), now=MONDAY) == {}
+
+
+def test_velocity_counts_posts_sent_inside_the_window_from_zero():
+    sent = MONDAY + 30 * HOUR
+    series = make_series([
+        (1, -1, sent, sent + HOUR, 60),
+        (1, -1, sent, sent + 2 * HOUR, 90),
+    ])
+
+    result = compute_engagement(series, now=MONDAY + 48 * HOUR)
+
+    assert result[-1].velocity == 90 / 24
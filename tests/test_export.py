@@ -0,0 +1,75 @@
+import csv
+import io
+import pytest
+from datetime import datetime, timezone
+
+from bot.utils.export import csv_stream, parquet_stream
+
+pytestmark = pytest.mark.asyncio
+
+COLUMNS = ["post_id", "channel_id", "post_text", "sent_at", "views"]
+SENT_AT = datetime(2024, 5, 6, 9, 0, tzinfo=timezone.utc)
+
+
+async def batches_of(*batches):
+    for batch in batches:
+        yield batch
+
+
+async def test_csv_stream_emits_one_chunk_per_batch():
+    chunks = [
+        chunk async for chunk in csv_stream(
+            COLUMNS,
+            batches_of(
+                [(1, -1001, "Salom, dunyo", SENT_AT, 10)],
+                [(2, -1001, None, None, 0), (3, -1002, 'say "hi"', SENT_AT, 5)],
+            ),
+        )
+    ]
+
+    # Sarlavha + har bir partiya alohida bo'lak
+    assert len(chunks) == 3
+    rows = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+    assert rows[0] == COLUMNS
+    assert rows[1] == ["1", "-1001", "Salom, dunyo", str(SENT_AT), "10"]
+    assert rows[2] == ["2", "-1001", "", "", "0"]
+    assert rows[3][2] == 'say "hi"'
+
+
+async def test_parquet_stream_writes_row_groups():
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    chunks = [
+        chunk async for chunk in parquet_stream(
+            COLUMNS,
+            batches_of([(1, -1001, "a", SENT_AT, 10)], [(2, -1001, None, None, 0)]),
+        )
+    ]
+
+    parquet_file = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+    assert parquet_file.metadata.num_row_groups == 2
+    assert parquet_file.read().column("post_id").to_pylist() == [1, 2]
+
+
+@pytest.mark.parametrize("encode", [csv_stream, parquet_stream])
+async def test_closing_stream_closes_batches(encode):
+    if encode is parquet_stream:
+        pytest.importorskip("pyarrow")
+    released = []
+
+    async def batches():
+        try:
+            yield [(1, -1001, "a", SENT_AT, 10)]
+            yield [(2, -1001, "b", SENT_AT, 20)]
+        finally:
+            # Repozitoriyda bu yerda ulanish pool'ga qaytariladi
+            released.append(True)
+
+    stream = encode(COLUMNS, batches())
+    await stream.__anext__()
+    if encode is csv_stream:
+        await stream.__anext__()
+    # Mijoz uzilganda Starlette faqat tashqi generatorni yopadi
+    await stream.aclose()
+
+    assert released == [True]
@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import io
+import tempfile
+
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from aiogram import Bot
+
+from bot.config import Settings
+from bot.database.repositories import MediaRepository
+from bot.services.media_service import MediaService
+from bot.utils.media import build_media_group, media_type_for, validate_media_group
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def mock_bot() -> AsyncMock:
+    return AsyncMock(spec=Bot)
+
+
+@pytest.fixture
+def mock_media_repo() -> AsyncMock:
+    repo = AsyncMock(spec=MediaRepository)
+    repo.save_file.side_effect = lambda sha256, file_id, media_type, file_size: {
+        "sha256": sha256, "file_id": file_id, "media_type": media_type, "file_size": file_size
+    }
+    return repo
+
+
+@pytest.fixture
+def media_service(mock_bot, mock_media_repo) -> MediaService:
+    settings = MagicMock(spec=Settings)
+    settings.STORAGE_CHANNEL_ID = -500
+    settings.MEDIA_UPLOAD_CONCURRENCY = 2
+    settings.MEDIA_UPLOAD_CHUNK_SIZE = 4
+    settings.MEDIA_MAX_UPLOAD_BYTES = 64
+    return MediaService(bot=mock_bot, settings=settings, media_repo=mock_media_repo)
+
+
+async def test_upload_sends_new_content_and_caches_file_id(media_service, mock_bot, mock_media_repo):
+    mock_media_repo.get_file.return_value = None
+    mock_bot.send_video.return_value = SimpleNamespace(video=SimpleNamespace(file_id="video-id"))
+
+    result = await media_service.upload(b"clip", "video/mp4", "clip.mp4")
+
+    assert result == {"file_id": "video-id", "media_type": "video", "cached": False}
+    assert mock_bot.send_video.await_args.kwargs["chat_id"] == -500
+    mock_media_repo.save_file.assert_awaited_once_with(hashlib.sha256(b"clip").hexdigest(), "video-id", "video", 4)
+
+
+async def test_upload_reuses_cached_file_id(media_service, mock_bot, mock_media_repo):
+    mock_media_repo.get_file.return_value = {"file_id": "photo-id", "media_type": "photo"}
+
+    result = await media_service.upload(b"image", "image/png")
+
+    assert result == {"file_id": "photo-id", "media_type": "photo", "cached": True}
+    mock_bot.send_photo.assert_not_awaited()
+    mock_media_repo.save_file.assert_not_awaited()
+
+
+def spooled_upload(content: bytes, max_size: int = 8) -> tempfile.SpooledTemporaryFile:
+    """UploadFile.file kabi: Starlette yozib bo'lgan va max_size'dan oshsa diskka o'tgan fayl."""
+    file = tempfile.SpooledTemporaryFile(max_size=max_size)
+    file.write(content)
+    return file
+
+
+async def test_upload_file_hashes_in_place_and_streams_same_file(media_service, mock_bot, mock_media_repo, monkeypatch):
+    content = b"0123456789" * 3
+    upload = spooled_upload(content)
+    assert upload._rolled  # diskka o'tgan
+    mock_media_repo.get_file.return_value = None
+    sent_bytes = []
+    threaded_reads = []
+    to_thread = asyncio.to_thread
+
+    async def tracking_to_thread(func, *args):
+        threaded_reads.append(args)
+        return await to_thread(func, *args)
+
+    monkeypatch.setattr("bot.services.media_service.asyncio.to_thread", tracking_to_thread)
+
+    async def send_document(chat_id, document):
+        # Telegram'ga o'sha yuklangan fayldan o'qiladi (nusxa olinmaydi)
+        assert document.file is upload
+        sent_bytes.extend([chunk async for chunk in document.read(mock_bot)])
+        return SimpleNamespace(document=SimpleNamespace(file_id="doc-id"))
+
+    mock_bot.send_document.side_effect = send_document
+
+    result = await media_service.upload_file(upload, "application/pdf", "brief.pdf")
+
+    assert result == {"file_id": "doc-id", "media_type": "document", "cached": False}
+    assert b"".join(sent_bytes) == content
+    # Diskdagi fayldan o'qishlar event loop'da emas, thread'da bajariladi
+    assert threaded_reads and all(size in (4, 64 * 1024) for (size,) in threaded_reads)
+    mock_media_repo.get_file.assert_awaited_once_with(hashlib.sha256(content).hexdigest())
+    mock_media_repo.save_file.assert_awaited_once_with(hashlib.sha256(content).hexdigest(), "doc-id", "document", 30)
+
+
+async def test_upload_file_rejects_oversized_files(media_service, mock_bot, mock_media_repo):
+    with pytest.raises(ValueError):
+        await media_service.upload_file(spooled_upload(b"x" * 65), "image/png")
+
+    mock_media_repo.get_file.assert_not_awaited()
+    mock_bot.send_photo.assert_not_awaited()
+
+
+async def test_upload_file_rejects_unsupported_types_before_reading(media_service, mock_bot, mock_media_repo):
+    upload = MagicMock(spec=io.BytesIO)
+
+    with pytest.raises(ValueError, match="Unsupported file type"):
+        await media_service.upload_file(upload, "application/x-msdownload")
+
+    upload.read.assert_not_called()
+    mock_media_repo.get_file.assert_not_awaited()
+    mock_bot.send_document.assert_not_awaited()
+
+
+async def test_media_helpers():
+    assert media_type_for("image/gif") == "animation"
+    assert media_type_for("application/pdf") == "document"
+    assert media_type_for("text/csv; charset=utf-8") == "document"
+    assert media_type_for("application/octet-stream") is None
+    assert media_type_for(None) is None
+
+    validate_media_group(["photo", "video", "photo"])
+    with pytest.raises(ValueError):
+        validate_media_group(["photo"])
+    with pytest.raises(ValueError):
+        validate_media_group(["photo", "document"])
+
+    group = build_media_group(
+        [{"media_id": "a", "media_type": "photo"}, {"media_id": "b", "media_type": "video"}], caption="hi"
+    )
+    assert [(item.type, item.media, item.caption) for item in group] == [("photo", "a", "hi"), ("video", "b", None)]
@@ -0,0 +1,41 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+
+
+@pytest.fixture
+def media_service():
+    service = AsyncMock()
+    service.upload_file.return_value = {"file_id": "photo-id", "media_type": "photo", "cached": False}
+    return service
+
+
+@pytest.fixture
+def client(media_service):
+    api.app.dependency_overrides[api.get_media_service] = lambda: media_service
+    yield TestClient(api.app)
+    api.app.dependency_overrides.clear()
+
+
+def test_upload_passes_spooled_file(client, media_service):
+    response = client.post("/api/v1/media/upload", files={"file": ("a.png", b"\x89PNG", "image/png")})
+
+    assert response.status_code == 200
+    assert response.json()["file_id"] == "photo-id"
+    file, content_type, filename = media_service.upload_file.await_args.args
+    assert (content_type, filename) == ("image/png", "a.png")
+
+
+def test_oversized_upload_is_rejected_before_reading_body(client, media_service):
+    too_big = str(api.settings.MEDIA_MAX_UPLOAD_BYTES + 1024 * 1024)
+    response = client.post(
+        "/api/v1/media/upload",
+        content=b"--x--",
+        headers={"Content-Type": "multipart/form-data; boundary=x", "Content-Length": too_big},
+    )
+
+    assert response.status_code == 413
+    media_service.upload_file.assert_not_awaited()
@@ -0,0 +1,20 @@
+from datetime import date
+
+from bot.utils.partitions import add_months, monthly_partition_ddl
+
+
+def test_add_months_crosses_year_boundary():
+    assert add_months(date(2024, 11, 1), 1) == date(2024, 12, 1)
+    assert add_months(date(2024, 12, 1), 1) == date(2025, 1, 1)
+    assert add_months(date(2024, 1, 1), 25) == date(2026, 2, 1)
+
+
+def test_monthly_partition_ddl():
+    statements = monthly_partition_ddl("post_view_snapshots", date(2024, 12, 17), 2)
+
+    assert statements == [
+        "CREATE TABLE IF NOT EXISTS post_view_snapshots_y2024m12 PARTITION OF post_view_snapshots "
+        "FOR VALUES FROM ('2024-12-01 00:00:00+00') TO ('2025-01-01 00:00:00+00');",
+        "CREATE TABLE IF NOT EXISTS post_view_snapshots_y2025m01 PARTITION OF post_view_snapshots "
+        "FOR VALUES FROM ('2025-01-01 00:00:00+00') TO ('2025-02-01 00:00:00+00');",
+    ]
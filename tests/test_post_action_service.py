@@ -0,0 +1,130 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramNetworkError
+from aiogram.methods import DeleteMessages
+
+from bot.config import Settings
+from bot.database.repositories import PostActionRepository
+from bot.services.post_action_service import PostActionService
+from bot.utils.delay_queue import PostActionQueue
+from bot.utils.rate_limiter import RateLimiter
+from bot.utils.retry_policy import RetryPolicy
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def mock_settings() -> Settings:
+    settings = MagicMock(spec=Settings)
+    settings.DISPATCH_CONCURRENCY = 5
+    settings.DISPATCH_BATCH_SIZE = 100
+    settings.DISPATCH_LEASE_SECONDS = 60
+    settings.DELAY_QUEUE_POLL_INTERVAL = 0.01
+    return settings
+
+
+@pytest.fixture
+def mock_bot() -> AsyncMock:
+    return AsyncMock(spec=Bot)
+
+
+@pytest.fixture
+def mock_action_repo() -> AsyncMock:
+    return AsyncMock(spec=PostActionRepository)
+
+
+@pytest.fixture
+def mock_rate_limiter() -> AsyncMock:
+    return AsyncMock(spec=RateLimiter)
+
+
+@pytest.fixture
+def action_service(mock_bot, mock_settings, mock_action_repo, mock_rate_limiter) -> PostActionService:
+    return PostActionService(
+        bot=mock_bot,
+        settings=mock_settings,
+        action_repo=mock_action_repo,
+        action_queue=AsyncMock(spec=PostActionQueue),
+        rate_limiter=mock_rate_limiter,
+        retry_policy=RetryPolicy(max_attempts=3, base_delay=1.0, rng=lambda low, high: high),
+    )
+
+
+def make_action(action_id: int, action: str = "delete", channel_id: int = -100, message_id=None, **extra) -> dict:
+    return {
+        "id": action_id,
+        "action": action,
+        "channel_id": channel_id,
+        "message_id": action_id * 10 if message_id is None else message_id,
+        **extra,
+    }
+
+
+async def test_deletes_are_batched_per_chat(action_service, mock_bot, mock_action_repo, mock_rate_limiter):
+    actions = [make_action(1), make_action(2), make_action(3, channel_id=-200)]
+
+    assert await action_service.execute_actions(actions) == 3
+
+    assert mock_bot.delete_messages.await_count == 2
+    mock_bot.delete_messages.assert_any_await(chat_id=-100, message_ids=[10, 20])
+    # Har bir Telegram so'rovi uchun bitta token
+    assert mock_rate_limiter.acquire.await_count == 2
+    mock_action_repo.complete_actions.assert_awaited_once()
+    assert sorted(mock_action_repo.complete_actions.await_args.args[0]) == [1, 2, 3]
+
+
+async def test_edit_uses_caption_for_media_posts(action_service, mock_bot, mock_action_repo):
+    actions = [
+        make_action(1, "edit", payload={"text": "new"}, has_media=False),
+        make_action(2, "edit", payload={"text": "caption"}, has_media=True),
+    ]
+
+    assert await action_service.execute_actions(actions) == 2
+
+    mock_bot.edit_message_text.assert_awaited_once_with(chat_id=-100, message_id=10, text="new", reply_markup=None)
+    mock_bot.edit_message_caption.assert_awaited_once_with(
+        chat_id=-100, message_id=20, caption="caption", reply_markup=None
+    )
+
+
+async def test_edit_keeps_inline_buttons(action_service, mock_bot):
+    buttons = [{"text": "Site", "url": "https://example.com"}, {"text": "Chat", "url": "https://t.me/chat"}]
+    action = make_action(1, "edit", payload={"text": "new"}, has_media=False, inline_buttons=buttons)
+
+    assert await action_service.execute_actions([action]) == 1
+
+    markup = mock_bot.edit_message_text.await_args.kwargs["reply_markup"]
+    assert [[button.text for button in row] for row in markup.inline_keyboard] == [["Site"], ["Chat"]]
+    assert markup.inline_keyboard[0][0].url == "https://example.com"
+
+
+async def test_failed_batch_is_retried_and_unsent_posts_deferred(action_service, mock_bot, mock_action_repo):
+    mock_bot.delete_messages.side_effect = TelegramNetworkError(
+        method=DeleteMessages(chat_id=-100, message_ids=[10]), message="timeout"
+    )
+    unsent = make_action(2)
+    unsent["message_id"] = None
+
+    assert await action_service.execute_actions([make_action(1), unsent]) == 0
+
+    mock_action_repo.schedule_retry.assert_awaited_once()
+    assert mock_action_repo.schedule_retry.await_args.args[0] == 1
+    # Post hali yuborilmagan: amal xato emas, keyinga qoldiriladi
+    mock_action_repo.defer_action.assert_awaited_once_with(2, 1.0)
+    mock_action_repo.fail_action.assert_not_awaited()
+    mock_action_repo.complete_actions.assert_awaited_once_with([])
+
+
+async def test_unsent_action_fails_when_post_is_no_longer_scheduled(action_service, mock_bot, mock_action_repo):
+    mock_action_repo.defer_action.return_value = False
+    unsent = make_action(1)
+    unsent["message_id"] = None
+
+    assert await action_service.execute_actions([unsent]) == 0
+
+    mock_action_repo.fail_action.assert_awaited_once()
+    assert mock_action_repo.fail_action.await_args.args[0] == 1
+    mock_bot.delete_messages.assert_not_awaited()
+
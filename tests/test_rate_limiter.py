@@ -0,0 +1,179 @@
+import fakeredis
+import fakeredis.aioredis
+import pytest
+
+from bot.utils.rate_limiter import AIMDRateController, RedisTokenBucket, TokenBucket, RateLimiter
+
+
+class FakeClock:
+    """Testlar uchun qo'lda boshqariladigan soat."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_bucket_allows_burst_then_queues():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, capacity=2, clock=clock)
+
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    # Uchinchi va to'rtinchi tokenlar navbatga qo'yiladi
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_bucket_refills_over_time():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1.0, capacity=1, clock=clock)
+
+    assert bucket.reserve() == 0.0
+    clock.now = 1.0
+    assert bucket.reserve() == 0.0
+    assert not bucket.is_idle()
+    clock.now = 10.0
+    assert bucket.is_idle()
+
+
+def test_bucket_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0, capacity=1)
+
+
+async def test_rate_limiter_keeps_chats_independent(monkeypatch):
+    clock = FakeClock()
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr("bot.utils.rate_limiter.asyncio.sleep", fake_sleep)
+    limiter = RateLimiter(global_rate=30, chat_rate=1.0, chat_burst=1, clock=clock)
+
+    await limiter.acquire(1)
+    await limiter.acquire(2)
+    assert sleeps == []
+
+    # Xuddi shu kanalga ikkinchi xabar kutishi kerak
+    await limiter.acquire(1)
+    assert sleeps == [pytest.approx(1.0)]
+
+
+async def test_paused_chat_waits_for_pause_to_end(monkeypatch):
+    clock = FakeClock()
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+        clock.now += delay
+
+    monkeypatch.setattr("bot.utils.rate_limiter.asyncio.sleep", fake_sleep)
+    limiter = RateLimiter(global_rate=30, chat_rate=1.0, chat_burst=1, clock=clock)
+
+    await limiter.pause(1, 10)
+    assert await limiter.paused_for(1) == pytest.approx(10)
+    assert await limiter.paused_for(2) == 0.0
+
+    await limiter.acquire(1)
+    assert sleeps[0] == pytest.approx(10)
+    assert await limiter.paused_for(1) == 0.0
+
+
+async def test_aimd_controller_backs_off_and_recovers(monkeypatch):
+    clock = FakeClock()
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+        clock.now += delay
+
+    monkeypatch.setattr("bot.utils.rate_limiter.asyncio.sleep", fake_sleep)
+    controller = AIMDRateController(initial_rate=4.0, min_rate=1.0, max_rate=5.0, clock=clock)
+
+    await controller.on_success()
+    assert controller.rate == pytest.approx(4.25)
+
+    await controller.on_throttle(retry_after=3)
+    assert controller.rate == pytest.approx(2.125)
+    # RetryAfter muddati tugamaguncha hech kim so'rov yubormaydi
+    await controller.acquire()
+    assert sleeps == [pytest.approx(3)]
+
+    for _ in range(5):
+        await controller.on_throttle()
+    assert controller.rate == 1.0
+    for _ in range(100):
+        await controller.on_success()
+    assert controller.rate == 5.0
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+def make_redis(server):
+    return fakeredis.aioredis.FakeRedis(server=server)
+
+
+async def test_redis_bucket_queues_like_local_bucket(redis_server):
+    clock = FakeClock()
+    bucket = RedisTokenBucket(make_redis(redis_server), "test:bucket", rate=2.0, capacity=2, clock=clock)
+
+    assert await bucket.reserve() == 0.0
+    assert await bucket.reserve() == 0.0
+    assert await bucket.reserve() == pytest.approx(0.5)
+    clock.now = 10.0
+    assert await bucket.reserve() == 0.0
+
+
+async def test_workers_share_the_global_bucket(monkeypatch, redis_server):
+    """Ikki worker (ikki alohida limiter) birgalikda umumiy limitdan oshmaydi."""
+    clock = FakeClock()
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr("bot.utils.rate_limiter.asyncio.sleep", fake_sleep)
+    workers = [
+        RateLimiter(global_rate=2, chat_rate=100, chat_burst=100, redis_conn=make_redis(redis_server), redis_clock=clock)
+        for _ in range(2)
+    ]
+
+    await workers[0].acquire(1)
+    await workers[1].acquire(2)
+    assert sleeps == []
+    # Uchinchi xabar qaysi worker'dan bo'lmasin global bucket'da kutadi
+    await workers[1].acquire(3)
+    assert sleeps == [pytest.approx(0.5)]
+
+
+async def test_chat_pause_is_shared_between_workers(redis_server):
+    first = RateLimiter(redis_conn=make_redis(redis_server))
+    second = RateLimiter(redis_conn=make_redis(redis_server))
+
+    await first.pause(1, 10)
+    await first.pause(1, 2)  # qisqaroq pauza mavjudini qisqartirmaydi
+
+    assert await second.paused_for(1) == pytest.approx(10, abs=0.1)
+    assert await second.paused_for(2) == 0.0
+
+
+async def test_aimd_rate_is_shared_between_workers(redis_server):
+    clock = FakeClock()
+    first, second = (
+        AIMDRateController(initial_rate=4.0, min_rate=1.0, max_rate=5.0,
+                           redis_conn=make_redis(redis_server), redis_clock=clock)
+        for _ in range(2)
+    )
+
+    await first.on_success()
+    assert first.rate == pytest.approx(4.25)
+    await second.on_throttle(retry_after=3)
+    # Ikkinchi worker birinchisi oshirgan tezlikdan boshlab kamaytiradi
+    assert second.rate == pytest.approx(2.125)
+    assert await first._paused_for() == pytest.approx(3, abs=0.1)
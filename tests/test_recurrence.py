@@ -0,0 +1,51 @@
+import pytest
+from datetime import datetime, timezone
+
+from bot.utils.recurrence import CronSchedule
+
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_daily_rule():
+    schedule = CronSchedule("30 9 * * *")
+    assert schedule.next_after(utc(2024, 5, 1, 8, 0)) == utc(2024, 5, 1, 9, 30)
+    # Aynan shu vaqt o'tib ketgan bo'lsa, keyingi kunga o'tadi
+    assert schedule.next_after(utc(2024, 5, 1, 9, 30)) == utc(2024, 5, 2, 9, 30)
+
+
+def test_weekly_rule_and_year_rollover():
+    # Har dushanba 10:00
+    schedule = CronSchedule("0 10 * * 1")
+    assert schedule.next_after(utc(2024, 12, 31, 12, 0)) == utc(2025, 1, 6, 10, 0)
+
+
+def test_steps_lists_and_ranges():
+    schedule = CronSchedule("*/15 8-9 * * *")
+    assert schedule.next_after(utc(2024, 5, 1, 8, 50)) == utc(2024, 5, 1, 9, 0)
+    assert schedule.next_after(utc(2024, 5, 1, 9, 45)) == utc(2024, 5, 2, 8, 0)
+
+    schedule = CronSchedule("0 12 1,15 * *")
+    assert schedule.next_after(utc(2024, 5, 2, 0, 0)) == utc(2024, 5, 15, 12, 0)
+
+
+def test_day_of_month_or_day_of_week():
+    # Oyning 1-kuni YOKI har yakshanba (7 ham yakshanba)
+    schedule = CronSchedule("0 0 1 * 7")
+    assert schedule.next_after(utc(2024, 5, 2, 0, 0)) == utc(2024, 5, 5, 0, 0)
+
+
+def test_aliases_and_naive_datetimes():
+    assert CronSchedule("@daily").next_after(datetime(2024, 5, 1, 23, 59)) == utc(2024, 5, 2, 0, 0)
+
+
+@pytest.mark.parametrize("expression", ["* * *", "60 * * * *", "* * * * 8", "*/0 * * * *", "a * * * *"])
+def test_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+
+def test_rule_that_never_fires():
+    with pytest.raises(ValueError):
+        CronSchedule("0 0 31 2 *").next_after(utc(2024, 1, 1))
@@ -0,0 +1,43 @@
+import pytest
+from aiogram.exceptions import TelegramBadRequest, TelegramNetworkError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from bot.utils.retry_policy import RetryPolicy, RETRY_AFTER, TRANSIENT, PERMANENT
+
+METHOD = SendMessage(chat_id=-100, text="x")
+
+
+@pytest.fixture
+def policy() -> RetryPolicy:
+    # Jitter o'rniga har doim yuqori chegarani qaytaramiz
+    return RetryPolicy(max_attempts=3, base_delay=2.0, max_delay=10.0, rng=lambda low, high: high)
+
+
+def test_classify():
+    assert RetryPolicy.classify(TelegramRetryAfter(method=METHOD, message="flood", retry_after=7)) == RETRY_AFTER
+    assert RetryPolicy.classify(TelegramNetworkError(method=METHOD, message="timeout")) == TRANSIENT
+    assert RetryPolicy.classify(TelegramBadRequest(method=METHOD, message="chat not found")) == PERMANENT
+
+
+def test_flood_wait_does_not_count_as_attempt():
+    assert not RetryPolicy.counts_as_attempt(TelegramRetryAfter(method=METHOD, message="flood", retry_after=7))
+    assert RetryPolicy.counts_as_attempt(TelegramNetworkError(method=METHOD, message="timeout"))
+
+
+def test_backoff_grows_and_is_capped(policy: RetryPolicy):
+    assert policy.next_delay(1) == 2.0
+    assert policy.next_delay(2) == 4.0
+    assert policy.next_delay(3) == 8.0
+    assert policy.next_delay(10) == 10.0
+
+
+def test_retry_after_is_a_floor(policy: RetryPolicy):
+    assert policy.next_delay(1, retry_after=30) == 32.0
+    assert policy.next_delay(1, retry_after=1) == 2.0
+
+
+def test_should_retry(policy: RetryPolicy):
+    network_error = TelegramNetworkError(method=METHOD, message="timeout")
+    assert policy.should_retry(1, network_error)
+    assert not policy.should_retry(3, network_error)
+    assert not policy.should_retry(1, TelegramBadRequest(method=METHOD, message="bad"))
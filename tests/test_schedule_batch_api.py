@@ -0,0 +1,109 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+
+URL = "/api/v1/schedule-posts:batch"
+
+
+def make_post(channel_id: int = -100, **extra) -> dict:
+    return {"channel_id": channel_id, "scheduled_at": "2030-01-01T10:00:00Z", "text": "hello", **extra}
+
+
+@pytest.fixture
+def scheduler_repo():
+    repo = AsyncMock()
+    repo.create_scheduled_posts.side_effect = lambda user_id, posts: [
+        None if post["channel_id"] == -999 else 100 + index for index, post in enumerate(posts)
+    ]
+    return repo
+
+
+@pytest.fixture
+def subscription_service():
+    service = AsyncMock()
+    service.get_remaining_post_quota.return_value = None
+    return service
+
+
+@pytest.fixture
+def client(scheduler_repo, subscription_service):
+    api.app.dependency_overrides[api.get_validated_user_data] = lambda: {"id": 42}
+    api.app.dependency_overrides[api.get_scheduler_repo] = lambda: scheduler_repo
+    api.app.dependency_overrides[api.get_subscription_service] = lambda: subscription_service
+    yield TestClient(api.app)
+    api.app.dependency_overrides.clear()
+
+
+def test_batch_inserts_valid_posts_once(client, scheduler_repo, subscription_service):
+    response = client.post(URL, json={"posts": [make_post(), make_post(text="second")]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (2, 0)
+    assert [result["post"]["id"] for result in body["results"]] == [100, 101]
+    scheduler_repo.create_scheduled_posts.assert_awaited_once()
+    user_id, posts = scheduler_repo.create_scheduled_posts.await_args.args
+    assert user_id == 42
+    assert [post["post_text"] for post in posts] == ["hello", "second"]
+    subscription_service.get_remaining_post_quota.assert_awaited_once_with(42)
+
+
+def test_batch_reports_failures_per_item(client, scheduler_repo):
+    posts = [
+        make_post(),
+        make_post(media_type="sticker"),  # noto'g'ri media turi
+        {"text": "no channel"},
+        make_post(channel_id=-999),  # boshqa foydalanuvchining kanali
+    ]
+    response = client.post(URL, json={"posts": posts})
+
+    body = response.json()
+    assert (body["created"], body["failed"]) == (1, 3)
+    assert [result["ok"] for result in body["results"]] == [True, False, False, False]
+    assert "media_type" in body["results"][1]["error"]
+    assert "channel_id" in body["results"][2]["error"]
+    assert body["results"][3]["error"] == "Channel not found."
+    # Faqat tekshiruvdan o'tganlar bazaga yuboriladi
+    _, inserted = scheduler_repo.create_scheduled_posts.await_args.args
+    assert len(inserted) == 2
+
+
+def test_media_group_cannot_be_combined_with_buttons_or_media_id(client, scheduler_repo):
+    album = [{"media_id": "a", "media_type": "photo"}, {"media_id": "b", "media_type": "photo"}]
+    posts = [
+        make_post(media_group=album, buttons=[{"text": "Site", "url": "https://example.com"}]),
+        make_post(media_group=album, media_id="c", media_type="photo"),
+    ]
+    response = client.post(URL, json={"posts": posts})
+
+    body = response.json()
+    assert (body["created"], body["failed"]) == (0, 2)
+    assert "buttons" in body["results"][0]["error"]
+    assert "media_id" in body["results"][1]["error"]
+    scheduler_repo.create_scheduled_posts.assert_not_awaited()
+
+
+def test_batch_quota_is_applied_in_request_order(client, scheduler_repo, subscription_service):
+    subscription_service.get_remaining_post_quota.return_value = 2
+    response = client.post(URL, json={"posts": [make_post(text=str(i)) for i in range(3)]})
+
+    body = response.json()
+    assert [result["ok"] for result in body["results"]] == [True, True, False]
+    assert body["results"][2]["error"] == "Monthly post limit reached."
+    _, inserted = scheduler_repo.create_scheduled_posts.await_args.args
+    assert [post["post_text"] for post in inserted] == ["0", "1"]
+
+
+def test_batch_without_quota_skips_insert(client, scheduler_repo, subscription_service):
+    subscription_service.get_remaining_post_quota.return_value = 0
+    response = client.post(URL, json={"posts": [make_post()]})
+
+    assert response.json()["failed"] == 1
+    scheduler_repo.create_scheduled_posts.assert_not_awaited()
+
+
+def test_empty_batch_is_rejected(client):
+    assert client.post(URL, json={"posts": []}).status_code == 422
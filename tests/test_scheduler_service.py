@@ -0,0 +1,317 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramNetworkError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from bot.config import Settings
+from bot.database.repositories import SchedulerRepository, AnalyticsRepository
+from bot.services.scheduler_service import SchedulerService
+from bot.services.send_result_buffer import SendResultBuffer
+from bot.utils.delay_queue import DelayQueue
+from bot.utils.rate_limiter import RateLimiter
+from bot.utils.retry_policy import RetryPolicy
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def mock_settings() -> Settings:
+    settings = MagicMock(spec=Settings)
+    settings.DISPATCH_CONCURRENCY = 5
+    settings.DISPATCH_BATCH_SIZE = 100
+    settings.DISPATCH_LEASE_SECONDS = 60
+    settings.DELAY_QUEUE_POLL_INTERVAL = 0.01
+    settings.DISPATCH_MAX_LATENESS_SECONDS = 3600
+    settings.DISPATCH_ON_TIME_WINDOW_SECONDS = 120
+    settings.DISPATCH_BACKLOG_BUDGET = 3
+    return settings
+
+@pytest.fixture
+def mock_bot() -> AsyncMock:
+    return AsyncMock(spec=Bot)
+
+@pytest.fixture
+def mock_scheduler_repo() -> AsyncMock:
+    return AsyncMock(spec=SchedulerRepository)
+
+@pytest.fixture
+def mock_analytics_repo() -> AsyncMock:
+    return AsyncMock(spec=AnalyticsRepository)
+
+@pytest.fixture
+def mock_rate_limiter() -> AsyncMock:
+    return AsyncMock(spec=RateLimiter)
+
+
+@pytest.fixture
+def mock_delay_queue() -> AsyncMock:
+    return AsyncMock(spec=DelayQueue)
+
+
+@pytest.fixture
+def mock_result_buffer() -> AsyncMock:
+    return AsyncMock(spec=SendResultBuffer)
+
+
+@pytest.fixture
+def retry_policy() -> RetryPolicy:
+    return RetryPolicy(max_attempts=3, base_delay=1.0, rng=lambda low, high: high)
+
+
+@pytest.fixture
+def scheduler_service(
+    mock_bot, mock_settings, mock_scheduler_repo, mock_analytics_repo, mock_rate_limiter, mock_delay_queue, retry_policy,
+    mock_result_buffer,
+) -> SchedulerService:
+    return SchedulerService(
+        bot=mock_bot,
+        settings=mock_settings,
+        scheduler_repo=mock_scheduler_repo,
+        analytics_repo=mock_analytics_repo,
+        rate_limiter=mock_rate_limiter,
+        delay_queue=mock_delay_queue,
+        retry_policy=retry_policy,
+        result_buffer=mock_result_buffer,
+    )
+
+
+def make_post(post_id: int, channel_id: int = -100, late_by: float = 0) -> dict:
+    return {
+        "id": post_id,
+        "channel_id": channel_id,
+        "post_text": f"post {post_id}",
+        "media_id": None,
+        "next_fire_at": datetime.now(timezone.utc) - timedelta(seconds=late_by),
+    }
+
+
+async def test_send_due_messages_sends_every_post(
+    scheduler_service, mock_bot, mock_scheduler_repo, mock_rate_limiter, mock_result_buffer
+):
+    mock_scheduler_repo.claim_due_posts.side_effect = [[make_post(i, channel_id=-i) for i in range(1, 11)], []]
+    mock_bot.send_message.side_effect = lambda chat_id, **kwargs: SimpleNamespace(
+        chat=SimpleNamespace(id=chat_id), message_id=1
+    )
+
+    sent = await scheduler_service.send_due_messages()
+
+    assert sent == 10
+    assert mock_rate_limiter.acquire.await_count == 10
+    mock_result_buffer.add.assert_any_await(scheduled_post_id=1, channel_id=-1, message_id=1, next_fire_at=None)
+    assert mock_result_buffer.add.await_count == 10
+    # Partiya oxirida natijalar bazaga yoziladi
+    mock_result_buffer.flush.assert_awaited()
+
+
+async def test_send_due_messages_counts_failures(scheduler_service, mock_bot, mock_scheduler_repo):
+    mock_scheduler_repo.claim_due_posts.side_effect = [[make_post(1), make_post(2)], []]
+    mock_bot.send_message.side_effect = [
+        SimpleNamespace(chat=SimpleNamespace(id=-100), message_id=1),
+        TelegramAPIError(method=SendMessage(chat_id=-100, text="x"), message="boom"),
+    ]
+
+    sent = await scheduler_service.send_due_messages()
+
+    assert sent == 1
+    # Doimiy xatolik: post darhol dead-letter'ga tushadi
+    mock_scheduler_repo.move_to_dead_letter.assert_awaited_once_with(
+        2, "Telegram server says - boom", lease_owner=scheduler_service.worker_id
+    )
+
+
+async def test_dispatch_renews_leases_while_posts_wait(
+    scheduler_service, mock_settings, mock_bot, mock_scheduler_repo, mock_rate_limiter
+):
+    """Chat bucket'ida lease muddatidan uzoq kutgan postlarning lease'i uzaytiriladi."""
+    mock_settings.DISPATCH_LEASE_SECONDS = 0.03
+
+    async def slow_acquire(*args, **kwargs):
+        await asyncio.sleep(0.05)
+
+    mock_rate_limiter.acquire.side_effect = slow_acquire
+    mock_bot.send_message.return_value = SimpleNamespace(chat=SimpleNamespace(id=-100), message_id=1)
+
+    assert await scheduler_service.dispatch_posts([make_post(1), make_post(2)]) == 2
+
+    mock_scheduler_repo.renew_leases.assert_awaited_with(scheduler_service.worker_id, [1, 2], 0.03)
+
+
+async def test_dispatch_retries_failed_result_flush(scheduler_service, mock_bot, mock_result_buffer):
+    """Natijalarni yozish vaqtincha ishlamasa, post qayta yuborilmaydi - flush qayta urinadi."""
+    scheduler_service.retry_policy = RetryPolicy(max_attempts=3, base_delay=0.001, rng=lambda low, high: high)
+    mock_bot.send_message.return_value = SimpleNamespace(chat=SimpleNamespace(id=-100), message_id=1)
+    mock_result_buffer.flush.side_effect = [ConnectionError("db down"), ConnectionError("db down"), 1]
+
+    assert await scheduler_service.dispatch_posts([make_post(1)]) == 1
+
+    assert mock_result_buffer.flush.await_count == 3
+    mock_bot.send_message.assert_awaited_once()
+
+
+async def test_send_due_messages_without_posts(scheduler_service, mock_scheduler_repo, mock_bot):
+    mock_scheduler_repo.claim_due_posts.return_value = []
+
+    assert await scheduler_service.send_due_messages() == 0
+    mock_bot.send_message.assert_not_awaited()
+
+
+async def test_send_due_messages_claims_until_drained(scheduler_service, mock_settings, mock_bot, mock_scheduler_repo):
+    mock_settings.DISPATCH_BATCH_SIZE = 2
+    mock_scheduler_repo.claim_due_posts.side_effect = [
+        [make_post(1), make_post(2)],
+        [make_post(3)],
+        [],
+    ]
+    mock_bot.send_message.side_effect = lambda chat_id, **kwargs: SimpleNamespace(
+        chat=SimpleNamespace(id=chat_id), message_id=1
+    )
+
+    assert await scheduler_service.send_due_messages() == 3
+    # Ikkinchi partiya to'liq bo'lmagani uchun keyingi so'rov backlog uchun bo'ladi
+    assert mock_scheduler_repo.claim_due_posts.await_count == 3
+    on_time_call = mock_scheduler_repo.claim_due_posts.await_args_list[1].kwargs
+    assert on_time_call["limit"] == 2 and on_time_call["due_since"] is not None
+    backlog_call = mock_scheduler_repo.claim_due_posts.await_args_list[2].kwargs
+    assert backlog_call["due_before"] == on_time_call["due_since"]
+    assert backlog_call["after"] is None
+
+
+async def test_backlog_is_bounded_and_paged_oldest_first(
+    scheduler_service, mock_settings, mock_bot, mock_scheduler_repo, mock_rate_limiter
+):
+    mock_settings.DISPATCH_BATCH_SIZE = 2
+    first_page = [make_post(1, late_by=600), make_post(2, late_by=500)]
+    mock_scheduler_repo.claim_due_posts.side_effect = [[], first_page, [make_post(3, late_by=400)]]
+    mock_bot.send_message.side_effect = lambda chat_id, **kwargs: SimpleNamespace(
+        chat=SimpleNamespace(id=chat_id), message_id=1
+    )
+
+    assert await scheduler_service.send_due_messages() == 3
+
+    # Budjet (3) tugagach backlog'dan boshqa post olinmaydi
+    assert mock_scheduler_repo.claim_due_posts.await_count == 3
+    last_call = mock_scheduler_repo.claim_due_posts.await_args.kwargs
+    assert last_call["limit"] == 1
+    assert last_call["after"] == (first_page[1]["next_fire_at"], 2)
+    mock_rate_limiter.acquire.assert_any_await(-100, backlog=True)
+
+
+async def test_posts_past_max_lateness_are_skipped(scheduler_service, mock_bot, mock_scheduler_repo):
+    recurring = make_post(2, late_by=7200)
+    recurring["recurrence_rule"] = "0 9 * * *"
+    mock_bot.send_message.return_value = SimpleNamespace(chat=SimpleNamespace(id=-100), message_id=1)
+
+    sent = await scheduler_service.dispatch_posts([make_post(1, late_by=7200), recurring, make_post(3)])
+
+    assert sent == 1
+    mock_bot.send_message.assert_awaited_once()
+    (skipped,) = mock_scheduler_repo.skip_late_posts.await_args.args
+    assert skipped[0] == (1, None)
+    assert skipped[1][0] == 2 and skipped[1][1] > datetime.now(timezone.utc)
+
+
+async def test_delay_queue_consumer_dispatches_popped_posts(
+    scheduler_service, mock_bot, mock_scheduler_repo, mock_delay_queue
+):
+    stop_event = asyncio.Event()
+    mock_delay_queue.pop_due.side_effect = [[1, 2], [], [], []]
+    mock_delay_queue.seconds_until_next.return_value = None
+    mock_scheduler_repo.claim_posts_by_ids.return_value = [make_post(1), make_post(2, channel_id=-200)]
+
+    def send_message(chat_id, **kwargs):
+        stop_event.set()
+        return SimpleNamespace(chat=SimpleNamespace(id=chat_id), message_id=1)
+
+    mock_bot.send_message.side_effect = send_message
+
+    await asyncio.wait_for(scheduler_service.run_delay_queue_consumer(stop_event), timeout=1)
+
+    mock_scheduler_repo.claim_posts_by_ids.assert_awaited_once_with(
+        worker_id=scheduler_service.worker_id, post_ids=[1, 2], lease_seconds=60
+    )
+    assert mock_bot.send_message.await_count == 2
+
+
+async def test_retry_after_pauses_chat_and_reschedules(scheduler_service, mock_bot, mock_scheduler_repo, mock_rate_limiter):
+    mock_bot.send_message.side_effect = TelegramRetryAfter(
+        method=SendMessage(chat_id=-100, text="x"), message="flood", retry_after=30
+    )
+
+    assert await scheduler_service.send_post_to_channel(make_post(1)) is False
+
+    mock_rate_limiter.pause.assert_called_once_with(-100, 30)
+    mock_scheduler_repo.schedule_retry.assert_awaited_once()
+    post_id, delay, _ = mock_scheduler_repo.schedule_retry.await_args.args
+    assert post_id == 1 and delay == 31.0
+    mock_scheduler_repo.move_to_dead_letter.assert_not_awaited()
+
+
+async def test_exhausted_retries_go_to_dead_letter(scheduler_service, mock_bot, mock_scheduler_repo):
+    mock_bot.send_message.side_effect = TelegramNetworkError(
+        method=SendMessage(chat_id=-100, text="x"), message="timeout"
+    )
+    post = make_post(1)
+    post["attempts"] = 2
+
+    await scheduler_service.send_post_to_channel(post)
+
+    mock_scheduler_repo.schedule_retry.assert_not_awaited()
+    mock_scheduler_repo.move_to_dead_letter.assert_awaited_once()
+
+
+async def test_retry_after_does_not_use_up_attempts(scheduler_service, mock_bot, mock_scheduler_repo):
+    mock_bot.send_message.side_effect = TelegramRetryAfter(
+        method=SendMessage(chat_id=-100, text="x"), message="flood", retry_after=5
+    )
+    post = make_post(1)
+    post["attempts"] = 2
+
+    await scheduler_service.send_post_to_channel(post)
+
+    # Oxirgi urinishda ham flood-wait postni dead-letter'ga o'tkazmaydi
+    assert mock_scheduler_repo.schedule_retry.await_args.kwargs["count_attempt"] is False
+    mock_scheduler_repo.move_to_dead_letter.assert_not_awaited()
+
+
+async def test_recurring_post_is_rescheduled_after_send(scheduler_service, mock_bot, mock_result_buffer):
+    post = make_post(1)
+    post["recurrence_rule"] = "0 9 * * *"
+    post["next_fire_at"] = datetime.now(timezone.utc) - timedelta(minutes=1)
+    mock_bot.send_message.return_value = SimpleNamespace(chat=SimpleNamespace(id=-100), message_id=5)
+
+    assert await scheduler_service.send_post_to_channel(post) is True
+
+    next_fire_at = mock_result_buffer.add.await_args.kwargs["next_fire_at"]
+    assert next_fire_at > datetime.now(timezone.utc)
+    assert (next_fire_at.hour, next_fire_at.minute) == (9, 0)
+
+
+async def test_media_post_uses_method_for_its_type(scheduler_service, mock_bot, mock_result_buffer):
+    post = make_post(1)
+    post.update(media_id="video-id", media_type="video")
+    mock_bot.send_video.return_value = SimpleNamespace(chat=SimpleNamespace(id=-100), message_id=7)
+
+    assert await scheduler_service.send_post_to_channel(post) is True
+
+    assert mock_bot.send_video.await_args.kwargs["video"] == "video-id"
+    mock_bot.send_photo.assert_not_awaited()
+
+
+async def test_media_group_is_sent_as_one_album(scheduler_service, mock_bot, mock_result_buffer):
+    post = make_post(1)
+    post["media_group"] = [{"media_id": "a", "media_type": "photo"}, {"media_id": "b", "media_type": "photo"}]
+    mock_bot.send_media_group.return_value = [
+        SimpleNamespace(chat=SimpleNamespace(id=-100), message_id=10),
+        SimpleNamespace(chat=SimpleNamespace(id=-100), message_id=11),
+    ]
+
+    assert await scheduler_service.send_post_to_channel(post) is True
+
+    media = mock_bot.send_media_group.await_args.kwargs["media"]
+    assert [item.media for item in media] == ["a", "b"]
+    assert mock_result_buffer.add.await_args.kwargs["message_id"] == 10
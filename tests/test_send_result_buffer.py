@@ -0,0 +1,67 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from bot.config import Settings
+from bot.database.repositories import SchedulerRepository
+from bot.services.send_result_buffer import SendResultBuffer
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def mock_scheduler_repo() -> AsyncMock:
+    return AsyncMock(spec=SchedulerRepository)
+
+
+@pytest.fixture
+def result_buffer(mock_scheduler_repo) -> SendResultBuffer:
+    settings = MagicMock(spec=Settings)
+    settings.SEND_RESULT_BATCH_SIZE = 3
+    settings.SEND_RESULT_FLUSH_INTERVAL = 60.0
+    return SendResultBuffer(settings=settings, scheduler_repo=mock_scheduler_repo)
+
+
+async def test_flushes_when_batch_is_full(result_buffer: SendResultBuffer, mock_scheduler_repo):
+    await result_buffer.add(1, -100, 10)
+    await result_buffer.add(2, -100, 11)
+    mock_scheduler_repo.record_sent_posts.assert_not_awaited()
+
+    await result_buffer.add(3, -200, 12)
+
+    mock_scheduler_repo.record_sent_posts.assert_awaited_once_with(
+        [(1, -100, 10, None), (2, -100, 11, None), (3, -200, 12, None)],
+        lease_owner=result_buffer.worker_id,
+    )
+    assert len(result_buffer) == 0
+
+
+async def test_flushes_when_interval_elapsed(result_buffer: SendResultBuffer, mock_scheduler_repo):
+    result_buffer.flush_interval = 0
+    await result_buffer.add(1, -100, 10)
+
+    mock_scheduler_repo.record_sent_posts.assert_awaited_once_with(
+        [(1, -100, 10, None)], lease_owner=result_buffer.worker_id
+    )
+
+
+async def test_failed_flush_keeps_results(result_buffer: SendResultBuffer, mock_scheduler_repo):
+    await result_buffer.add(1, -100, 10)
+    mock_scheduler_repo.record_sent_posts.side_effect = ConnectionError("db down")
+
+    with pytest.raises(ConnectionError):
+        await result_buffer.flush()
+    assert len(result_buffer) == 1
+
+    mock_scheduler_repo.record_sent_posts.side_effect = None
+    assert await result_buffer.flush() == 1
+    assert await result_buffer.flush() == 0
+
+
+async def test_add_does_not_raise_when_flush_fails(result_buffer: SendResultBuffer, mock_scheduler_repo):
+    """Post allaqachon yuborilgan: yozishdagi xatolik yuborish xatosi deb hisoblanmasligi kerak."""
+    result_buffer.flush_interval = 0
+    mock_scheduler_repo.record_sent_posts.side_effect = ConnectionError("db down")
+
+    await result_buffer.add(1, -100, 10)
+
+    assert len(result_buffer) == 1
@@ -86,3 +86,28 @@ async def test_check_channel_limit_unlimited(subscription_service: SubscriptionS
     assert can_add is True
 
 # Post limitlari uchun ham shunga o'xshash testlarni yozish mumkin...
+
+
+@pytest.mark.parametrize(
+    "max_posts, used, expected",
+    [(30, 10, 20), (30, 35, 0), (-1, 1000, None)],
+)
+async def test_get_remaining_post_quota(
+    subscription_service: SubscriptionService, mock_user_repo, mock_plan_repo, mock_scheduler_repo,
+    max_posts, used, expected,
+):
+    """Oylik limitdan qolgan postlar soni; cheksiz tarif uchun None."""
+    mock_user_repo.get_user_plan_name.return_value = "pro"
+    mock_plan_repo.get_plan_by_name.return_value = {"max_posts_per_month": max_posts}
+    mock_scheduler_repo.count_user_posts_this_month.return_value = used
+
+    assert await subscription_service.get_remaining_post_quota(123) == expected
+    assert await subscription_service.check_post_limit(123) is (expected is None or expected > 0)
+
+
+async def test_get_remaining_post_quota_disabled(subscription_service: SubscriptionService, mock_settings, mock_user_repo):
+    """Cheklovlar o'chirilgan bo'lsa limit yo'q."""
+    mock_settings.ENFORCE_PLAN_LIMITS = False
+
+    assert await subscription_service.get_remaining_post_quota(123) is None
+    mock_user_repo.get_user_plan_name.assert_not_awaited()
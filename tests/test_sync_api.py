@@ -0,0 +1,93 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+
+PLAN = {"name": "free", "max_channels": 1, "max_posts_per_month": 30}
+POST_ROW = {
+    "id": 7,
+    "channel_id": -100,
+    "post_text": "hello",
+    "schedule_time": "2024-01-01T10:00:00+00:00",
+    "next_fire_at": "2024-01-01T10:00:00+00:00",
+}
+
+
+@pytest.fixture
+def user_repo():
+    repo = AsyncMock()
+    repo.get_data_version.return_value = {"version": 5, "plan_id": 1}
+    repo.get_initial_data.return_value = {
+        "version": 5,
+        "plan_id": 1,
+        "plan": PLAN,
+        "channels": [{"id": -100, "title": "News", "username": "news"}],
+        "scheduled_posts": [POST_ROW],
+    }
+    repo.get_changes.return_value = {
+        "version": 9,
+        "sync_floor": 2,
+        "plan_id": 1,
+        "plan": PLAN,
+        "channels": [],
+        "scheduled_posts": [POST_ROW],
+        "deleted_channels": [-200],
+        "deleted_posts": [3, 4],
+    }
+    return repo
+
+
+@pytest.fixture
+def client(user_repo):
+    api.app.dependency_overrides[api.get_validated_user_data] = lambda: {"id": 42, "username": "alice"}
+    api.app.dependency_overrides[api.get_user_repo] = lambda: user_repo
+    yield TestClient(api.app)
+    api.app.dependency_overrides.clear()
+
+
+def test_initial_data_returns_version_and_etag(client, user_repo):
+    response = client.get("/api/v1/initial-data")
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"5-1"'
+    assert response.json()["version"] == 5
+    # If-None-Match bo'lmasa versiya alohida so'ralmaydi
+    user_repo.get_data_version.assert_not_awaited()
+
+
+def test_initial_data_not_modified(client, user_repo):
+    response = client.get("/api/v1/initial-data", headers={"If-None-Match": 'W/"5-1"'})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    user_repo.get_initial_data.assert_not_awaited()
+
+
+def test_initial_data_stale_etag_reloads(client, user_repo):
+    response = client.get("/api/v1/initial-data", headers={"If-None-Match": '"4-1"'})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"5-1"'
+    user_repo.get_initial_data.assert_awaited_once_with(42, "alice")
+
+
+def test_sync_returns_changes(client, user_repo):
+    response = client.get("/api/v1/sync", params={"since": 5})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["version"] == 9
+    assert [post["id"] for post in body["scheduled_posts"]] == [7]
+    assert body["deleted_channels"] == [-200]
+    assert body["deleted_posts"] == [3, 4]
+    user_repo.get_changes.assert_awaited_once_with(42, 5)
+
+
+@pytest.mark.parametrize("since", [1, 10])
+def test_sync_outside_known_range_is_gone(client, since):
+    # sync_floor dan past (tombstone'lar tozalangan) yoki joriy versiyadan yuqori
+    response = client.get("/api/v1/sync", params={"since": since})
+
+    assert response.status_code == 410
@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from bot.utils.tdigest import TDigest
+
+
+@pytest.fixture
+def views():
+    rng = random.Random(42)
+    return [rng.lognormvariate(6, 1) for _ in range(20000)]
+
+
+def exact(values, q):
+    return sorted(values)[int(q * len(values))]
+
+
+def test_quantiles_are_close_to_exact(views):
+    digest = TDigest().update(views)
+
+    assert digest.count == len(views)
+    for q in (0.5, 0.9, 0.99):
+        assert digest.quantile(q) == pytest.approx(exact(views, q), rel=0.02)
+
+
+def test_merged_digests_match_a_single_digest(views):
+    merged = TDigest()
+    for start in range(0, len(views), 5000):
+        merged.merge(TDigest().update(views[start:start + 5000]))
+
+    assert merged.count == len(views)
+    for q in (0.5, 0.9, 0.99):
+        assert merged.quantile(q) == pytest.approx(exact(views, q), rel=0.02)
+
+
+def test_serialized_sketch_is_compact_and_round_trips(views):
+    digest = TDigest().update(views)
+    data = digest.to_bytes()
+
+    # Hajm qiymatlar soniga emas, compression'ga bog'liq
+    assert len(data) < 2000
+    restored = TDigest.from_bytes(data)
+    assert restored.count == digest.count
+    assert restored.quantile(0.9) == digest.quantile(0.9)
+
+
+def test_small_and_empty_digests():
+    assert TDigest().quantile(0.5) is None
+    assert TDigest.from_bytes(TDigest().to_bytes()).count == 0
+    assert TDigest().update([7]).quantile(0.99) == 7
+    digest = TDigest().update([1, 2])
+    assert (digest.quantile(0), digest.quantile(1)) == (1, 2)
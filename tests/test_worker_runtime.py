@@ -0,0 +1,67 @@
+import asyncio
+import pytest
+
+from bot.worker_runtime import WorkerRuntime
+
+
+def test_runtime_reuses_one_loop_across_runs():
+    events = []
+
+    async def startup():
+        events.append("startup")
+
+    async def shutdown():
+        events.append("shutdown")
+
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    runtime = WorkerRuntime(startup=startup, shutdown=shutdown)
+    runtime.start()
+    runtime.start()  # Ikkinchi chaqiruv hech narsa qilmasligi kerak
+    try:
+        first = runtime.run(current_loop())
+        second = runtime.run(current_loop())
+        assert first is second
+        assert runtime.is_running
+    finally:
+        runtime.stop()
+
+    assert events == ["startup", "shutdown"]
+    assert not runtime.is_running
+
+
+def test_runtime_starts_lazily_and_propagates_errors():
+    async def fail():
+        raise RuntimeError("boom")
+
+    runtime = WorkerRuntime()
+    try:
+        with pytest.raises(RuntimeError, match="boom"):
+            runtime.run(fail())
+        assert runtime.run(asyncio.sleep(0, result=42)) == 42
+    finally:
+        runtime.stop()
+
+
+def test_failed_startup_is_retried_on_next_start():
+    attempts = []
+
+    async def startup():
+        attempts.append(asyncio.get_running_loop())
+        if len(attempts) == 1:
+            raise ConnectionError("database is down")
+
+    runtime = WorkerRuntime(startup=startup)
+    with pytest.raises(ConnectionError):
+        runtime.start()
+    # Muvaffaqiyatsiz start runtime'ni ishga tushgan deb belgilamaydi va loop'ni yopadi
+    assert not runtime.is_running
+    assert attempts[0].is_closed()
+
+    try:
+        assert runtime.run(asyncio.sleep(0, result=42)) == 42
+        assert len(attempts) == 2
+        assert runtime.is_running
+    finally:
+        runtime.stop()
@@ -1,4 +1,4 @@
-import React from 'react';
+import React, { useEffect } from 'react';
 import { Container, Box, Typography, Skeleton, Stack } from '@mui/material';
 import PostCreator from './components/PostCreator';
 import ScheduledPostsList from './components/ScheduledPostsList';
@@ -15,7 +15,23 @@ const AppSkeleton = () => (
 );
 
 function App() {
-    const { isLoading } = useAppStore();
+    const { isLoading, fetchData, syncData } = useAppStore();
+
+    // Ochilganda to'liq yuklaymiz; ilovaga qaytilganda faqat o'zgarganlarini olamiz
+    useEffect(() => {
+        fetchData();
+        const onVisible = () => {
+            if (document.visibilityState === 'visible') {
+                syncData();
+            }
+        };
+        document.addEventListener('visibilitychange', onVisible);
+        window.addEventListener('focus', onVisible);
+        return () => {
+            document.removeEventListener('visibilitychange', onVisible);
+            window.removeEventListener('focus', onVisible);
+        };
+    }, [fetchData, syncData]);
 
     return (
         <Container maxWidth="sm">
@@ -15,20 +15,34 @@ const getAuthHeaders = () => {
   };
 };
 
+// /sync uchun berilgan versiya eskirgan (410 Gone)
+class SyncExpiredError extends Error {}
+
 /**
- * API so'rovlarini yuborish uchun markazlashtirilgan funksiya.
+ * API so'rovini yuboradi va javob bilan birga uning ETag'ini qaytaradi.
  * @param {string} endpoint - API endpoint (masalan, '/initial-data')
- * @param {RequestInit} options - Fetch uchun qo'shimcha opsiyalar (method, body, etc.)
- * @returns {Promise<any>}
+ * @param {RequestInit} options - Fetch uchun qo'shimcha opsiyalar (method, body, headers, etc.)
+ * @returns {Promise<{data: any, etag: string | null}>} - 304 (Not Modified) uchun data = null
  */
-const apiFetch = async (endpoint, options = {}) => {
+const apiRequest = async (endpoint, options = {}) => {
     const response = await fetch(`${VITE_API_URL}${endpoint}`, {
         ...options,
-        headers: getAuthHeaders(),
+        headers: { ...getAuthHeaders(), ...options.headers },
     });
+    const etag = response.headers.get('ETag');
+
+    // Ma'lumotlar o'zgarmagan: tana (body) bo'sh keladi
+    if (response.status === 304) {
+        return { data: null, etag };
+    }
 
     const responseData = await response.json();
 
+    // Sinxronlash versiyasi eskirgan: chaqiruvchi to'liq qayta yuklaydi, foydalanuvchiga xato ko'rsatilmaydi
+    if (response.status === 410) {
+        throw new SyncExpiredError(responseData.detail);
+    }
+
     if (!response.ok) {
         // Xatolikni serverdan kelgan xabar bilan birga chiqarish
         const errorMessage = responseData.detail || 'An unknown error occurred.';
@@ -37,7 +51,57 @@ const apiFetch = async (endpoint, options = {}) => {
         throw new Error(errorMessage);
     }
 
-    return responseData;
+    return { data: responseData, etag };
+};
+
+/**
+ * API so'rovlarini yuborish uchun markazlashtirilgan funksiya.
+ * @param {string} endpoint - API endpoint (masalan, '/channels')
+ * @param {RequestInit} options - Fetch uchun qo'shimcha opsiyalar (method, body, etc.)
+ * @returns {Promise<any>}
+ */
+const apiFetch = async (endpoint, options = {}) => (await apiRequest(endpoint, options)).data;
+
+/**
+ * Ro'yxatdan o'chirilganlarni olib tashlaydi, so'ng o'zgarganlarini almashtiradi yoki qo'shadi.
+ * @param {Array<{id: number}>} items
+ * @param {number[]} deletedIds
+ * @param {Array<{id: number}>} upserts
+ */
+const applyChanges = (items, deletedIds, upserts) => {
+  const removed = new Set([...deletedIds, ...upserts.map((item) => item.id)]);
+  return [...items.filter((item) => !removed.has(item.id)), ...upserts];
+};
+
+const byScheduledAt = (a, b) => new Date(a.scheduled_at) - new Date(b.scheduled_at);
+
+
+// Bajarilayotgan /sync so'rovi (bir vaqtda bittadan ortiq yuborilmaydi)
+let pendingSync = null;
+
+const runSync = async (set, get) => {
+  const { version } = get();
+  if (version === null) {
+    return get().fetchData();
+  }
+  try {
+    const { data: changes, etag } = await apiRequest(`/sync?since=${version}`);
+    set((state) => ({
+      channels: applyChanges(state.channels, changes.deleted_channels, changes.channels),
+      scheduledPosts: applyChanges(
+        state.scheduledPosts, changes.deleted_posts, changes.scheduled_posts
+      ).sort(byScheduledAt),
+      plan: changes.plan,
+      version: changes.version,
+      etag,
+    }));
+  } catch (error) {
+    if (error instanceof SyncExpiredError) {
+      set({ version: null, etag: null });
+      return get().fetchData();
+    }
+    console.error("Error syncing data:", error);
+  }
 };
 
 
@@ -47,21 +111,44 @@ export const useAppStore = create((set, get) => ({
   channels: [],
   scheduledPosts: [],
 
+  // Ma'lumotlar versiyasi (/sync uchun) va /initial-data javobining ETag'i
+  version: null,
+  etag: null,
+
   // Boshlang'ich ma'lumotlarni backend'dan yuklash
   fetchData: async () => {
     try {
-      const data = await apiFetch('/initial-data');
+      const { etag } = get();
+      const { data, etag: newEtag } = await apiRequest('/initial-data', {
+        headers: etag ? { 'If-None-Match': etag } : {},
+      });
+      if (data === null) {
+        return; // 304: saqlangan ma'lumotlar hali ham dolzarb
+      }
       set({
         channels: data.channels,
         scheduledPosts: data.scheduled_posts,
         plan: data.plan,
         user: data.user,
+        version: data.version,
+        etag: newEtag,
       });
     } catch (error) {
       console.error("Error fetching initial data:", error);
     }
   },
 
+  // Faqat oxirgi versiyadan beri o'zgarganlarni olish (versiya bo'lmasa to'liq yuklash).
+  // focus va visibilitychange birga kelganda bitta so'rov yuboriladi.
+  syncData: () => {
+    if (!pendingSync) {
+      pendingSync = runSync(set, get).finally(() => {
+        pendingSync = null;
+      });
+    }
+    return pendingSync;
+  },
+
   // Yangi kanal qo'shish
   addChannel: async (channelUsername) => {
     try {
@@ -83,7 +170,7 @@ export const useAppStore = create((set, get) => ({
             body: JSON.stringify(postData)
         });
         set(state => ({
-            scheduledPosts: [...state.scheduledPosts, newPost].sort((a, b) => new Date(a.scheduled_at) - new Date(b.scheduled_at))
+            scheduledPosts: [...state.scheduledPosts, newPost].sort(byScheduledAt)
         }));
     } catch (error) {
         console.error('Error scheduling post:', error);